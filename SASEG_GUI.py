@@ -4,6 +4,7 @@ import warnings
 import time
 import threading
 import subprocess
+import multiprocessing
 import tkinter as tk
 from tkinter import ttk, messagebox
 from pywinauto.application import Application
@@ -13,6 +14,9 @@ from tfls_metadata import show_metadata_setup_dialog
 from tfls_init_pgm import run_initial_pgm
 from tfls_batch_run import run_batch_run
 from tfls_combine import run_tfls_combine
+from dir_index import DirectoryIndex
+from subfolder_grid import EXCLUDED_FOLDERS, SubfolderGrid, build_grid_model
+from project_watcher import ProjectWatcher
 from pywinauto.keyboard import send_keys
 
 # 忽略 UserWarning 警告
@@ -111,15 +115,18 @@ class SASEGGUI:
         
         # Z盘路径
         self.z_drive = "Z:\\"
+        # Z盘目录列表缓存（后台预取下一级）
+        self.dir_index = DirectoryIndex()
         
         # 存储6个下拉框
         self.comboboxes = []
         # 存储当前选中的路径
         self.selected_paths = [""] * 6
         
-        # 存储网格框架和标签
-        self.grid_frame = None
-        self.grid_labels = {}  # 存储列标题和内容标签
+        # Subfolders 网格（在 create_widgets 中创建）
+        self.subfolder_grid = None
+        # 监视当前项目目录，增量更新网格
+        self.project_watcher = None
         self.current_subfolders = []  # 当前网格列顺序（用于快捷跳转）
         
         # 创建界面
@@ -129,6 +136,30 @@ class SASEGGUI:
         self.refresh_first_dropdown()
         # 测试阶段：默认选中 projects、HRS2129、HRS2129_test、csr_01
         self.root.after(100, self._apply_test_defaults)
+
+        # 后台预热 SAS 会话，点击「运行」时无需再等待连接；关闭窗口时断开
+        self._prewarm_sas_session()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def _prewarm_sas_session(self):
+        """启动 SAS 会话管理器的后台预热（未安装 saspy 时跳过）。"""
+        try:
+            from sas_session_pool import get_session_manager
+        except ImportError:
+            return
+        get_session_manager().prewarm()
+
+    def on_close(self):
+        """关闭主窗口：停止目录监视，取消未结束的后台 SAS 作业，断开预热/空闲的 SAS 会话后退出。"""
+        self._stop_project_watcher()
+        try:
+            from sas_jobs import cancel_all_jobs
+            from sas_session_pool import get_session_manager
+            cancel_all_jobs()
+            get_session_manager().shutdown()
+        except ImportError:
+            pass
+        self.root.destroy()
     
     def create_widgets(self):
         # 主布局：左侧导航 + 右侧内容
@@ -302,52 +333,13 @@ class SASEGGUI:
         self.hyperlinks_frame = tk.Frame(self.notebook, bg="#f5f5f5")
         self.notebook.add(self.hyperlinks_frame, text="Hyperlinks to Sub Folders")
         
-        # 创建可滚动的网格容器（支持水平和垂直滚动）
-        self.canvas = tk.Canvas(self.hyperlinks_frame, bg="#f5f5f5")
-        v_scrollbar = ttk.Scrollbar(self.hyperlinks_frame, orient="vertical", command=self.canvas.yview)
-        h_scrollbar = ttk.Scrollbar(self.hyperlinks_frame, orient="horizontal", command=self.canvas.xview)
-        self.grid_frame = tk.Frame(self.canvas, bg="#f5f5f5")
-        
-        self.canvas.configure(yscrollcommand=v_scrollbar.set, xscrollcommand=h_scrollbar.set)
-        
-        # 布局滚动条和canvas
-        self.canvas.grid(row=0, column=0, sticky="nsew")
-        v_scrollbar.grid(row=0, column=1, sticky="ns")
-        h_scrollbar.grid(row=1, column=0, sticky="ew")
-        
-        self.hyperlinks_frame.grid_rowconfigure(0, weight=1)
-        self.hyperlinks_frame.grid_columnconfigure(0, weight=1)
-        
-        self.canvas_window = self.canvas.create_window((0, 0), window=self.grid_frame, anchor="nw")
-        
-        def update_scroll_region(event=None):
-            # 更新滚动区域（包括水平和垂直）
-            self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-        
-        def on_canvas_configure(event):
-            # 更新列宽为固定宽度（所有列保持一致）
-            if hasattr(self, 'grid_frame') and self.grid_frame:
-                column_width = 120  # 固定列宽120像素，所有列保持一致
-                for col_idx in range(20):  # 假设最多20列
-                    try:
-                        self.grid_frame.columnconfigure(col_idx, minsize=column_width, weight=0)
-                    except:
-                        pass
-            # 更新滚动区域
-            self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-        
-        def on_frame_configure(event):
-            # 当grid_frame大小改变时，更新canvas窗口宽度和滚动区域
-            # 让canvas_window的宽度等于grid_frame的实际宽度，实现水平滚动
-            frame_width = event.width
-            canvas_width = self.canvas.winfo_width()
-            # 设置canvas_window宽度为两者中的较大值，确保可以水平滚动
-            self.canvas.itemconfig(self.canvas_window, width=max(frame_width, canvas_width))
-            # 更新滚动区域
-            self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-        
-        self.canvas.bind('<Configure>', on_canvas_configure)
-        self.grid_frame.bind('<Configure>', on_frame_configure)
+        # Subfolders 网格：画布绘制，只渲染可见区域（支持水平和垂直滚动）
+        self.subfolder_grid = SubfolderGrid(
+            self.hyperlinks_frame,
+            on_header_click=self._open_folder_with_windows,
+            on_item_click=self.open_path,
+        )
+        self.canvas = self.subfolder_grid.canvas
         
         # "Autoexec"标签页
         self.autoexec_frame = tk.Frame(self.notebook, bg="#f5f5f5")
@@ -484,21 +476,11 @@ class SASEGGUI:
         self._switch_page("主页")
     
     def get_directories(self, path):
-        """获取指定路径下的所有目录"""
+        """获取指定路径下的所有目录（按字母排序；走目录索引缓存，并在后台预取下一级）"""
         try:
-            if not os.path.exists(path):
-                return []
-            
-            items = os.listdir(path)
-            directories = []
-            
-            for item in items:
-                item_path = os.path.join(path, item)
-                if os.path.isdir(item_path):
-                    directories.append(item)
-            
-            # 按字母顺序排序
-            directories.sort()
+            directories = self.dir_index.list_dirs(path)
+            if directories:
+                self.dir_index.prefetch(path)
             return directories
         
         except PermissionError:
@@ -628,7 +610,8 @@ class SASEGGUI:
         # 清空网格显示
         self.clear_grid()
         
-        # 重新扫描根目录
+        # 丢弃目录缓存，重新扫描根目录
+        self.dir_index.invalidate()
         self.refresh_first_dropdown()
         self.update_status("已刷新访问")
     
@@ -642,10 +625,9 @@ class SASEGGUI:
     
     def clear_grid(self):
         """清空网格显示"""
-        if self.grid_frame:
-            for widget in self.grid_frame.winfo_children():
-                widget.destroy()
-        self.grid_labels = {}
+        self._stop_project_watcher()
+        if self.subfolder_grid:
+            self.subfolder_grid.clear()
     
     def _jump_to_column(self, folder_key):
         """快捷按钮：滚动到 Subfolders 中对应的列（页面）"""
@@ -704,211 +686,55 @@ class SASEGGUI:
             self.update_status(f"路径不存在: {current_path}")
             return
         
-        # 获取当前路径下的所有子文件夹
+        # 每个子文件夹扫描一次得到网格模型（先丢弃缓存，保证显示最新文件）
         try:
-            items = os.listdir(current_path)
-            subfolders = []
-            
-            for item in items:
-                item_path = os.path.join(current_path, item)
-                if os.path.isdir(item_path):
-                    subfolders.append(item)
-            
-            # 任何时候都过滤掉指定的文件夹
-            excluded_folders = ["00_source_data", "91_export", "92_import", "99_archive"]
-            subfolders = [folder for folder in subfolders if folder not in excluded_folders]
+            self.dir_index.invalidate(current_path)
+            columns = build_grid_model(self.dir_index, current_path)
             
-            subfolders.sort()
-            
-            if not subfolders:
+            if not columns:
                 return
             
             # 保存当前列顺序，供快捷按钮跳转使用
-            self.current_subfolders = list(subfolders)
+            self.current_subfolders = [col.name for col in columns]
+            self.subfolder_grid.set_columns(columns)
+            self._start_project_watcher(current_path, columns)
             
-            # 创建列标题（每个子文件夹作为一列）
-            for col_idx, folder_name in enumerate(subfolders):
-                # 列标题（按钮样式，可点击）
-                header_path = os.path.join(current_path, folder_name)
-                header = tk.Label(
-                    self.grid_frame,
-                    text=folder_name,
-                    bg="#d0d0d0",
-                    relief=tk.RAISED,
-                    font=("Arial", 9, "bold"),
-                    padx=5,
-                    pady=3,
-                    cursor="hand2",
-                    fg="blue"
-                )
-                header.grid(row=0, column=col_idx, sticky="ew", padx=2, pady=2)
-                # 绑定点击事件 - 第一层文件夹使用Windows形式打开
-                header.bind("<Button-1>", lambda e, path=header_path: self._open_folder_with_windows(path))
-                header.bind("<Enter>", lambda e, lbl=header: lbl.config(bg="#b0b0b0"))
-                header.bind("<Leave>", lambda e, lbl=header: lbl.config(bg="#d0d0d0"))
-                
-                # 获取该文件夹下的子项（包括文件夹和文件）
-                folder_path = os.path.join(current_path, folder_name)
-                try:
-                    sub_items = os.listdir(folder_path)
-                    # 分别获取文件夹和文件
-                    sub_dirs = []
-                    sub_files = []
-                    for item in sub_items:
-                        item_path = os.path.join(folder_path, item)
-                        if os.path.isdir(item_path):
-                            sub_dirs.append(item)
-                        else:
-                            sub_files.append(item)
-                    sub_dirs.sort()
-                    sub_files.sort()
-                    sub_items = sub_dirs + sub_files  # 先显示文件夹，再显示文件
-                except:
-                    sub_items = []
-                
-                # 创建该列下的内容标签（可点击的超链接）
-                col_labels = []
-                for row_idx, sub_item in enumerate(sub_items, start=1):
-                    item_path = os.path.join(folder_path, sub_item)
-                    is_dir = os.path.isdir(item_path)
-                    
-                    # 检查文件扩展名
-                    file_ext = os.path.splitext(sub_item)[1].lower() if not is_dir else ""
-                    is_ps1 = file_ext == '.ps1'
-                    
-                    # 对于03_reports, 07_logs, 09_validation，文件名截断显示
-                    display_text = sub_item
-                    if folder_name in ["03_reports", "07_logs", "09_validation"]:
-                        # 截断文件名，只显示前30个字符
-                        max_length = 30
-                        if len(sub_item) > max_length:
-                            display_text = sub_item[:max_length] + "..."
-                    
-                    # 如果是.ps1文件，不显示为超链接样式
-                    if is_ps1:
-                        label = tk.Label(
-                            self.grid_frame,
-                            text=display_text,
-                            bg="#ffffff",
-                            anchor="w",
-                            padx=5,
-                            pady=2,
-                            font=("Arial", 8),
-                            cursor="arrow",  # 普通光标，不是手型
-                            fg="black",  # 黑色文字，不是蓝色
-                            # 不设置underline，即无下划线
-                        )
-                    else:
-                        label = tk.Label(
-                            self.grid_frame,
-                            text=display_text,
-                            bg="#ffffff",
-                            anchor="w",
-                            padx=5,
-                            pady=2,
-                            font=("Arial", 8),
-                            cursor="hand2",
-                            fg="blue",
-                            underline=1
-                        )
-                    
-                    label.grid(row=row_idx, column=col_idx, sticky="ew", padx=2, pady=1)
-                    
-                    # 如果不是.ps1文件，绑定点击事件
-                    if not is_ps1:
-                        label.bind("<Button-1>", lambda e, path=item_path: self.open_path(path))
-                        
-                        # 绑定悬停事件和tooltip
-                        def make_hover_events(lbl, full_text, is_truncated):
-                            def on_enter(event):
-                                lbl.config(bg="#e0e0e0")
-                                if is_truncated:
-                                    # 显示tooltip
-                                    tooltip = tk.Toplevel()
-                                    tooltip.wm_overrideredirect(True)
-                                    tooltip.wm_geometry(f"+{event.x_root+10}+{event.y_root+10}")
-                                    label_tooltip = tk.Label(tooltip, text=full_text, bg="#ffffe0", 
-                                                            relief=tk.SOLID, borderwidth=1, padx=5, pady=2,
-                                                            font=("Arial", 8))
-                                    label_tooltip.pack()
-                                    lbl.tooltip = tooltip
-                            
-                            def on_leave(event):
-                                lbl.config(bg="#ffffff")
-                                if hasattr(lbl, 'tooltip'):
-                                    lbl.tooltip.destroy()
-                                    del lbl.tooltip
-                            
-                            lbl.bind("<Enter>", on_enter)
-                            lbl.bind("<Leave>", on_leave)
-                        
-                        make_hover_events(label, sub_item, display_text != sub_item)
-                    
-                    col_labels.append(label)
-                
-                # 存储列标题和内容标签
-                self.grid_labels[folder_name] = {
-                    'header': header,
-                    'labels': col_labels
-                }
-            
-            # 配置列宽
-            # 03_reports, 07_logs, 09_validation的列宽和08_formats保持一致
-            # 先找到08_formats的索引（如果存在）
-            formats_idx = None
-            for idx, folder in enumerate(subfolders):
-                if folder == "08_formats":
-                    formats_idx = idx
-                    break
-            
-            # 如果找到08_formats，使用它的列宽；否则使用默认宽度
-            base_column_width = 120  # 默认列宽120像素
-            
-            for col_idx, folder_name in enumerate(subfolders):
-                # 对于03_reports, 07_logs, 09_validation，使用和08_formats相同的列宽
-                if folder_name in ["03_reports", "07_logs", "09_validation"]:
-                    if formats_idx is not None:
-                        # 使用08_formats的列宽
-                        column_width = base_column_width
-                    else:
-                        column_width = base_column_width
-                else:
-                    column_width = base_column_width
-                
-                self.grid_frame.columnconfigure(col_idx, minsize=column_width, weight=0)
-            
-            # 更新canvas滚动区域（包括水平和垂直）
-            # 延迟更新，确保所有widget都已创建
-            def update_scroll():
-                self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-                # 更新canvas_window宽度以支持水平滚动
-                frame_width = self.grid_frame.winfo_reqwidth()
-                canvas_width = self.canvas.winfo_width()
-                if frame_width > 0:
-                    self.canvas.itemconfig(self.canvas_window, width=max(frame_width, canvas_width))
-            
-            self.root.after(50, update_scroll)
-            
-            self.update_status(f"显示 {len(subfolders)} 个文件夹")
+            self.update_status(f"显示 {len(columns)} 个文件夹")
         
         except Exception as e:
             self.update_status(f"更新网格时出错: {str(e)}")
     
-    def _update_column_widths(self):
-        """更新列宽为固定像素宽度（所有列保持一致）"""
-        try:
-            # 使用固定宽度，所有列保持一致
-            column_width = 120  # 固定列宽120像素
-            
-            # 更新所有已存在的列
-            if self.grid_frame:
-                for col_idx in range(20):  # 假设最多20列
-                    try:
-                        self.grid_frame.columnconfigure(col_idx, minsize=column_width, weight=0)
-                    except:
-                        pass
-        except Exception as e:
-            print(f"更新列宽时出错: {e}")
+    def _start_project_watcher(self, project_path, columns):
+        """以刚扫描的网格模型为快照，开始监视项目目录；变化量回到主线程增量更新网格"""
+        self._stop_project_watcher()
+        watcher = ProjectWatcher(
+            project_path,
+            on_change=lambda deltas: self.root.after(0, self._apply_grid_deltas, watcher, deltas),
+            snapshot={col.name: col.entries for col in columns},
+            excluded=EXCLUDED_FOLDERS,
+        )
+        self.project_watcher = watcher.start()
+    
+    def _stop_project_watcher(self):
+        if self.project_watcher is not None:
+            self.project_watcher.stop()
+            self.project_watcher = None
+    
+    def _apply_grid_deltas(self, watcher, deltas):
+        """将监视到的变化量应用到网格（路径已切换时丢弃过期的变化）"""
+        if watcher is not self.project_watcher:
+            return
+        for d in deltas:
+            self.dir_index.invalidate(d.path)
+        if any(d.folder_added or d.folder_removed for d in deltas):
+            self.dir_index.invalidate(watcher.root_path)
+        if self.subfolder_grid.apply_deltas(deltas):
+            self.current_subfolders = [col.name for col in self.subfolder_grid.columns]
+        summary = ", ".join(
+            "%s %s" % (d.name, "已删除" if d.folder_removed else "+%d -%d" % (len(d.added), len(d.removed)))
+            for d in deltas
+        )
+        self.update_status(f"Subfolders 已更新: {summary}")
     
     def open_path(self, path):
         """打开指定的文件夹或文件"""
@@ -1365,4 +1191,6 @@ def main():
 
 
 if __name__ == "__main__":
+    # 打包为 exe 后日志审计的进程池需要
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+目录索引服务（独立模块）
+
+Z: 盘为网络映射盘，os.listdir + 逐项 os.path.isdir 每项都是一次 SMB 往返。本模块：
+- 用 os.scandir 一次取得目录项及其类型（Windows 下无需额外 stat）；
+- 按路径缓存列表，超过 ttl 秒自动失效，也可 invalidate() 显式失效（「刷新访问」）；
+- prefetch(path) 在后台线程中预先扫描 path 的各子目录，下拉框选到下一级时直接命中缓存。
+"""
+import os
+import queue
+import threading
+import time
+
+# 缓存有效期（秒）
+DEFAULT_TTL = 60.0
+
+
+def _key(path):
+    return os.path.normcase(os.path.normpath(path))
+
+
+class DirectoryIndex:
+    """
+    线程安全的目录列表缓存。
+
+    scan(path) -> (子目录名列表, 文件名列表)，均按字母排序；
+    list_dirs(path) -> 子目录名列表；路径不存在返回空列表，无权限等错误照常抛出。
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        self._cache = {}  # key -> (扫描时间, dirs, files)
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._generation = 0  # 新的 prefetch 请求使之前排队的预取作废
+        self._worker = None
+
+    def _lookup(self, key):
+        with self._lock:
+            hit = self._cache.get(key)
+        if hit and time.monotonic() - hit[0] < self.ttl:
+            return hit
+        return None
+
+    def _scan_dir(self, path):
+        dirs, files = [], []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    (dirs if is_dir else files).append(entry.name)
+        except (FileNotFoundError, NotADirectoryError):
+            pass
+        dirs.sort()
+        files.sort()
+        return dirs, files
+
+    def scan(self, path):
+        """返回 (dirs, files)，优先使用未过期的缓存。"""
+        key = _key(path)
+        hit = self._lookup(key)
+        if hit:
+            return hit[1], hit[2]
+        dirs, files = self._scan_dir(path)
+        with self._lock:
+            self._cache[key] = (time.monotonic(), dirs, files)
+        return dirs, files
+
+    def list_dirs(self, path):
+        return self.scan(path)[0]
+
+    def is_cached(self, path):
+        return self._lookup(_key(path)) is not None
+
+    def invalidate(self, path=None):
+        """使缓存失效：path 为 None 时清空全部，否则清除 path 及其下所有层级。"""
+        with self._lock:
+            self._generation += 1
+            if path is None:
+                self._cache.clear()
+                return
+            key = _key(path)
+            prefix = key.rstrip(os.sep) + os.sep
+            for k in [k for k in self._cache if k == key or k.startswith(prefix)]:
+                del self._cache[k]
+
+    def prefetch(self, path):
+        """后台预取 path 下各子目录的列表（只取下一级，已缓存的跳过）。"""
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._prefetch_loop, daemon=True)
+                self._worker.start()
+        self._queue.put((generation, path))
+
+    def _prefetch_loop(self):
+        while True:
+            generation, path = self._queue.get()
+            try:
+                children = self.list_dirs(path)
+            except OSError:
+                continue
+            for name in children:
+                if generation != self._generation:
+                    break  # 用户已选到别处，放弃旧的预取
+                child = os.path.join(path, name)
+                if self.is_cached(child):
+                    continue
+                try:
+                    self.scan(child)
+                except OSError:
+                    pass
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+按源文件内容哈希缓存解析结果（独立模块）
+
+program_name.xlsx、ADaM spec 等标准文件很少变化，但每次使用都要重新解析 Excel。
+load_cached(namespace, source_path, build) 以源文件 SHA-1（加版本号等附加键）为键，
+把 build() 的结果 pickle 到 cache 目录（程序所在目录下，打包为 exe 时在 exe 旁），命中时直接读取。
+"""
+import hashlib
+import json
+import os
+import pickle
+import sys
+import tempfile
+
+CACHE_DIR_NAME = "cache"
+# 每个 namespace 最多保留的缓存文件数（超出时删除最旧的）
+MAX_ENTRIES_PER_NAMESPACE = 20
+
+
+def cache_dir():
+    """缓存目录：源码运行时为模块所在目录下的 cache，打包为 exe 时为 exe 所在目录下的 cache。"""
+    if getattr(sys, "frozen", False):
+        base = os.path.dirname(sys.executable)
+    else:
+        base = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base, CACHE_DIR_NAME)
+
+
+def file_sha1(path, chunk_size=1 << 20):
+    """计算文件内容的 SHA-1。"""
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def cache_key(source_path, version="", extra=""):
+    """缓存键：源文件内容哈希 + 版本号 + 附加键（如语言）。"""
+    h = hashlib.sha1(file_sha1(source_path).encode("ascii"))
+    h.update(("|%s|%s" % (version, extra)).encode("utf-8"))
+    return h.hexdigest()
+
+
+def prune_cache(directory, namespace, suffix=".pickle"):
+    """删除 directory 中 namespace 的旧缓存文件，只保留最新的 MAX_ENTRIES_PER_NAMESPACE 个。"""
+    prefix = namespace + "_"
+    try:
+        entries = [e for e in os.scandir(directory) if e.name.startswith(prefix) and e.name.endswith(suffix)]
+    except OSError:
+        return
+    entries.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+    for e in entries[MAX_ENTRIES_PER_NAMESPACE:]:
+        try:
+            os.remove(e.path)
+        except OSError:
+            pass
+
+
+def load_cached(namespace, source_path, build, version="", extra=""):
+    """
+    返回 build() 的结果；源文件内容（及 version / extra）未变时直接读取磁盘缓存。
+    缓存目录不可写或缓存文件损坏时退化为直接调用 build()。
+    """
+    directory = cache_dir()
+    cache_path = os.path.join(directory, "%s_%s.pickle" % (namespace, cache_key(source_path, version, extra)))
+    try:
+        with open(cache_path, "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.PickleError, EOFError, AttributeError, ImportError):
+        pass
+    result = build()
+    save_pickle(cache_path, result)
+    prune_cache(directory, namespace)
+    return result
+
+
+def save_pickle(path, obj):
+    """原子写入 pickle（先写临时文件再替换）；失败时静默返回 False。"""
+    tmp_path = None
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        return True
+    except (OSError, pickle.PicklingError, TypeError, AttributeError):
+        if tmp_path and os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        return False
+
+
+def save_json(path, obj):
+    """原子写入 JSON（UTF-8，先写临时文件再替换），用于共享盘上供多个用户读取的纯数据索引；失败时静默返回 False。"""
+    tmp_path = None
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(obj, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+        return True
+    except (OSError, TypeError, ValueError):
+        if tmp_path and os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        return False
@@ -3,9 +3,12 @@ import os
 import re
 import subprocess
 import sys
+import threading
 import saspy
 import pandas as pd
 
+from sas_log_scan import ISSUE_KINDS, classify_line, has_issue as summary_has_issue, hit_lines, primary_kind, scan_log_text
+
 # 是否在 Linux 下运行（无 GUI，直接读 Linux 路径）
 IS_LINUX = sys.platform.startswith('linux')
 
@@ -17,6 +20,26 @@ if not IS_LINUX:
 LINUX_PATH_PREFIX = '/u01/app/sas/sas9.4/DocumentRepository/DDT/'
 WINDOWS_PATH_PREFIX = 'Z:\\'  # 即 Z:/
 
+# 每个程序提交前 %include 的通用宏（autorun）
+AUTORUN_MACRO_PATH = '/u01/app/sas/sas9.4/DocumentRepository/DDT/projects/utility/macros/01_general/autorun.sas'
+
+# saspy 连接配置名（sascfg_personal.py 中的 winiomlinux）
+SAS_CFGNAME = 'winiomlinux'
+
+
+# 流式跟踪日志时的轮询间隔（秒）
+LOG_TAIL_INTERVAL = 0.5
+
+
+class SASRunAborted(Exception):
+    """流式模式下检测到 ERROR 并按 abort_on_error 中止，或经 cancel_event 取消了 SAS 运行。"""
+
+
+def is_session_terminated_error(exc):
+    """判断异常是否表示 SAS 进程已退出（宏内 endsas/abort 或连接断开），此时会话不可再用。"""
+    err_msg = str(exc)
+    return "terminated unexpectedly" in err_msg or "No SAS process attached" in err_msg
+
 
 # 修改路径为 Windows 格式（用于在 Windows 上读取 Linux 侧生成的日志）
 def convert_linux_path_to_windows(linux_path):
@@ -32,7 +55,21 @@ def convert_windows_path_to_linux(windows_path):
         return LINUX_PATH_PREFIX + p[3:].lstrip('/')
     return p
 
-# 审核：ERROR:: 或 ERROR:；WARNING:: 或 WARNING:
+def to_local_path(linux_path):
+    """Linux 侧路径转为本机可读路径：Linux 下原样返回，Windows 下映射到 Z:。"""
+    return linux_path if IS_LINUX else convert_linux_path_to_windows(linux_path)
+
+
+def get_log_output_path(sas_file_path):
+    """run_sas 为该程序写日志的位置（Linux 路径）：06_programs/09_validation 下写到 07_logs，其余与程序同目录。"""
+    sas_file_path_linux = convert_windows_path_to_linux(sas_file_path)
+    sas_file_name_no_ext = os.path.splitext(os.path.basename(sas_file_path_linux))[0]
+    base_path = os.path.dirname(sas_file_path_linux)
+    if '06_programs' in sas_file_path_linux or '09_validation' in sas_file_path_linux:
+        return f"{base_path}/07_logs/{sas_file_name_no_ext}.log"
+    return f"{base_path}/{sas_file_name_no_ext}.log"
+
+# 审核：ERROR:: 或 ERROR:；WARNING:: 或 WARNING:（日志审阅已统一改用 sas_log_scan，此处保留供外部引用）
 ERROR_PATTERN = re.compile(r'ERROR\s*::|ERROR\s*:', re.IGNORECASE)
 WARNING_PATTERN = re.compile(r'WARNING\s*::|WARNING\s*:', re.IGNORECASE)
 
@@ -103,26 +140,20 @@ def _review_log_content(log_content: str, source_label: str, on_window_close=Non
     if not (log_content or "").strip():
         return False
     print(log_content)
-    has_error = bool(ERROR_PATTERN.search(log_content))
-    has_warning = bool(WARNING_PATTERN.search(log_content))
-    if has_error or has_warning:
-        lines = log_content.splitlines(keepends=True)
-        highlight = []
-        for line in lines:
-            if ERROR_PATTERN.search(line):
-                highlight.append((line, 'error'))
-            elif WARNING_PATTERN.search(line):
-                highlight.append((line, 'warning'))
+    summary = scan_log_text(log_content, source_label)
+    issue = summary_has_issue(summary)
+    if issue:
+        highlight = hit_lines(summary, ISSUE_KINDS)
         if IS_LINUX:
             _print_log_review_console(highlight, source_label)
         else:
             _show_log_review_popup(highlight, source_label, on_window_close=on_window_close)
-    return has_error or has_warning
+    return issue
 
 
 def check_for_errors_in_log(log_file_path, fallback_log_content=None, on_window_close=None):
     """优先从日志文件读取；若文件不存在且提供了 fallback_log_content（如 saspy 返回的 LOG），则用其审阅。on_window_close：关闭审阅窗口时调用的回调（用于断开 SAS）。"""
-    actual_log_path = log_file_path if IS_LINUX else convert_linux_path_to_windows(log_file_path)
+    actual_log_path = to_local_path(log_file_path)
     try:
         with open(actual_log_path, 'r', encoding='utf-8', errors='replace') as log_file:
             log_content = log_file.read()
@@ -138,24 +169,148 @@ def check_for_errors_in_log(log_file_path, fallback_log_content=None, on_window_
         return False
 
 
-def run_sas(sas_file_path: str, sas_session=None, check_log=True) -> bool:
+class _LogTail:
+    """增量读取 proc printto 写出的日志文件，用 sas_log_scan 逐行分类 ERROR / WARNING。"""
+
+    def __init__(self, log_path):
+        self.path = log_path
+        self.offset = 0
+        self.pending = b''  # 尚未读到换行符的半行
+        self.lineno = 0
+        self.errors = 0
+        self.warnings = 0
+        # 提交前已存在的旧日志：在 printto new 覆盖之前不读取
+        try:
+            st = os.stat(log_path)
+            self.stale = (st.st_mtime, st.st_size)
+        except OSError:
+            self.stale = None
+
+    def poll(self, final=False):
+        """读取新增内容，返回新增行 [(lineno, line, kind)]，kind 为 'error' / 'warning' / None。final 时包含末尾半行。"""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return []
+        if self.stale is not None:
+            if (st.st_mtime, st.st_size) == self.stale:
+                return []
+            self.stale = None
+        if st.st_size < self.offset:
+            # 文件被截断重写，从头读取
+            self.offset, self.pending, self.lineno, self.errors, self.warnings = 0, b'', 0, 0, 0
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(self.offset)
+                data = f.read()
+        except OSError:
+            return []
+        self.offset += len(data)
+        chunks = (self.pending + data).split(b'\n')
+        self.pending = b'' if final else chunks.pop()
+        new_lines = []
+        for raw in chunks:
+            if final and not raw:
+                continue
+            line = raw.decode('utf-8', errors='replace').rstrip('\r')
+            self.lineno += 1
+            kind = primary_kind(classify_line(line), ISSUE_KINDS)
+            if kind == 'error':
+                self.errors += 1
+            elif kind == 'warning':
+                self.warnings += 1
+            new_lines.append((self.lineno, line, kind))
+        return new_lines
+
+
+def _submit_with_log_tail(sas, sas_code, log_output_path, on_progress=None, abort_on_error=False, cancel_event=None):
+    """
+    后台线程提交 sas_code，当前线程每隔 LOG_TAIL_INTERVAL 秒读取日志新增行并回调 on_progress(event)。
+    event 为 dict：kind 为 'error' / 'warning'（每条问题行一次）或 'progress'（每批新增行一次）/ 'done'，
+    另含 lineno、line、lines、errors、warnings、log_path。
+    abort_on_error：出现第一条 ERROR 即断开会话中止运行，并抛出 SASRunAborted。
+    cancel_event：threading.Event，被置位时同样断开会话中止运行（用于取消后台作业）。
+    """
+    tail = _LogTail(to_local_path(log_output_path))
+    outcome = {}
+
+    def worker():
+        try:
+            outcome['result'] = sas.submit(sas_code)
+        except Exception as e:
+            outcome['error'] = e
+
+    def emit(kind, lineno=None, line=None):
+        if on_progress:
+            on_progress({
+                'kind': kind, 'lineno': lineno, 'line': line, 'lines': tail.lineno,
+                'errors': tail.errors, 'warnings': tail.warnings, 'log_path': tail.path,
+            })
+
+    t = threading.Thread(target=worker, daemon=True)
+    t.start()
+    aborted = None
+    while True:
+        t.join(LOG_TAIL_INTERVAL)
+        finished = not t.is_alive()
+        new_lines = tail.poll(final=finished)
+        for lineno, line, kind in new_lines:
+            if kind:
+                emit(kind, lineno, line)
+            if kind == 'error' and abort_on_error and aborted is None:
+                aborted = "日志第 %d 行出现 ERROR，已中止运行：%s" % (lineno, line)
+        if new_lines:
+            emit('progress')
+        if finished:
+            break
+        if cancel_event is not None and cancel_event.is_set() and aborted is None:
+            aborted = "已取消运行。"
+        if aborted:
+            # 断开会话以中止服务器上的 SAS 进程，给提交线程少量时间退出
+            try:
+                sas.endsas()
+            except Exception:
+                pass
+            t.join(LOG_TAIL_INTERVAL * 10)
+            break
+    emit('done')
+    if aborted:
+        raise SASRunAborted(aborted)
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome.get('result')
+
+
+def review_sas_log(sas_file_path, fallback_log_content=None, on_window_close=None):
+    """审阅 run_sas 为该程序写的日志：有 ERROR/WARNING 时弹窗（Linux 下打印），否则提示运行成功。返回是否有问题。"""
+    has_issue = check_for_errors_in_log(
+        get_log_output_path(sas_file_path),
+        fallback_log_content=fallback_log_content,
+        on_window_close=on_window_close,
+    )
+    if has_issue:
+        print(f"SAS程序 {sas_file_path} 执行时出现错误或警告！")
+    else:
+        print(f"SAS程序 {sas_file_path} 执行成功。")
+        if not IS_LINUX:
+            messagebox.showinfo("完成", "恭喜您，程序已运行完成! 无ERROR/WARNING。")
+    return has_issue
+
+
+def run_sas(sas_file_path: str, sas_session=None, check_log=True, on_progress=None, abort_on_error=False,
+            cancel_event=None) -> bool:
     """根据给定的 sas_file_path 在 Linux SAS 上执行并可选择审核日志。
-    sas_session: 可选，若传入则复用该会话（用于连续执行多个 SAS 文件）；否则本函数内创建并在结束时关闭。
+    sas_session: 可选，若传入则复用该会话（用于连续执行多个 SAS 文件）；否则从进程级会话管理器借用预热的会话，结束后归还。
     check_log: 是否进行日志审阅（ERROR/WARNING）；提交多条 SAS 程序时可设为 False 以跳过。
+    on_progress: 可选回调，传入后以流式模式运行：边运行边读取日志，在调用方线程中推送进度事件（见 _submit_with_log_tail）。
+    abort_on_error: 流式模式下出现第一条 ERROR 即中止运行并抛出 SASRunAborted。
+    cancel_event: 可选 threading.Event，传入后同样以流式模式运行，置位即中止（后台作业取消用，见 sas_jobs）。
     返回: 是否有错误或警告（未审阅时返回 False）。
     支持传入 Windows 路径（Z:\\...）或 Linux 路径（/u01/...）；提交给 SAS 时统一转为 Linux 路径，日志才能写到服务器并可通过 Z: 读取。
     """
-    macro_file_path = '/u01/app/sas/sas9.4/DocumentRepository/DDT/projects/utility/macros/01_general/autorun.sas'
-
     # 提交给 SAS 的必须为 Linux 路径，否则日志写不到 Z: 对应目录
     sas_file_path_linux = convert_windows_path_to_linux(sas_file_path)
-    sas_file_name_no_ext = os.path.splitext(os.path.basename(sas_file_path_linux))[0]
-    base_path = os.path.dirname(sas_file_path_linux)
-
-    if '06_programs' in sas_file_path_linux or '09_validation' in sas_file_path_linux:
-        log_output_path = f"{base_path}/07_logs/{sas_file_name_no_ext}.log"
-    else:
-        log_output_path = f"{base_path}/{sas_file_name_no_ext}.log"
+    log_output_path = get_log_output_path(sas_file_path_linux)
 
     #print(f"日志保存于 {log_output_path} 。\n")
 
@@ -164,7 +319,7 @@ proc printto log='{log_output_path}' new;
 run;
 
 %let _sasprogramfile = '{sas_file_path_linux}';
-%include '{macro_file_path}';
+%include '{AUTORUN_MACRO_PATH}';
 %include '{sas_file_path_linux}';
 
 proc printto; /* 恢复日志输出到默认位置 */
@@ -173,42 +328,46 @@ run;
 
     own_session = sas_session is None
     if own_session:
-        sas = saspy.SASsession(cfgname='winiomlinux')
+        # 从进程级会话管理器借用已预热的会话，结束后归还而非断开
+        from sas_session_pool import get_session_manager
+        manager = get_session_manager()
+        sas = manager.acquire()
     else:
         sas = sas_session
 
     session_ended = [False]  # 用列表以便在闭包中修改
+    session_broken = [False]
 
     def on_log_window_close():
-        """关闭日志审阅窗口时断开 SAS 会话（仅本函数创建的会话）。"""
+        """关闭日志审阅窗口时归还 SAS 会话（仅本函数借用的会话）。"""
         if not session_ended[0] and own_session:
             session_ended[0] = True
-            try:
-                sas.endsas()
-            except Exception:
-                pass
+            manager.release(sas)
 
     try:
-        sas_output = sas.submit(sas_code)
+        try:
+            if on_progress is not None or abort_on_error or cancel_event is not None:
+                sas_output = _submit_with_log_tail(
+                    sas, sas_code, log_output_path, on_progress, abort_on_error, cancel_event
+                )
+            else:
+                sas_output = sas.submit(sas_code)
+        except Exception as e:
+            # SAS 进程被终止或被中止：归还时通知管理器断开并后台重连，异常照常抛给调用方
+            session_broken[0] = isinstance(e, SASRunAborted) or is_session_terminated_error(e)
+            raise
         if not check_log:
             print(f"SAS程序 {sas_file_path} 已提交执行。")
             return False
         log_from_sas = sas_output.get('LOG', '') if isinstance(sas_output, dict) else ''
-        has_issue = check_for_errors_in_log(
-            log_output_path,
+        return review_sas_log(
+            sas_file_path,
             fallback_log_content=log_from_sas,
             on_window_close=on_log_window_close if own_session else None,
         )
-        if has_issue:
-            print(f"SAS程序 {sas_file_path} 执行时出现错误或警告！")
-        else:
-            print(f"SAS程序 {sas_file_path} 执行成功。")
-            if not IS_LINUX:
-                messagebox.showinfo("完成", "恭喜您，程序已运行完成! 无ERROR/WARNING。")
-        return has_issue
     finally:
         if own_session and not session_ended[0]:
-            sas.endsas()
+            manager.release(sas, broken=session_broken[0])
 
 
 def main():
@@ -224,7 +383,7 @@ def main():
         run_sas(paths[0])
         return
     # 多个文件：共用一个 SAS 会话依次执行，不进行日志检查
-    sas = saspy.SASsession(cfgname='winiomlinux')
+    sas = saspy.SASsession(cfgname=SAS_CFGNAME)
     try:
         for i, sas_file_path in enumerate(paths, 1):
             print(f"\n[{i}/{len(paths)}] 执行: {sas_file_path}")
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+项目日志审计（独立模块，无需 SAS 会话）
+
+扫描 <项目>/07_logs 下全部 .log：变化的日志在进程池中并行交给 sas_log_scan 扫描，
+结果按 (文件名, 大小, mtime) 缓存在 07_logs/_log_audit_cache.json，重复审计只扫描新增或变化的日志。
+汇总写为 07_logs/log_audit_summary.xml（Excel XML 表格），在 Log Check 的 XML 列表中双击即用 Excel 打开。
+"""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import escape
+
+from sas_log_scan import LOG_RULES, ISSUE_KINDS, scan_log_file
+
+AUDIT_CACHE_FILE = "_log_audit_cache.json"
+AUDIT_XML_FILE = "log_audit_summary.xml"
+
+# 变化的日志少于该数量时直接在本进程扫描（进程启动开销大于收益）
+_MIN_FILES_FOR_POOL = 16
+
+# 缓存格式版本：LOG_RULES 变化后旧缓存作废
+_CACHE_VERSION = "|".join(kind for kind, _ in LOG_RULES)
+
+
+def _audit_one(path):
+    """扫描单个日志，返回紧凑记录（进程池工作函数，须为模块级函数）。"""
+    summary = scan_log_file(path)
+    first_text = {}
+    for _, line, kinds in summary["hits"]:
+        for kind in kinds:
+            first_text.setdefault(kind, line.strip())
+    return {
+        "lines": summary["lines"],
+        "counts": summary["counts"],
+        "first_line": summary["first_line"],
+        "first_text": first_text,
+    }
+
+
+def _load_cache(cache_path):
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get("version") != _CACHE_VERSION:
+        return {}
+    return cache.get("files", {})
+
+
+def _save_cache(cache_path, files):
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": _CACHE_VERSION, "files": files}, f, ensure_ascii=False)
+    os.replace(tmp_path, cache_path)
+
+
+def audit_logs(logs_dir, workers=None):
+    """
+    审计 logs_dir 下全部 .log，返回按文件名排序的记录列表（每条含 name 及 _audit_one 的字段）。
+    workers：进程数，默认 os.cpu_count()。
+    """
+    entries = {}
+    with os.scandir(logs_dir) as it:
+        for entry in it:
+            if entry.is_file() and entry.name.lower().endswith(".log"):
+                st = entry.stat()
+                entries[entry.name] = (entry.path, st.st_size, st.st_mtime)
+
+    cache_path = os.path.join(logs_dir, AUDIT_CACHE_FILE)
+    cached = _load_cache(cache_path)
+    files = {}
+    stale = []
+    for name, (path, size, mtime) in entries.items():
+        hit = cached.get(name)
+        if hit and hit.get("size") == size and hit.get("mtime") == mtime:
+            files[name] = hit
+        else:
+            stale.append(name)
+
+    if stale:
+        paths = [entries[name][0] for name in stale]
+        if len(stale) < _MIN_FILES_FOR_POOL:
+            records = [_audit_one(p) for p in paths]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                records = list(pool.map(_audit_one, paths, chunksize=8))
+        for name, record in zip(stale, records):
+            _, size, mtime = entries[name]
+            files[name] = {"size": size, "mtime": mtime, "record": record}
+
+    if stale or set(cached) != set(files):
+        try:
+            _save_cache(cache_path, files)
+        except OSError:
+            pass
+    return [dict(files[name]["record"], name=name) for name in sorted(files, key=str.lower)]
+
+
+def _log_status(record):
+    counts = record["counts"]
+    if counts.get("error"):
+        return "ERROR"
+    if counts.get("warning"):
+        return "WARNING"
+    if counts:
+        return "NOTE"
+    return "Clean"
+
+
+def write_audit_xml(xml_path, records):
+    """将审计记录写为 Excel XML 表格（SpreadsheetML），每个日志一行。"""
+    note_kinds = [kind for kind, _ in LOG_RULES if kind not in ISSUE_KINDS]
+    header = ["Log", "Status", "Lines", "ERROR", "First ERROR Line", "WARNING", "First WARNING Line"] + note_kinds + ["First Issue"]
+
+    def cell(value, style=None):
+        style_attr = ' ss:StyleID="%s"' % style if style else ""
+        if isinstance(value, int):
+            return '<Cell%s><Data ss:Type="Number">%d</Data></Cell>' % (style_attr, value)
+        return '<Cell%s><Data ss:Type="String">%s</Data></Cell>' % (style_attr, escape(str(value)))
+
+    rows = ["<Row>" + "".join(cell(h, "h") for h in header) + "</Row>"]
+    for rec in records:
+        counts, first_line, first_text = rec["counts"], rec["first_line"], rec["first_text"]
+        status = _log_status(rec)
+        style = {"ERROR": "e", "WARNING": "w"}.get(status)
+        issue_kind = "error" if counts.get("error") else ("warning" if counts.get("warning") else None)
+        values = [
+            rec["name"], status, rec["lines"],
+            counts.get("error", 0), first_line.get("error", ""),
+            counts.get("warning", 0), first_line.get("warning", ""),
+        ] + [counts.get(k, 0) for k in note_kinds] + [first_text.get(issue_kind, "") if issue_kind else ""]
+        rows.append("<Row>" + "".join(cell(v, style if i < 2 else None) for i, v in enumerate(values)) + "</Row>")
+
+    content = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<?mso-application progid="Excel.Sheet"?>\n'
+        '<Workbook xmlns="urn:schemas-microsoft-com:office:spreadsheet" '
+        'xmlns:ss="urn:schemas-microsoft-com:office:spreadsheet">\n'
+        '<Styles>'
+        '<Style ss:ID="h"><Font ss:Bold="1"/><Interior ss:Color="#DDEBF7" ss:Pattern="Solid"/></Style>'
+        '<Style ss:ID="e"><Font ss:Color="#CC0000"/></Style>'
+        '<Style ss:ID="w"><Font ss:Color="#008000"/></Style>'
+        '</Styles>\n'
+        '<Worksheet ss:Name="Log Audit"><Table>\n' + "\n".join(rows) + '\n</Table>'
+        '<WorksheetOptions xmlns="urn:schemas-microsoft-com:office:excel">'
+        '<FreezePanes/><SplitHorizontal>1</SplitHorizontal><TopRowBottomPane>1</TopRowBottomPane>'
+        '</WorksheetOptions></Worksheet>\n</Workbook>\n'
+    )
+    with open(xml_path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def audit_project_logs(base_path, workers=None):
+    """
+    审计 <base_path>/07_logs 并写出汇总 XML，返回 (xml 路径, 记录列表)。
+    07_logs 不存在时抛出 FileNotFoundError。
+    """
+    logs_dir = os.path.join(base_path, "07_logs")
+    if not os.path.isdir(logs_dir):
+        raise FileNotFoundError("未找到日志目录：%s" % logs_dir)
+    records = audit_logs(logs_dir, workers=workers)
+    xml_path = os.path.join(logs_dir, AUDIT_XML_FILE)
+    write_audit_xml(xml_path, records)
+    return xml_path, records
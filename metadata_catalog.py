@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+项目元数据目录缓存（独立模块）
+
+EDCDEF_ecrf、EDCDEF_code、ADaM 说明文件等项目元数据会被多个功能（初版TOC、PDT、Metadata Setup）反复使用，
+各自从共享盘完整读取一遍既慢又重复。catalog() 返回进程内共享的 MetadataCatalog：
+- table(path)：读取数据集（.sas7bdat 用 pyreadstat，.xlsx/.xls 用 pandas）为 DataFrame，每个文件只读一次；
+- get(path, key, build)：缓存由文件派生的结果（如 AdamSpec、read_edcdef_code 的分组结果）；
+两者均按绝对路径 + 文件 mtime、大小失效，文件更新后下一次访问自动重新读取。
+安装了 pyarrow 时，table 另在 cache 目录（见 file_cache.cache_dir）写一份 feather 副本，进程重启后不必再从共享盘解析；
+未安装或写入失败时只使用内存缓存。
+返回的 DataFrame 与派生结果为共享对象，调用方只读、勿原地修改。
+"""
+import hashlib
+import os
+import threading
+
+from file_cache import cache_dir, prune_cache
+
+# feather 副本所在的 cache 子目录与文件名前缀
+DISK_CACHE_SUBDIR = "metadata"
+DISK_CACHE_NAMESPACE = "table"
+# feather 副本格式版本（读取方式变化时递增，使旧副本失效）
+DISK_CACHE_VERSION = 1
+
+
+def _file_signature(abs_path):
+    st = os.stat(abs_path)
+    return st.st_mtime_ns, st.st_size
+
+
+def _read_table(abs_path):
+    """按扩展名完整读取数据集；Excel 读取第一个 sheet（表头为第一行）。"""
+    ext = os.path.splitext(abs_path)[1].lower()
+    if ext == ".sas7bdat":
+        try:
+            import pyreadstat
+        except ImportError:
+            raise RuntimeError("读取 SAS 数据集需要 pyreadstat：pip install pyreadstat")
+        df, _ = pyreadstat.read_sas7bdat(abs_path)
+        return df
+    if ext in (".xlsx", ".xls"):
+        import pandas as pd
+        return pd.read_excel(abs_path, header=0)
+    raise ValueError("不支持的元数据文件类型：%s" % ext)
+
+
+class MetadataCatalog:
+    """按 (绝对路径, 键) 缓存元数据文件及其派生结果，文件 mtime 或大小变化时失效。"""
+
+    def __init__(self, disk_cache=True):
+        self.disk_cache = disk_cache
+        self._entries = {}  # (绝对路径, 键) -> (mtime_ns, 文件大小, 结果)
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def get(self, path, key, build):
+        """
+        返回 build(abs_path) 的结果；文件未变时直接使用缓存。
+        同一 (路径, 键) 并发访问时只构建一次，build 抛出的异常原样传给调用方（不缓存）。
+        """
+        abs_path = os.path.abspath(path)
+        entry_key = (abs_path, key)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(entry_key, threading.Lock())
+        with key_lock:
+            signature = _file_signature(abs_path)
+            with self._lock:
+                hit = self._entries.get(entry_key)
+            if hit is not None and hit[:2] == signature:
+                return hit[2]
+            value = build(abs_path)
+            with self._lock:
+                self._entries[entry_key] = signature + (value,)
+            return value
+
+    def table(self, path):
+        """读取数据集为 DataFrame（每个文件只读一次），见模块说明。"""
+        return self.get(path, "table", self._load_table)
+
+    def clear(self, path=None):
+        """清除内存缓存（path 为 None 时清除全部）；不删除磁盘副本。"""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                abs_path = os.path.abspath(path)
+                for entry_key in [k for k in self._entries if k[0] == abs_path]:
+                    del self._entries[entry_key]
+
+    def _disk_path(self, abs_path):
+        mtime_ns, size = _file_signature(abs_path)
+        h = hashlib.sha1(("%s|%d|%d|%s" % (os.path.normcase(abs_path), mtime_ns, size, DISK_CACHE_VERSION)).encode("utf-8"))
+        return os.path.join(cache_dir(), DISK_CACHE_SUBDIR, "%s_%s.feather" % (DISK_CACHE_NAMESPACE, h.hexdigest()))
+
+    def _load_table(self, abs_path):
+        if not self.disk_cache:
+            return _read_table(abs_path)
+        try:
+            import pandas as pd
+            import pyarrow  # noqa: F401  feather 读写依赖 pyarrow
+        except ImportError:
+            return _read_table(abs_path)
+        disk_path = self._disk_path(abs_path)
+        try:
+            return pd.read_feather(disk_path)
+        except Exception:
+            pass
+        df = _read_table(abs_path)
+        tmp_path = disk_path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(disk_path), exist_ok=True)
+            df.to_feather(tmp_path)
+            os.replace(tmp_path, disk_path)
+            prune_cache(os.path.dirname(disk_path), DISK_CACHE_NAMESPACE, ".feather")
+        except Exception:
+            # 列名非字符串、混合类型列等无法写为 feather 时只使用内存缓存
+            if os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+        return df
+
+
+_catalog = MetadataCatalog()
+
+
+def catalog():
+    """进程内共享的 MetadataCatalog（各功能共用，键为绝对路径，不同项目的文件互不影响）。"""
+    return _catalog
@@ -3,12 +3,20 @@
 基于 program_name.xlsx 与 generate_pdt.sas 的匹配思路，
 根据 PDT 中 Title / Output Reference 填写 Program Name 与 SYSPARM Value 列。
 """
+import hashlib
+import json
+import os
+import pickle
 import re
+import threading
+from collections import deque
 from pathlib import Path
 
 import pandas as pd
 from openpyxl import load_workbook
 
+from pdt_xlsx_patch import PatchUnsupported, XlsxPatch
+
 # program_name.xlsx 中使用的 sheet 及对应的 section（与 generate_pdt.sas 一致）
 PROGRAM_NAME_SHEETS = [
     "over",
@@ -29,6 +37,16 @@ OUTREF_TO_SECTION = [
 ]
 # 标题/程序/参数 多值分隔符（与 SAS &esc. 对应，用不常见字符避免与标题内容冲突）
 ESC = "\x1e"
+# 各 section 匹配时要求同时出现的标题层数（未列出的按单层处理）
+SECTION_TITLE_LEVELS = {"14.3.1": 3, "14.3.4": 3, "14.3.2": 2, "14.3.5": 2}
+# 编译索引格式版本（解析 / 索引结构变化时递增，使旧索引失效）
+PROGRAM_NAME_INDEX_VERSION = 3
+# 共享索引文件名：program_name.xlsx 同目录下的 program_name.xlsx.<lng>.index.json（只含纯数据，见 _plain_index）
+PROGRAM_NAME_INDEX_SUFFIX = ".index.json"
+
+# 进程内已加载的索引：(绝对路径, lng) -> (mtime_ns, size, program_data)
+_index_memo = {}
+_index_memo_lock = threading.Lock()
 
 
 def _compress(s):
@@ -53,18 +71,23 @@ def _find_col(df, *candidates):
     return None
 
 
-def load_program_name_excel(excel_path, lng="cn"):
-    """
-    读取 program_name.xlsx，构建：
-    - over: list of dict {title, pgm, sysparm}
-    - sections: dict section -> list of dict {title1, title2, title3, pgm1, pgm2, pgm3, sysparm1, sysparm2, sysparm3}
-    lng: 'cn' | 'en'，决定用 title_shell_cn 还是 title_shell_en。
-    """
-    excel_path = Path(excel_path)
-    if not excel_path.exists():
-        raise FileNotFoundError(f"program_name.xlsx 不存在: {excel_path}")
+def _column_strings(df, col_name, strip=True):
+    """整列转为字符串列表：空值为 ""，其余 str(v).strip()（与逐行 _val 相同）；列不存在时全为 ""。"""
+    if col_name is None:
+        return [""] * len(df)
+    s = df[col_name].astype(object)
+    out = s.where(s.notna(), "").map(str)
+    if strip:
+        out = out.str.strip()
+    return out.tolist()
+
+
+def _parse_program_name_excel(excel_path, lng="cn"):
+    """一次读入 program_name.xlsx 的全部所需 sheet，按列批量构建 over / sections（见 load_program_name_excel）。"""
+    with pd.ExcelFile(excel_path) as xl:
+        sheets = [sheet for sheet in PROGRAM_NAME_SHEETS if sheet in xl.sheet_names]
+        frames = pd.read_excel(xl, sheet_name=sheets) if sheets else {}
 
-    xl = pd.ExcelFile(excel_path)
     over = []
     sections = {}
 
@@ -72,10 +95,8 @@ def load_program_name_excel(excel_path, lng="cn"):
     title2_key = f"title2_shell_{lng.lower()}"
     title3_key = f"title3_shell_{lng.lower()}"
 
-    for sheet in PROGRAM_NAME_SHEETS:
-        if sheet not in xl.sheet_names:
-            continue
-        df = pd.read_excel(xl, sheet_name=sheet)
+    for sheet in sheets:
+        df = frames[sheet]
         if df.empty:
             continue
 
@@ -88,16 +109,12 @@ def load_program_name_excel(excel_path, lng="cn"):
             pgm_col = col("PGM_SHELL") or col("pgm_shell")
             sys_col = col("SYSPARM_SHELL") or col("sysparm_shell")
             if title_col and pgm_col:
-                for _, row in df.iterrows():
-                    t = row.get(title_col)
-                    p = row.get(pgm_col)
-                    sp = row.get(sys_col) if sys_col else ""
-                    if pd.notna(t) and str(t).strip():
-                        over.append({
-                            "title": _compress(t),
-                            "pgm": "" if pd.isna(p) else str(p).strip(),
-                            "sysparm": "" if pd.isna(sp) else str(sp).strip(),
-                        })
+                titles = _column_strings(df, title_col)
+                pgms = _column_strings(df, pgm_col)
+                sysparms = _column_strings(df, sys_col)
+                for t, p, sp in zip(titles, pgms, sysparms):
+                    if t:
+                        over.append({"title": _compress(t), "pgm": p, "sysparm": sp})
             continue
 
         section = SECTION_FROM_SHEET.get(sheet)
@@ -107,40 +124,24 @@ def load_program_name_excel(excel_path, lng="cn"):
         c1 = col("title_shell_cn") or col("title_shell_en")
         c2 = col("title2_shell_cn") or col("title2_shell_en")
         c3 = col("title3_shell_cn") or col("title3_shell_en")
-        p1 = col("pgm_shell")
-        p2 = col("pgm2_shell")
-        p3 = col("pgm3_shell")
-        s1 = col("sysparm_shell")
-        s2 = col("sysparm2_shell")
-        s3 = col("sysparm3_shell")
 
         # 优先使用 lng 指定列
         c1 = col(title_key) or c1
         c2 = col(title2_key) or c2
         c3 = col(title3_key) or c3
+        p1 = col("pgm_shell")
 
         if c1 is None and p1 is None:
             continue
 
-        def _val(r, col_name, default=""):
-            if col_name is None:
-                return default
-            v = r.get(col_name)
-            return default if (v is None or (isinstance(v, float) and pd.isna(v))) else str(v).strip()
-
-        rows = []
-        for _, row in df.iterrows():
-            rows.append({
-                "title1": _val(row, c1),
-                "title2": _val(row, c2),
-                "title3": _val(row, c3),
-                "pgm1": _val(row, p1),
-                "pgm2": _val(row, p2),
-                "pgm3": _val(row, p3),
-                "sysparm1": _val(row, s1),
-                "sysparm2": _val(row, s2),
-                "sysparm3": _val(row, s3),
-            })
+        fields = {
+            "title1": c1, "title2": c2, "title3": c3,
+            "pgm1": p1, "pgm2": col("pgm2_shell"), "pgm3": col("pgm3_shell"),
+            "sysparm1": col("sysparm_shell"), "sysparm2": col("sysparm2_shell"), "sysparm3": col("sysparm3_shell"),
+        }
+        keys = list(fields)
+        columns = [_column_strings(df, fields[k]) for k in keys]
+        rows = [dict(zip(keys, values)) for values in zip(*columns)]
 
         if section not in sections:
             sections[section] = []
@@ -167,6 +168,122 @@ def load_program_name_excel(excel_path, lng="cn"):
     return {"over": over, "sections": sections}
 
 
+def _compile_program_data(program_data):
+    """
+    预先构建全部 section 的标题索引及 over 标题的小写形式，供 match_pdt_row 直接使用。
+    program_data 可以是 _plain_index 的结果：其中已归一化的 titles / over_norm 直接使用，不再重复计算。
+    """
+    titles = program_data.pop("titles", None) or {}
+    matchers = program_data["matchers"] = {}
+    for section, shell_rows in program_data["sections"].items():
+        row_titles = titles.get(section)
+        if row_titles is not None and len(row_titles) != len(shell_rows):
+            row_titles = None
+        matchers[section] = _SectionMatcher(shell_rows, SECTION_TITLE_LEVELS.get(section, 1), row_titles)
+    over_norm = program_data.get("over_norm")
+    if not isinstance(over_norm, list) or len(over_norm) != len(program_data["over"]):
+        program_data["over_norm"] = [_lowcase(o["title"]) for o in program_data["over"]]
+    return program_data
+
+
+def _plain_index(program_data):
+    """编译索引中的纯数据部分（over 规则、各 section 的 shell 行及已归一化的标题），写入共享盘上的 JSON 索引。"""
+    return {
+        "over": program_data["over"],
+        "sections": program_data["sections"],
+        "over_norm": program_data["over_norm"],
+        "titles": {section: m.row_titles for section, m in program_data["matchers"].items()},
+    }
+
+
+def _load_pickle_index(index_path):
+    try:
+        with open(index_path, "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.PickleError, EOFError, AttributeError, ImportError, ValueError):
+        return None
+
+
+def _load_json_index(index_path):
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _read_index(index, st, source_sha1):
+    """校验已读入的索引；版本、大小不符或内容已变（mtime 变化时比对 SHA-1）返回 None。source_sha1() 惰性计算源文件哈希。"""
+    if not isinstance(index, dict) or index.get("version") != PROGRAM_NAME_INDEX_VERSION or index.get("size") != st.st_size:
+        return None
+    if index.get("mtime_ns") != st.st_mtime_ns and index.get("sha1") != source_sha1():
+        return None
+    return index.get("data")
+
+
+def load_program_name_excel(excel_path, lng="cn"):
+    """
+    读取 program_name.xlsx，构建：
+    - over: list of dict {title, pgm, sysparm}
+    - sections: dict section -> list of dict {title1, title2, title3, pgm1, pgm2, pgm3, sysparm1, sysparm2, sysparm3}
+    lng: 'cn' | 'en'，决定用 title_shell_cn 还是 title_shell_en。
+
+    返回的是编译好的索引（另含各 section 的标题索引 matchers 与 over_norm），按以下顺序取得：
+    进程内缓存 -> 本地 cache 目录中的 pickle -> 源文件旁的 <文件名>.<lng>.index.json -> 解析 Excel。
+    共享盘上的 JSON 索引只含纯数据（见 _plain_index），读入后在本地重建标题索引；pickle 只写在本地 cache 目录，
+    不从共享盘反序列化 pickle。索引按源文件大小、mtime（变化时再比对 SHA-1）及格式版本校验，源文件更新后自动重建。
+    """
+    from file_cache import cache_dir, file_sha1, save_json, save_pickle
+
+    excel_path = Path(excel_path)
+    if not excel_path.exists():
+        raise FileNotFoundError(f"program_name.xlsx 不存在: {excel_path}")
+    lng = lng.lower()
+    abs_path = os.path.abspath(str(excel_path))
+    st = os.stat(abs_path)
+
+    memo_key = (os.path.normcase(abs_path), lng)
+    with _index_memo_lock:
+        hit = _index_memo.get(memo_key)
+    if hit and hit[0] == st.st_mtime_ns and hit[1] == st.st_size:
+        return hit[2]
+
+    sha1_box = []
+
+    def source_sha1():
+        if not sha1_box:
+            sha1_box.append(file_sha1(abs_path))
+        return sha1_box[0]
+
+    sidecar_path = abs_path + "." + lng + PROGRAM_NAME_INDEX_SUFFIX
+    local_path = os.path.join(
+        cache_dir(),
+        "program_name_index_%s.pickle" % hashlib.sha1(("%s|%s" % (memo_key[0], lng)).encode("utf-8")).hexdigest())
+
+    program_data = _read_index(_load_pickle_index(local_path), st, source_sha1)
+    if program_data is None:
+        header = {
+            "version": PROGRAM_NAME_INDEX_VERSION,
+            "mtime_ns": st.st_mtime_ns,
+            "size": st.st_size,
+        }
+        plain = _read_index(_load_json_index(sidecar_path), st, source_sha1)
+        if plain is not None:
+            try:
+                program_data = _compile_program_data(plain)
+            except (KeyError, TypeError, AttributeError, ValueError):
+                program_data = None  # 结构不符（如被手工改动）时重新解析 Excel
+        if program_data is None:
+            program_data = _compile_program_data(_parse_program_name_excel(excel_path, lng=lng))
+            # 写在源文件旁供其他用户 / 其他研究共用（目录不可写时跳过）
+            save_json(sidecar_path, dict(header, sha1=source_sha1(), data=_plain_index(program_data)))
+        save_pickle(local_path, dict(header, sha1=source_sha1(), data=program_data))
+
+    with _index_memo_lock:
+        _index_memo[memo_key] = (st.st_mtime_ns, st.st_size, program_data)
+    return program_data
+
+
 def _get_section_from_outref(outref):
     """从 Output Reference 字符串解析出 section（14.1, 14.3.1, 16.2 等）。"""
     s = _compress(outref)
@@ -176,6 +293,104 @@ def _get_section_from_outref(outref):
     return None
 
 
+class _TitleAutomaton:
+    """Aho–Corasick 自动机：对文本扫描一遍，找出其中出现的全部标题片段（返回片段编号集合）。"""
+
+    def __init__(self, patterns):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        for pid, pattern in enumerate(patterns):
+            node = 0
+            for ch in pattern:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                    self._goto[node][ch] = nxt
+                node = nxt
+            self._out[node] += (pid,)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] += self._out[self._fail[nxt]]
+
+    def find_all(self, text):
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set()
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                found.update(out[node])
+        return found
+
+
+class _SectionMatcher:
+    """
+    单个 section 的标题索引：shell 各层标题只做一次 _lowcase，并编入 Aho–Corasick 自动机。
+    best_row 对 PDT 标题扫描一遍得到出现的全部标题片段，只对各层标题均出现的候选行计算剩余长度，
+    取剩余最短者（相同时取靠前的行，与 _match_* 的线性扫描一致）。
+    row_titles 为各行已归一化的各层标题（从 JSON 索引读入时传入），为 None 时由 shell_rows 计算。
+    """
+
+    def __init__(self, shell_rows, levels, row_titles=None):
+        keys = ("title1", "title2", "title3")[:levels]
+        if row_titles is None:
+            row_titles = [[_lowcase(r[k]) for k in keys] for r in shell_rows]
+        self.row_titles = row_titles
+        vocab = {}
+        self._by_first = {}  # 第一层标题编号 -> [(行号, 各层编号, 各层标题)]
+        for row_idx, titles in enumerate(row_titles):
+            titles = tuple(titles)
+            if len(titles) != len(keys):
+                raise ValueError("标题层数与 section 不符")
+            if not all(titles):
+                continue
+            ids = tuple(vocab.setdefault(t, len(vocab)) for t in titles)
+            self._by_first.setdefault(ids[0], []).append((row_idx, ids, titles))
+        self._automaton = _TitleAutomaton(list(vocab))
+
+    def best_row(self, outtitle_norm):
+        """返回最佳匹配的 shell 行号，无匹配返回 None。"""
+        present = self._automaton.find_all(outtitle_norm)
+        candidates = []
+        for pid in present:
+            candidates.extend(self._by_first.get(pid, ()))
+        candidates.sort()
+        best = None
+        for row_idx, ids, titles in candidates:
+            if not present.issuperset(ids):
+                continue
+            remain = outtitle_norm
+            for t in titles:
+                remain = remain.replace(t, "", 1)
+            len_remain = len(_compress(remain))
+            if best is None or len_remain < best[1]:
+                best = (row_idx, len_remain)
+        return best[0] if best else None
+
+
+def _get_section_matcher(program_data, section):
+    """取（必要时构建）section 的标题索引，缓存在 program_data["matchers"] 中。"""
+    matchers = program_data.setdefault("matchers", {})
+    matcher = matchers.get(section)
+    if matcher is None:
+        matcher = _SectionMatcher(program_data["sections"][section], SECTION_TITLE_LEVELS.get(section, 1))
+        matchers[section] = matcher
+    return matcher
+
+
 def _match_single_level(outtitle_norm, shell_rows, outtype, outpop):
     """单层匹配：14.1 / 16.2。返回 (pgmnamdv, outsysp, len_remain) 或 None。"""
     best = None
@@ -310,6 +525,12 @@ def match_pdt_row(outref, outtitle, outtype, outpop, program_data, lng="cn"):
     if not shell_rows:
         return "", ""
 
+    # 先用 section 标题索引选出最佳 shell 行，再由对应层级的 _match_* 对该行生成程序名与 SYSPARM
+    row_idx = _get_section_matcher(program_data, section).best_row(outtitle_norm)
+    if row_idx is None:
+        return "", ""
+    shell_rows = [shell_rows[row_idx]]
+
     best = None
     if section in ("14.1", "16.2"):
         best = _match_single_level(outtitle_norm, shell_rows, outtype, outpop)
@@ -329,11 +550,13 @@ def match_pdt_row(outref, outtitle, outtype, outpop, program_data, lng="cn"):
         return "", ""
 
     # Over 叠加：若 Title 包含 over 的 title，则程序名后追加 _over_pgm，并合并 over_sys
-    for o in over_list:
+    over_norm = program_data.get("over_norm") or [_lowcase(o["title"]) for o in over_list]
+    outtitle_compressed = _compress(outtitle_orig)
+    for o, ot_norm in zip(over_list, over_norm):
         ot = o["title"]
         if not ot:
             continue
-        if _compress(outtitle_orig).find(ot) >= 0 or outtitle_norm.find(_lowcase(ot)) >= 0:
+        if outtitle_compressed.find(ot) >= 0 or outtitle_norm.find(ot_norm) >= 0:
             if o.get("pgm"):
                 pgmnamdv = f"{pgmnamdv}_{o['pgm']}"
             if o.get("sysparm"):
@@ -353,6 +576,112 @@ def _normalize_header(val):
     return " ".join(s.split())
 
 
+def _fill_pdt(
+    pdt_path,
+    program_data,
+    lng="cn",
+    sheet_name="Deliverables",
+    program_name_col="Program Name",
+    sysparm_col="SYSPARM Value",
+    backup=True,
+    save_unchanged=True,
+):
+    """
+    填写单个 PDT，返回统计 dict：
+    path、ok、message、outputs（Output 行数）、filled（匹配到的行数）、changed（值有变化的行数）、
+    unmatched（未匹配的行数）、details（[{row, outref, title, status, old_pgm, new_pgm, old_sysparm, new_sysparm}]，
+    status 为 changed / unmatched）。
+    save_unchanged=False 时无变化的 PDT 不备份、不写回。
+    """
+    stats = {
+        "path": str(pdt_path), "ok": False, "message": "",
+        "outputs": 0, "filled": 0, "changed": 0, "unmatched": 0, "details": [],
+    }
+    pdt_path = Path(pdt_path)
+    if not pdt_path.exists():
+        stats["message"] = f"PDT 文件不存在: {pdt_path}"
+        return stats
+
+    # 优先只改写目标 sheet 的 XML（XlsxPatch），结构不支持时回退到 openpyxl 整体读写
+    args = (pdt_path, program_data, lng, sheet_name, program_name_col, sysparm_col, backup, save_unchanged)
+    try:
+        return _fill_pdt_workbook(XlsxPatch(pdt_path), dict(stats, details=[]), *args)
+    except PatchUnsupported:
+        return _fill_pdt_workbook(load_workbook(pdt_path, data_only=False), dict(stats, details=[]), *args)
+
+
+def _fill_pdt_workbook(wb, stats, pdt_path, program_data, lng, sheet_name, program_name_col, sysparm_col,
+                       backup, save_unchanged):
+    """_fill_pdt 的读写部分：wb 为 openpyxl Workbook 或 XlsxPatch，stats 为初始统计 dict。"""
+    try:
+        if sheet_name not in wb.sheetnames:
+            stats["message"] = f"PDT 中未找到 sheet: {sheet_name}"
+            return stats
+
+        ws = wb[sheet_name]
+        header_row, col_name_to_idx = _find_header_row_and_cols(ws, program_name_col, sysparm_col)
+        if header_row is None or "Category" not in col_name_to_idx:
+            stats["message"] = "Deliverables 中未找到表头（Category 等）"
+            return stats
+
+        cat_col = col_name_to_idx.get("Category")
+        outref_col = col_name_to_idx.get("Output Reference")
+        title_col = col_name_to_idx.get("Title")
+        outtype_col = col_name_to_idx.get("Output Type")
+        outpop_col = col_name_to_idx.get("Population")
+        pgm_col = col_name_to_idx.get(program_name_col) or col_name_to_idx.get("Program Name")
+        sysparm_out_col = col_name_to_idx.get(sysparm_col) or col_name_to_idx.get("SYSPARM Value")
+
+        if not outref_col or not title_col:
+            stats["message"] = "未找到 Output Reference 或 Title 列"
+            return stats
+        if not pgm_col or not sysparm_out_col:
+            stats["message"] = "未找到 Program Name 或 SYSPARM Value 列，请确认 PDT 表头包含这两列"
+            return stats
+
+        for row_idx in range(header_row + 1, ws.max_row + 1):
+            cat_val = ws.cell(row=row_idx, column=cat_col).value
+            if cat_val is None or _normalize_header(cat_val) != "Output":
+                continue
+            stats["outputs"] += 1
+            outref = ws.cell(row=row_idx, column=outref_col).value
+            outtitle = ws.cell(row=row_idx, column=title_col).value
+            outtype = ws.cell(row=row_idx, column=outtype_col).value if outtype_col else ""
+            outpop = ws.cell(row=row_idx, column=outpop_col).value if outpop_col else ""
+            pgmnamdv, outsysp = match_pdt_row(outref, outtitle, outtype, outpop, program_data, lng=lng)
+            pgm_cell = ws.cell(row=row_idx, column=pgm_col)
+            sysparm_cell = ws.cell(row=row_idx, column=sysparm_out_col)
+            detail = {
+                "row": row_idx, "outref": outref or "", "title": outtitle or "",
+                "old_pgm": pgm_cell.value or "", "old_sysparm": sysparm_cell.value or "",
+                "new_pgm": pgmnamdv, "new_sysparm": outsysp,
+            }
+            if pgmnamdv or outsysp:
+                stats["filled"] += 1
+                if (detail["old_pgm"], detail["old_sysparm"]) != (pgmnamdv, outsysp):
+                    stats["changed"] += 1
+                    stats["details"].append(dict(detail, status="changed"))
+                pgm_cell.value = pgmnamdv
+                sysparm_cell.value = outsysp
+            else:
+                stats["unmatched"] += 1
+                stats["details"].append(dict(detail, status="unmatched", new_pgm="", new_sysparm=""))
+
+        if stats["changed"] or save_unchanged:
+            if backup:
+                try:
+                    from tfls_pdt_gen import _backup_pdt
+                    _backup_pdt(str(pdt_path))
+                except Exception:
+                    pass
+            wb.save(pdt_path)
+    finally:
+        wb.close()
+    stats["ok"] = True
+    stats["message"] = f"已根据 Title 填写 Program Name 与 SYSPARM Value，共处理 {stats['filled']} 行 Output。"
+    return stats
+
+
 def fill_pdt_program_and_sysparm(
     pdt_path,
     program_name_path,
@@ -361,6 +690,7 @@ def fill_pdt_program_and_sysparm(
     program_name_col="Program Name",
     sysparm_col="SYSPARM Value",
     backup=True,
+    program_data=None,
 ):
     """
     读取 PDT 的 Deliverables sheet，对 Category=Output 的每一行，
@@ -374,70 +704,110 @@ def fill_pdt_program_and_sysparm(
         program_name_col: 程序名列的显示名，默认 "Program Name"
         sysparm_col: SYSPARM 列的显示名，默认 "SYSPARM Value"
         backup: 是否在写回前备份到 99_archive
+        program_data: 已加载的 program_name 索引（批量填写时共用），为 None 时从 program_name_path 加载
 
     Returns:
         (success: bool, message: str)
     """
-    try:
-        program_data = load_program_name_excel(program_name_path, lng=lng)
-    except Exception as e:
-        return False, f"读取 program_name.xlsx 失败: {e}"
+    if program_data is None:
+        try:
+            program_data = load_program_name_excel(program_name_path, lng=lng)
+        except Exception as e:
+            return False, f"读取 program_name.xlsx 失败: {e}"
 
-    pdt_path = Path(pdt_path)
-    if not pdt_path.exists():
-        return False, f"PDT 文件不存在: {pdt_path}"
+    stats = _fill_pdt(
+        pdt_path, program_data, lng=lng, sheet_name=sheet_name,
+        program_name_col=program_name_col, sysparm_col=sysparm_col, backup=backup,
+    )
+    return stats["ok"], stats["message"]
 
-    if backup:
-        try:
-            from tfls_pdt_gen import _backup_pdt
-            _backup_pdt(str(pdt_path))
-        except Exception:
-            pass
 
-    wb = load_workbook(pdt_path, data_only=False)
-    if sheet_name not in wb.sheetnames:
-        wb.close()
-        return False, f"PDT 中未找到 sheet: {sheet_name}"
+# ---------- 批量填写 ----------
 
-    ws = wb[sheet_name]
-    header_row, col_name_to_idx = _find_header_row_and_cols(ws, program_name_col, sysparm_col)
-    if header_row is None or "Category" not in col_name_to_idx:
-        wb.close()
-        return False, "Deliverables 中未找到表头（Category 等）"
+# 进程池工作进程中共用的 program_name 索引（由 _init_batch_worker 设置）
+_worker_program_data = None
 
-    cat_col = col_name_to_idx.get("Category")
-    outref_col = col_name_to_idx.get("Output Reference")
-    title_col = col_name_to_idx.get("Title")
-    outtype_col = col_name_to_idx.get("Output Type")
-    outpop_col = col_name_to_idx.get("Population")
-    pgm_col = col_name_to_idx.get(program_name_col) or col_name_to_idx.get("Program Name")
-    sysparm_out_col = col_name_to_idx.get(sysparm_col) or col_name_to_idx.get("SYSPARM Value")
 
-    if not outref_col or not title_col:
-        wb.close()
-        return False, "未找到 Output Reference 或 Title 列"
-    if not pgm_col or not sysparm_out_col:
-        wb.close()
-        return False, "未找到 Program Name 或 SYSPARM Value 列，请确认 PDT 表头包含这两列"
+def find_pdt_files(root):
+    """在 root 下递归查找 *_PDT.xlsx（跳过 Excel 临时文件 ~$* 与 99_archive 备份目录），按路径排序。"""
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d != "99_archive"]
+        for name in filenames:
+            if name.lower().endswith("_pdt.xlsx") and not name.startswith("~$"):
+                found.append(os.path.join(dirpath, name))
+    return sorted(found)
 
-    filled = 0
-    for row_idx in range(header_row + 1, ws.max_row + 1):
-        cat_val = ws.cell(row=row_idx, column=cat_col).value
-        if cat_val is None or _normalize_header(cat_val) != "Output":
-            continue
-        outref = ws.cell(row=row_idx, column=outref_col).value
-        outtitle = ws.cell(row=row_idx, column=title_col).value
-        outtype = ws.cell(row=row_idx, column=outtype_col).value if outtype_col else ""
-        outpop = ws.cell(row=row_idx, column=outpop_col).value if outpop_col else ""
-        pgmnamdv, outsysp = match_pdt_row(outref, outtitle, outtype, outpop, program_data, lng=lng)
-        if pgmnamdv or outsysp:
-            ws.cell(row=row_idx, column=pgm_col, value=pgmnamdv)
-            ws.cell(row=row_idx, column=sysparm_out_col, value=outsysp)
-            filled += 1
 
-    wb.save(pdt_path)
-    wb.close()
-    return True, f"已根据 Title 填写 Program Name 与 SYSPARM Value，共处理 {filled} 行 Output。"
+def _init_batch_worker(program_data):
+    global _worker_program_data
+    _worker_program_data = program_data
+
+
+def _fill_pdt_worker(pdt_path, lng, backup):
+    try:
+        return _fill_pdt(pdt_path, _worker_program_data, lng=lng, backup=backup, save_unchanged=False)
+    except Exception as e:
+        return {
+            "path": pdt_path, "ok": False, "message": f"填写失败: {e}",
+            "outputs": 0, "filled": 0, "changed": 0, "unmatched": 0, "details": [],
+        }
+
+
+def batch_fill_pdts(root, program_name_path, lng="cn", workers=None, backup=True, on_file_done=None):
+    """
+    批量填写 root 下全部 *_PDT.xlsx：program_name 索引只加载一次，经进程池初始化函数共享给各工作进程。
+    无变化的 PDT 不备份、不写回。on_file_done(stats, done_count, total) 每完成一个文件回调。
+    返回各 PDT 的统计 dict 列表（按路径排序，字段见 _fill_pdt）。
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    pdt_files = find_pdt_files(root)
+    if not pdt_files:
+        return []
+    program_data = load_program_name_excel(program_name_path, lng=lng)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(pdt_files)))
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker, initargs=(program_data,)) as pool:
+        futures = {pool.submit(_fill_pdt_worker, path, lng, backup): path for path in pdt_files}
+        for done_count, fut in enumerate(as_completed(futures), 1):
+            stats = fut.result()
+            results[futures[fut]] = stats
+            if on_file_done:
+                on_file_done(stats, done_count, len(pdt_files))
+    return [results[path] for path in pdt_files]
+
+
+def write_batch_report(results, report_path):
+    """
+    将批量填写结果写为汇总报告：每个 PDT 一行汇总（Summary），以及变化 / 未匹配的明细行（Details）。
+    report_path 为 .xlsx 时写两个 sheet，否则写 UTF-8 CSV（仅明细，含 PDT 路径列）。
+    """
+    summary = pd.DataFrame([
+        {
+            "PDT": r["path"], "Status": "OK" if r["ok"] else "FAILED", "Outputs": r["outputs"],
+            "Filled": r["filled"], "Changed": r["changed"], "Unmatched": r["unmatched"], "Message": r["message"],
+        }
+        for r in results
+    ])
+    details = pd.DataFrame(
+        [
+            {
+                "PDT": r["path"], "Row": d["row"], "Output Reference": d["outref"], "Title": d["title"],
+                "Status": d["status"], "Old Program Name": d["old_pgm"], "New Program Name": d["new_pgm"],
+                "Old SYSPARM Value": d["old_sysparm"], "New SYSPARM Value": d["new_sysparm"],
+            }
+            for r in results for d in r["details"]
+        ],
+        columns=["PDT", "Row", "Output Reference", "Title", "Status",
+                 "Old Program Name", "New Program Name", "Old SYSPARM Value", "New SYSPARM Value"],
+    )
+    if str(report_path).lower().endswith(".xlsx"):
+        with pd.ExcelWriter(report_path) as writer:
+            summary.to_excel(writer, sheet_name="Summary", index=False)
+            details.to_excel(writer, sheet_name="Details", index=False)
+    else:
+        details.to_csv(report_path, index=False, encoding="utf-8-sig")
 
 
 def _find_header_row_and_cols(ws, program_name_col="Program Name", sysparm_col="SYSPARM Value"):
@@ -459,14 +829,54 @@ def _find_header_row_and_cols(ws, program_name_col="Program Name", sysparm_col="
     return header_row, col_name_to_idx
 
 
+def main():
+    import argparse
+    import time
+
+    # 通过模块名导入，使写出的编译索引及进程池中的对象类路径为 pdt_fill_from_program_name 而非 __main__
+    import pdt_fill_from_program_name as mod
+
+    parser = argparse.ArgumentParser(
+        description="根据 program_name.xlsx 填写 PDT 的 Program Name 与 SYSPARM Value。"
+    )
+    parser.add_argument("target", help="PDT.xlsx 路径；--batch 时为搜索 *_PDT.xlsx 的根目录，如 Z:\\projects\\<compound>")
+    parser.add_argument("program_name", help="program_name.xlsx 路径")
+    parser.add_argument("lng", nargs="?", default="cn", help="cn | en，默认 cn")
+    parser.add_argument("--batch", action="store_true", help="批量模式：填写 target 下全部 *_PDT.xlsx")
+    parser.add_argument("--workers", type=int, default=None, help="批量模式的并行进程数，默认 CPU 核数")
+    parser.add_argument("--report", default=None, help="批量模式的汇总报告路径（.xlsx 或 .csv）")
+    args = parser.parse_args()
+
+    if not args.batch:
+        ok, msg = mod.fill_pdt_program_and_sysparm(args.target, args.program_name, lng=args.lng)
+        print(msg)
+        return 0 if ok else 1
+
+    def on_file_done(stats, done_count, total):
+        if stats["ok"]:
+            print("[%d/%d] %s: Output %d，填写 %d，变化 %d，未匹配 %d" % (
+                done_count, total, stats["path"], stats["outputs"], stats["filled"], stats["changed"], stats["unmatched"]))
+        else:
+            print("[%d/%d] %s: %s" % (done_count, total, stats["path"], stats["message"]))
+
+    start = time.time()
+    results = mod.batch_fill_pdts(args.target, args.program_name, lng=args.lng, workers=args.workers, on_file_done=on_file_done)
+    if not results:
+        print("未在 %s 下找到 *_PDT.xlsx" % args.target)
+        return 1
+    if args.report:
+        mod.write_batch_report(results, args.report)
+        print("汇总报告: %s" % args.report)
+    failed = [r for r in results if not r["ok"]]
+    print("完成 %d 个 PDT（失败 %d），填写 %d 行，变化 %d 行，未匹配 %d 行，用时 %.1f 秒。" % (
+        len(results), len(failed), sum(r["filled"] for r in results), sum(r["changed"] for r in results),
+        sum(r["unmatched"] for r in results), time.time() - start))
+    return 1 if failed else 0
+
+
 if __name__ == "__main__":
+    import multiprocessing
     import sys
-    if len(sys.argv) < 3:
-        print("用法: python pdt_fill_from_program_name.py <PDT.xlsx> <program_name.xlsx> [lng=cn]")
-        sys.exit(1)
-    pdt = sys.argv[1]
-    pnm = sys.argv[2]
-    lng = sys.argv[3] if len(sys.argv) > 3 else "cn"
-    ok, msg = fill_pdt_program_and_sysparm(pdt, pnm, lng=lng)
-    print(msg)
-    sys.exit(0 if ok else 1)
+
+    multiprocessing.freeze_support()
+    sys.exit(main())
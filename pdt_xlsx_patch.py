@@ -0,0 +1,670 @@
+# -*- coding: utf-8 -*-
+"""
+PDT xlsx 局部补丁写入（独立模块）
+
+openpyxl 的 load_workbook + save 会把整个 PDT（所有 sheet、样式、数据验证、图片等）完整读入再重新生成，
+共享盘上既慢，也可能丢失 openpyxl 不支持的内容。XlsxPatch 只解析并改写需要修改的 worksheet XML，
+其余部件按原内容原样写回：
+- 单元格：修改值（字符串写为 inlineStr，不改动 sharedStrings.xml）、复制样式编号 s、整行删除并上移（行属性、合并单元格、条件格式等区域随之调整）；
+- 数据验证：dataValidations 及扩展（extLst）中的 x14:dataValidations（Excel 保存时把引用其他 sheet 的验证放在这里）
+  一并解析为 openpyxl DataValidationList，增删 / 合并后整体序列化写回主 dataValidations；
+- 工作簿：calcPr（fullCalcOnLoad / calcMode / calcId）；行移动或覆盖公式时移除 calcChain.xml（Excel 打开时重建）。
+
+接口与 openpyxl Workbook / Worksheet 的常用子集一致（sheetnames、wb[name]、ws.cell、ws.iter_rows、ws[row]、
+ws.max_row、ws.data_validations、ws.add_data_validation、wb.calculation、wb.save、wb.close），调用方可共用同一套读写逻辑。
+遇到不支持的结构（如 Strict OOXML、带前缀的命名空间、移动共享 / 数组公式、日期值——t="d" 或数字格式为日期的单元格）
+抛出 PatchUnsupported，调用方应回退到 openpyxl。
+"""
+import html
+import os
+import posixpath
+import re
+import tempfile
+import zipfile
+import xml.etree.ElementTree as ET
+from bisect import bisect_left, bisect_right
+from xml.sax.saxutils import escape
+
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format
+from openpyxl.utils import column_index_from_string, get_column_letter, range_boundaries
+from openpyxl.utils.exceptions import IllegalCharacterError
+from openpyxl.worksheet.cell_range import MultiCellRange
+from openpyxl.worksheet.datavalidation import DataValidation, DataValidationList
+from openpyxl.xml.functions import tostring
+
+NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+NS_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+NS_X14 = "http://schemas.microsoft.com/office/spreadsheetml/2009/9/main"
+NS_XM = "http://schemas.microsoft.com/office/excel/2006/main"
+
+_ATTR_RE = re.compile(r"""([\w:.-]+)\s*=\s*(?:"([^"]*)"|'([^']*)')""")
+_SHEET_DATA_RE = re.compile(r"<sheetData\s*/>|<sheetData\b[^>]*>(.*?)</sheetData>", re.S)
+_ROW_RE = re.compile(r"<row\b([^>]*?)(?:/>|>(.*?)</row>)", re.S)
+_CELL_RE = re.compile(r"<c\b([^>]*?)(?:/>|>(.*?)</c>)", re.S)
+_FORMULA_RE = re.compile(r"<f\b([^>]*?)(?:/>|>(.*?)</f>)", re.S)
+_VALUE_RE = re.compile(r"<v>(.*?)</v>", re.S)
+_TEXT_RE = re.compile(r"<t\b[^>]*?(?:/>|>(.*?)</t>)", re.S)
+_PHONETIC_RE = re.compile(r"<rPh\b.*?</rPh>", re.S)
+_CELL_REF_RE = re.compile(r"([A-Z]{1,3})(\d+)$")
+_DIMENSION_RE = re.compile(r"<dimension\b[^>]*?/>")
+_DATA_VALIDATIONS_RE = re.compile(r"<dataValidations\b([^>]*?)(?:/>|>(.*?)</dataValidations>)", re.S)
+_WORKSHEET_TAG_RE = re.compile(r"<worksheet\b([^>]*?)/?>")
+_MERGE_CELLS_RE = re.compile(r"<mergeCells\b[^>]*?(?:/>|>(.*?)</mergeCells>)", re.S)
+_MERGE_CELL_RE = re.compile(r"<mergeCell\b([^>]*?)/>")
+_COND_FORMAT_RE = re.compile(r"<conditionalFormatting\b([^>]*?)>(.*?)</conditionalFormatting>", re.S)
+_HYPERLINK_RE = re.compile(r"<hyperlink\b([^>]*?)(?:/>|>.*?</hyperlink>)", re.S)
+_AUTO_FILTER_RE = re.compile(r"<autoFilter\b([^>]*?)(/?>)")
+_XM_SQREF_RE = re.compile(r"<xm:sqref>(.*?)</xm:sqref>", re.S)
+_X14_DATA_VALIDATIONS_EXT_RE = re.compile(r"<ext\b[^>]*>\s*<x14:dataValidations\b.*?</x14:dataValidations>\s*</ext>", re.S)
+_CALC_PR_RE = re.compile(r"<calcPr\b([^>]*?)(/?)>")
+_INT_RE = re.compile(r"-?\d+$")
+
+# worksheet 中位于 dataValidations 之后的元素（CT_Worksheet 顺序），新建 dataValidations 时插在其中第一个之前
+_AFTER_DATA_VALIDATIONS = (
+    "hyperlinks", "printOptions", "pageMargins", "pageSetup", "headerFooter", "rowBreaks", "colBreaks",
+    "customProperties", "cellWatches", "ignoredErrors", "smartTags", "drawing", "legacyDrawing",
+    "legacyDrawingHF", "drawingHF", "picture", "oleObjects", "controls", "webPublishItems", "tableParts", "extLst",
+)
+# workbook 中位于 calcPr 之后的元素（CT_Workbook 顺序）
+_AFTER_CALC_PR = (
+    "oleSize", "customWorkbookViews", "pivotCaches", "smartTagPr", "smartTagTypes", "webPublishing",
+    "fileRecoveryPr", "webPublishObjects", "extLst",
+)
+
+
+class PatchUnsupported(Exception):
+    """工作簿结构超出补丁写入的支持范围，调用方应回退到 openpyxl。"""
+
+
+def _parse_attrs(text):
+    """解析属性文本为有序 dict（值保持 XML 转义形式）。"""
+    return {m.group(1): m.group(2) if m.group(2) is not None else m.group(3) for m in _ATTR_RE.finditer(text or "")}
+
+
+def _format_attrs(attrs):
+    return "".join(' %s="%s"' % (k, v.replace('"', "&quot;")) for k, v in attrs.items())
+
+
+def _first_tag_position(text, names, default):
+    """text 中 names 任一元素第一次出现的位置；都不存在时返回 default。"""
+    m = re.search(r"<(?:%s)[\s/>]" % "|".join(names), text)
+    return m.start() if m else default
+
+
+def compact_range(ref, rows):
+    """
+    删除 rows（升序行号列表）中的行、其余行上移后，区域 ref（如 "A2:C9"、"B5"、整列 "A:C"、整行 "3:5"）的新区域。
+    区域内剩余的行上移后仍然连续；区域内的行全部被删除时返回 None。
+    """
+    min_col, min_row, max_col, max_row = range_boundaries(ref)
+    if min_row is None:  # 整列引用不受删除行影响
+        return ref
+    new_min = min_row - bisect_left(rows, min_row)
+    new_max = max_row - bisect_right(rows, max_row)
+    if new_max < new_min:
+        return None
+    if min_col is None:
+        return "%d:%d" % (new_min, new_max)
+    start = "%s%d" % (get_column_letter(min_col), new_min)
+    if (min_col, new_min) == (max_col, new_max):
+        return start
+    return "%s:%s%d" % (start, get_column_letter(max_col), new_max)
+
+
+def compact_sqref(sqref, rows):
+    """compact_range 的多区域（空格分隔，如数据验证 / 条件格式的 sqref）版本；全部区域被删除时返回空串。"""
+    return " ".join(r for r in (compact_range(ref, rows) for ref in str(sqref).split()) if r)
+
+
+def _x14_data_validation(node):
+    """x14:dataValidation 转为 openpyxl DataValidation（x14:formula1/xm:f、xm:sqref 改为主 dataValidation 的写法）。"""
+    el = ET.Element("{%s}dataValidation" % NS_MAIN, {k: v for k, v in node.attrib.items() if not k.startswith("{")})
+    for name in ("formula1", "formula2"):
+        f = node.find("{%s}%s/{%s}f" % (NS_X14, name, NS_XM))
+        if f is not None:
+            ET.SubElement(el, "{%s}%s" % (NS_MAIN, name)).text = f.text
+    sqref = node.find("{%s}sqref" % NS_XM)
+    el.set("sqref", (sqref.text or "") if sqref is not None else "")
+    return DataValidation.from_tree(el)
+
+
+def _resolve_target(base_part, target):
+    if target.startswith("/"):
+        return target.lstrip("/")
+    return posixpath.normpath(posixpath.join(posixpath.dirname(base_part), target))
+
+
+def _rels_path(part):
+    return posixpath.join(posixpath.dirname(part), "_rels", posixpath.basename(part) + ".rels")
+
+
+def _read_rels(zf, part):
+    """返回 [(Id, Type, 目标部件路径)]。"""
+    try:
+        root = ET.fromstring(zf.read(_rels_path(part)))
+    except KeyError:
+        return []
+    rels = []
+    for rel in root.iter("{%s}Relationship" % NS_PKG_REL):
+        if rel.get("TargetMode") == "External":
+            continue
+        rels.append((rel.get("Id"), rel.get("Type") or "", _resolve_target(part, rel.get("Target") or "")))
+    return rels
+
+
+def _shared_strings(data):
+    """解析 sharedStrings.xml：每个 si 的文本（富文本各段拼接，不含注音 rPh）。"""
+    root = ET.fromstring(data)
+    tag_t, tag_r = "{%s}t" % NS_MAIN, "{%s}r" % NS_MAIN
+    strings = []
+    for si in root.iter("{%s}si" % NS_MAIN):
+        parts = []
+        for child in si:
+            if child.tag == tag_t:
+                parts.append(child.text or "")
+            elif child.tag == tag_r:
+                t = child.find(tag_t)
+                if t is not None:
+                    parts.append(t.text or "")
+        strings.append("".join(parts))
+    return strings
+
+
+class PatchCell:
+    """worksheet 中的一个单元格。attrs 不含 r；inner 为 <c> 内的原始 XML。"""
+
+    __slots__ = ("sheet", "row", "column", "attrs", "inner")
+
+    def __init__(self, sheet, row, column, attrs=None, inner=""):
+        self.sheet = sheet
+        self.row = row
+        self.column = column
+        self.attrs = attrs if attrs is not None else {}
+        self.inner = inner
+
+    @property
+    def coordinate(self):
+        return "%s%d" % (get_column_letter(self.column), self.row)
+
+    def _formula(self):
+        return _FORMULA_RE.search(self.inner) if "<f" in self.inner else None
+
+    @property
+    def value(self):
+        f = self._formula()
+        if f is not None:
+            return "=" + html.unescape(f.group(2) or "")
+        t = self.attrs.get("t", "n")
+        if t == "inlineStr":
+            return "".join(html.unescape(m.group(1) or "") for m in _TEXT_RE.finditer(_PHONETIC_RE.sub("", self.inner)))
+        v = _VALUE_RE.search(self.inner)
+        if v is None:
+            return None
+        text = html.unescape(v.group(1))
+        if t == "s":
+            return self.sheet.workbook.shared_strings()[int(text)]
+        if t == "b":
+            return text.strip() in ("1", "true")
+        if t == "d" or self.sheet.workbook.is_date_style(self.attrs.get("s")):
+            # openpyxl 会读为 datetime，补丁写入不做日期换算，交由调用方回退
+            raise PatchUnsupported("单元格 %s 为日期值" % self.coordinate)
+        if t in ("str", "e"):
+            return text
+        if _INT_RE.match(text.strip()):
+            return int(text)
+        return float(text)
+
+    @value.setter
+    def value(self, value):
+        f = self._formula()
+        if f is not None:
+            f_attrs = _parse_attrs(f.group(1))
+            if f_attrs.get("t") == "array" or (f_attrs.get("t") == "shared" and "ref" in f_attrs):
+                raise PatchUnsupported("单元格 %s 为数组 / 共享公式" % self.coordinate)
+            self.sheet.workbook.drop_calc_chain = True
+        t = None
+        if value is None:
+            inner = ""
+        elif isinstance(value, bool):
+            t, inner = "b", "<v>%d</v>" % value
+        elif isinstance(value, (int, float)):
+            inner = "<v>%s</v>" % repr(value)
+        elif isinstance(value, str):
+            if ILLEGAL_CHARACTERS_RE.search(value):
+                raise IllegalCharacterError("%s cannot be used in worksheets." % value)
+            if value.startswith("=") and len(value) > 1:
+                inner = "<f>%s</f>" % escape(value[1:])
+            else:
+                t, inner = "inlineStr", '<is><t xml:space="preserve">%s</t></is>' % escape(value)
+        else:
+            raise PatchUnsupported("不支持写入 %s 类型的值" % type(value).__name__)
+        self.attrs.pop("t", None)
+        if t:
+            self.attrs["t"] = t
+        self.inner = inner
+        self.sheet._touch(self)
+
+    @property
+    def style_id(self):
+        return self.attrs.get("s")
+
+    @style_id.setter
+    def style_id(self, style_id):
+        if style_id is None:
+            self.attrs.pop("s", None)
+        else:
+            self.attrs["s"] = str(style_id)
+        self.sheet._touch(self)
+
+    def to_xml(self):
+        return '<c r="%s"%s%s' % (
+            self.coordinate, _format_attrs(self.attrs), ">%s</c>" % self.inner if self.inner else "/>")
+
+
+class SheetPatch:
+    """单个 worksheet 的补丁：sheetData 解析为单元格，其余 XML 原样保留。"""
+
+    def __init__(self, workbook, title, part, xml):
+        self.workbook = workbook
+        self.title = title
+        self.part = part
+        self.modified = False
+        self._data_validations = None  # 首次访问 data_validations 时解析
+        if re.search(r"<\w+:worksheet\b", xml[:2000]) or "<worksheet" not in xml[:2000]:
+            raise PatchUnsupported("worksheet 使用了带前缀的命名空间")
+        m = _SHEET_DATA_RE.search(xml)
+        if m is None:
+            raise PatchUnsupported("未找到 sheetData")
+        self._prefix = xml[:m.start()]
+        self._suffix = xml[m.end():]
+        self._rows = {}   # 行号 -> 行属性（不含 r）
+        self._cells = {}  # (行, 列) -> PatchCell
+        self._dirty_rows = set()
+        row_idx = 0
+        for rm in _ROW_RE.finditer(m.group(1) or ""):
+            attrs = _parse_attrs(rm.group(1))
+            row_idx = int(attrs.pop("r")) if "r" in attrs else row_idx + 1
+            self._rows[row_idx] = attrs
+            col_idx = 0
+            for cm in _CELL_RE.finditer(rm.group(2) or ""):
+                c_attrs = _parse_attrs(cm.group(1))
+                ref = c_attrs.pop("r", None)
+                if ref:
+                    ref_m = _CELL_REF_RE.match(ref)
+                    if ref_m is None:
+                        raise PatchUnsupported("无法识别的单元格引用 %s" % ref)
+                    col_idx = column_index_from_string(ref_m.group(1))
+                else:
+                    col_idx += 1
+                self._cells[(row_idx, col_idx)] = PatchCell(self, row_idx, col_idx, c_attrs, cm.group(2) or "")
+
+    # ---------- 与 openpyxl Worksheet 一致的读写接口 ----------
+
+    @property
+    def max_row(self):
+        return max((r for r, _ in self._cells), default=1)
+
+    @property
+    def max_column(self):
+        return max((c for _, c in self._cells), default=1)
+
+    def cell(self, row, column, value=None):
+        c = self._cells.get((row, column))
+        if c is None:
+            c = PatchCell(self, row, column)  # 未写入前不加入 sheetData
+        if value is not None:
+            c.value = value
+        return c
+
+    def iter_rows(self, min_row=1, max_row=None, min_col=1, max_col=None):
+        max_row = self.max_row if max_row is None else max_row
+        max_col = self.max_column if max_col is None else max_col
+        for row in range(min_row, max_row + 1):
+            yield tuple(self.cell(row, col) for col in range(min_col, max_col + 1))
+
+    def __getitem__(self, row):
+        return tuple(self.cell(row, col) for col in range(1, self.max_column + 1))
+
+    @property
+    def data_validations(self):
+        """
+        已有数据验证（openpyxl DataValidationList，首次访问时由 dataValidations 及扩展中的 x14:dataValidations 解析）。
+        访问后即视为可能修改：保存时按列表内容整体重写 dataValidations（x14 中的验证移入其中），调用方可直接增删、合并其中的验证。
+        """
+        if self._data_validations is None:
+            self._data_validations, self._suffix = self._parse_data_validations()
+        self.modified = True
+        return self._data_validations
+
+    def add_data_validation(self, dv):
+        """追加数据验证（保存时序列化，之后对 dv.add 的区域同样生效）。"""
+        self.data_validations.append(dv)
+
+    def compact_rows(self, rows):
+        """
+        一次删除 rows 中的全部行，其余行依次上移补齐（与 tfls_pdt_gen._compact_rows 一致）：
+        单元格与行属性（行高等）随行移动；合并单元格、数据验证、条件格式、超链接、自动筛选及扩展中的 xm:sqref
+        按删除后的行号收缩 / 上移，区域内的行全部被删除时移除。其它工作表中引用这些行的公式不调整。
+        """
+        rows = sorted(set(rows))
+        if not rows:
+            return
+        deleted = set(rows)
+        first = rows[0]
+        # 先完成所有可能抛出 PatchUnsupported 的解析，再修改状态（解析数据验证只把 x14 中的验证移入列表）
+        has_dv = "<dataValidations" in self._suffix or "<x14:dataValidations" in self._suffix or self._data_validations
+        dv_list = self.data_validations if has_dv else None
+        suffix = self._compact_suffix(rows)
+        kept = {}
+        for (row_idx, col_idx), c in self._cells.items():
+            if row_idx >= first and "<f" in c.inner:
+                f = c._formula()
+                if f is not None:
+                    if _parse_attrs(f.group(1)).get("t") in ("shared", "array"):
+                        raise PatchUnsupported("移动的行中含有共享 / 数组公式（%s）" % c.coordinate)
+                    self.workbook.drop_calc_chain = True
+            if row_idx in deleted:
+                continue
+            shift = bisect_left(rows, row_idx)
+            if shift:
+                c.row = row_idx - shift
+            kept[(c.row, col_idx)] = c
+        self._cells = kept
+        self._dirty_rows.update(r for r in self._rows if r >= first)
+        self._rows = {r - bisect_left(rows, r): attrs for r, attrs in self._rows.items() if r not in deleted}
+        self._dirty_rows.update(r for r in self._rows if r >= first)
+        self._suffix = suffix
+        if dv_list is not None:
+            for dv in list(dv_list.dataValidation):
+                sqref = compact_sqref(dv.sqref, rows)
+                if sqref:
+                    dv.sqref = MultiCellRange(sqref)
+                else:
+                    dv_list.dataValidation.remove(dv)
+        self.modified = True
+
+    def _compact_suffix(self, rows):
+        """compact_rows 中 sheetData 之后部分的行号调整（数据验证另按 DataValidationList 处理）。"""
+
+        def merge_cells(m):
+            refs = (compact_range(_parse_attrs(c.group(1)).get("ref", ""), rows) for c in _MERGE_CELL_RE.finditer(m.group(1) or ""))
+            refs = [r for r in refs if r and ":" in r]  # 收缩为单个单元格时取消合并
+            if not refs:
+                return ""
+            return '<mergeCells count="%d">%s</mergeCells>' % (len(refs), "".join('<mergeCell ref="%s"/>' % r for r in refs))
+
+        def cond_format(m):
+            attrs = _parse_attrs(m.group(1))
+            sqref = compact_sqref(attrs.get("sqref", ""), rows)
+            if not sqref:
+                return ""
+            attrs["sqref"] = sqref
+            return "<conditionalFormatting%s>%s</conditionalFormatting>" % (_format_attrs(attrs), m.group(2))
+
+        def hyperlink(m):
+            attrs = _parse_attrs(m.group(1))
+            ref = compact_range(attrs.get("ref", ""), rows)
+            if ref is None:
+                return ""
+            attrs["ref"] = ref
+            return "<hyperlink%s%s" % (_format_attrs(attrs), m.group(0)[len("<hyperlink") + len(m.group(1)):])
+
+        def auto_filter(m):
+            attrs = _parse_attrs(m.group(1))
+            ref = compact_range(attrs.get("ref", ""), rows) if attrs.get("ref") else ""
+            if ref is None:
+                raise PatchUnsupported("自动筛选区域的行全部被删除")
+            if ref:
+                attrs["ref"] = ref
+            return "<autoFilter%s%s" % (_format_attrs(attrs), m.group(2))
+
+        def xm_sqref(m):
+            sqref = compact_sqref(m.group(1), rows)
+            if not sqref:
+                raise PatchUnsupported("扩展（x14）中的数据验证 / 条件格式区域被全部删除")
+            return "<xm:sqref>%s</xm:sqref>" % sqref
+
+        try:
+            suffix = _MERGE_CELLS_RE.sub(merge_cells, self._suffix)
+            suffix = _COND_FORMAT_RE.sub(cond_format, suffix)
+            suffix = _HYPERLINK_RE.sub(hyperlink, suffix)
+            suffix = re.sub(r"<hyperlinks>\s*</hyperlinks>", "", suffix)
+            suffix = _AUTO_FILTER_RE.sub(auto_filter, suffix)
+            return _XM_SQREF_RE.sub(xm_sqref, suffix)
+        except ValueError as e:  # range_boundaries 无法识别的引用
+            raise PatchUnsupported("无法调整区域引用：%s" % e)
+
+    # ---------- 内部 ----------
+
+    def _touch(self, c):
+        self._cells[(c.row, c.column)] = c
+        self._dirty_rows.add(c.row)
+        self.modified = True
+
+    def _sheet_data_xml(self):
+        by_row = {}
+        for (row_idx, col_idx), c in self._cells.items():
+            by_row.setdefault(row_idx, []).append((col_idx, c))
+        out = []
+        for row_idx in sorted(set(self._rows) | set(by_row)):
+            attrs = dict(self._rows.get(row_idx, {}))
+            if row_idx in self._dirty_rows:
+                attrs.pop("spans", None)  # 可选属性，单元格变化后不再准确
+            cells = [c for _, c in sorted(by_row.get(row_idx, ())) if c.attrs or c.inner]
+            if not cells and not attrs:
+                continue
+            head = '<row r="%d"%s' % (row_idx, _format_attrs(attrs))
+            out.append("%s>%s</row>" % (head, "".join(c.to_xml() for c in cells)) if cells else head + "/>")
+        return "<sheetData>%s</sheetData>" % "".join(out) if out else "<sheetData/>"
+
+    def _dimension_ref(self):
+        if not self._cells:
+            return "A1"
+        rows = [r for r, _ in self._cells]
+        cols = [c for _, c in self._cells]
+        return "%s%d:%s%d" % (get_column_letter(min(cols)), min(rows), get_column_letter(max(cols)), max(rows))
+
+    def _parse_data_validations(self):
+        """返回 (DataValidationList, 去掉 x14:dataValidations 扩展后的 suffix)。"""
+        m = _DATA_VALIDATIONS_RE.search(self._suffix)
+        exts = _X14_DATA_VALIDATIONS_EXT_RE.findall(self._suffix)
+        if m is None and not exts:
+            return DataValidationList(), self._suffix
+        # 沿用根元素的命名空间声明（dataValidation 上可能有 xr:uid 等带前缀属性）
+        root = _WORKSHEET_TAG_RE.search(self._prefix)
+        ns_decls = {k: v for k, v in _parse_attrs(root.group(1) if root else "").items() if k.split(":")[0] == "xmlns"}
+        ns_decls.setdefault("xmlns", NS_MAIN)
+        try:
+            dv_list = DataValidationList()
+            if m is not None:
+                node = ET.fromstring("<worksheet%s>%s</worksheet>" % (_format_attrs(ns_decls), m.group(0)))
+                dv_list = DataValidationList.from_tree(node[0])
+            for ext in exts:
+                node = ET.fromstring("<worksheet%s>%s</worksheet>" % (_format_attrs(ns_decls), ext))
+                for dv_node in node.iter("{%s}dataValidation" % NS_X14):
+                    dv_list.append(_x14_data_validation(dv_node))
+        except Exception as e:
+            raise PatchUnsupported("无法解析 dataValidations：%s" % e)
+        suffix = _X14_DATA_VALIDATIONS_EXT_RE.sub("", self._suffix)
+        return dv_list, re.sub(r"<extLst>\s*</extLst>", "", suffix)
+
+    def _data_validations_xml(self, suffix):
+        if self._data_validations is None:
+            return suffix
+        block = tostring(self._data_validations.to_tree()).decode("utf-8") if any(
+            dv.sqref for dv in self._data_validations.dataValidation) else ""
+        m = _DATA_VALIDATIONS_RE.search(suffix)
+        if m is not None:
+            return suffix[:m.start()] + block + suffix[m.end():]
+        if not block:
+            return suffix
+        pos = _first_tag_position(suffix, _AFTER_DATA_VALIDATIONS, suffix.rfind("</worksheet>"))
+        return suffix[:pos] + block + suffix[pos:]
+
+    def to_xml(self):
+        prefix = _DIMENSION_RE.sub('<dimension ref="%s"/>' % self._dimension_ref(), self._prefix, count=1)
+        return prefix + self._sheet_data_xml() + self._data_validations_xml(self._suffix)
+
+
+class _CalcProperties:
+    """calcPr 中 fullCalcOnLoad / calcMode / calcId（属性名与 openpyxl CalcProperties 一致）。"""
+
+    def __init__(self, attrs):
+        self.fullCalcOnLoad = attrs.get("fullCalcOnLoad") in ("1", "true")
+        self.calcMode = attrs.get("calcMode")
+        self.calcId = int(attrs["calcId"]) if _INT_RE.match(attrs.get("calcId", "")) else None
+        self._initial = self._values()
+
+    def _values(self):
+        return (self.fullCalcOnLoad, self.calcMode, self.calcId)
+
+    @property
+    def modified(self):
+        return self._values() != self._initial
+
+    def apply(self, attrs):
+        attrs = dict(attrs)
+        if self.calcId is not None:
+            attrs["calcId"] = str(self.calcId)
+        if self.calcMode:
+            attrs["calcMode"] = self.calcMode
+        if self.fullCalcOnLoad:
+            attrs["fullCalcOnLoad"] = "1"
+        else:
+            attrs.pop("fullCalcOnLoad", None)
+        return attrs
+
+
+class XlsxPatch:
+    """
+    以补丁方式打开 xlsx：wb = XlsxPatch(path)；ws = wb["Deliverables"]；修改后 wb.save()。
+    只有被修改的 worksheet、workbook.xml（calcPr 变化时）与 calcChain 相关部件会被改写，其余部件原样写回。
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.drop_calc_chain = False
+        self._sheets = {}
+        self._shared_strings = None
+        self._date_style_ids = None
+        try:
+            with zipfile.ZipFile(self.path) as zf:
+                root_rels = _read_rels(zf, "")
+                self._workbook_part = next((t for _, typ, t in root_rels if typ.endswith("/officeDocument")), None)
+                if not self._workbook_part:
+                    raise PatchUnsupported("未找到 workbook 部件")
+                self._workbook_xml = zf.read(self._workbook_part).decode("utf-8")
+                self._workbook_rels = _read_rels(zf, self._workbook_part)
+        except (KeyError, zipfile.BadZipFile, UnicodeDecodeError, ET.ParseError) as e:
+            raise PatchUnsupported("无法解析 xlsx：%s" % e)
+        if re.search(r"<\w+:workbook\b", self._workbook_xml[:2000]) or "<workbook" not in self._workbook_xml[:2000]:
+            raise PatchUnsupported("workbook 使用了带前缀的命名空间")
+        root = ET.fromstring(self._workbook_xml.encode("utf-8"))
+        if root.tag != "{%s}workbook" % NS_MAIN:
+            raise PatchUnsupported("不支持的 workbook 命名空间：%s" % root.tag)
+        targets = {rid: target for rid, _, target in self._workbook_rels}
+        self._sheet_parts = {}
+        for sheet in root.iter("{%s}sheet" % NS_MAIN):
+            target = targets.get(sheet.get("{%s}id" % NS_REL))
+            if target:
+                self._sheet_parts[sheet.get("name")] = target
+        self.sheetnames = list(self._sheet_parts)
+        m = _CALC_PR_RE.search(self._workbook_xml)
+        self.calculation = _CalcProperties(_parse_attrs(m.group(1)) if m else {})
+
+    def __getitem__(self, name):
+        if name not in self._sheets:
+            part = self._sheet_parts[name]
+            with zipfile.ZipFile(self.path) as zf:
+                try:
+                    xml = zf.read(part).decode("utf-8")
+                except (KeyError, UnicodeDecodeError) as e:
+                    raise PatchUnsupported("无法读取 sheet %s：%s" % (name, e))
+            self._sheets[name] = SheetPatch(self, name, part, xml)
+        return self._sheets[name]
+
+    def shared_strings(self):
+        if self._shared_strings is None:
+            part = next((t for _, typ, t in self._workbook_rels if typ.endswith("/sharedStrings")), None)
+            self._shared_strings = []
+            if part:
+                with zipfile.ZipFile(self.path) as zf:
+                    self._shared_strings = _shared_strings(zf.read(part))
+        return self._shared_strings
+
+    def is_date_style(self, style_id):
+        """样式编号 style_id（cellXfs 下标，字符串或 None）的数字格式是否为日期 / 时间格式。"""
+        if style_id is None:
+            return False
+        if self._date_style_ids is None:
+            self._date_style_ids = self._read_date_style_ids()
+        return style_id in self._date_style_ids
+
+    def _read_date_style_ids(self):
+        part = next((t for _, typ, t in self._workbook_rels if typ.endswith("/styles")), None)
+        if not part:
+            return frozenset()
+        try:
+            with zipfile.ZipFile(self.path) as zf:
+                root = ET.fromstring(zf.read(part))
+        except (KeyError, ET.ParseError) as e:
+            raise PatchUnsupported("无法解析 styles.xml：%s" % e)
+        formats = dict(BUILTIN_FORMATS)
+        for fmt in root.iter("{%s}numFmt" % NS_MAIN):
+            formats[int(fmt.get("numFmtId", -1))] = fmt.get("formatCode") or ""
+        cell_xfs = root.find("{%s}cellXfs" % NS_MAIN)
+        ids = set()
+        for idx, xf in enumerate(cell_xfs if cell_xfs is not None else ()):
+            code = formats.get(int(xf.get("numFmtId", 0)))
+            if code and is_date_format(code):
+                ids.add(str(idx))
+        return frozenset(ids)
+
+    def _patched_workbook_xml(self):
+        xml = self._workbook_xml
+        m = _CALC_PR_RE.search(xml)
+        if m is not None:
+            attrs = self.calculation.apply(_parse_attrs(m.group(1)))
+            return xml[:m.start()] + "<calcPr%s%s>" % (_format_attrs(attrs), m.group(2)) + xml[m.end():]
+        pos = _first_tag_position(xml, _AFTER_CALC_PR, xml.rfind("</workbook>"))
+        return xml[:pos] + "<calcPr%s/>" % _format_attrs(self.calculation.apply({})) + xml[pos:]
+
+    def save(self, path=None):
+        """写出补丁后的 xlsx（先写同目录临时文件再替换）。未修改的部件按原内容写回。"""
+        path = str(path or self.path)
+        replaced = {ws.part: ws.to_xml().encode("utf-8") for ws in self._sheets.values() if ws.modified}
+        if self.calculation.modified:
+            replaced[self._workbook_part] = self._patched_workbook_xml().encode("utf-8")
+        dropped = set()
+        calc_chain = next((t for _, typ, t in self._workbook_rels if typ.endswith("/calcChain")), None)
+        if self.drop_calc_chain and calc_chain:
+            dropped.add(calc_chain)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+        os.close(fd)
+        try:
+            with zipfile.ZipFile(self.path) as zin, zipfile.ZipFile(tmp_path, "w") as zout:
+                rels_part = _rels_path(self._workbook_part)
+                for info in zin.infolist():
+                    if info.filename in dropped:
+                        continue
+                    data = replaced.get(info.filename)
+                    if data is None:
+                        data = zin.read(info.filename)
+                        if dropped and info.filename == rels_part:
+                            data = re.sub(rb'<Relationship\b[^>]*/calcChain"[^>]*/>', b"", data)
+                        elif dropped and info.filename == "[Content_Types].xml":
+                            data = re.sub(rb'<Override\b[^>]*PartName="/%s"[^>]*/>' % re.escape(calc_chain.encode("utf-8")), b"", data)
+                    out_info = zipfile.ZipInfo(info.filename, info.date_time)
+                    out_info.compress_type = info.compress_type
+                    out_info.external_attr = info.external_attr
+                    zout.writestr(out_info, data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def close(self):
+        pass
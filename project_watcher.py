@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""
+项目目录监视（独立模块）
+
+监视所选项目根目录及其下一级子文件夹（06_programs、07_logs、09_validation、03_reports 等），
+在内存中维护各文件夹的条目快照，只把变化量（新增 / 删除的条目、新增 / 删除的文件夹）推送给调用方，
+主页 Subfolders 网格据此增量更新，无需重新扫描全部文件夹。
+
+两种后端：
+- inotify：Linux 本地文件系统，通过 ctypes 调用 libc，事件驱动；
+- 轮询：其余情况（Windows 映射盘、Linux 上的 cifs / nfs 等网络挂载）。按 interval 秒比较目录 mtime，
+  变化的目录才重新 scandir；每 FULL_RESCAN_EVERY 轮做一次全量比对，兜底 mtime 不可靠的网络盘。
+"""
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+# 轮询间隔（秒）
+DEFAULT_POLL_INTERVAL = 2.0
+# 轮询后端每隔多少轮全量比对一次
+FULL_RESCAN_EVERY = 15
+# inotify 事件合并：静默 COALESCE_DELAY 秒（最长 COALESCE_MAX 秒）后再比对，批量运行写入大量日志时合并为一次更新
+COALESCE_DELAY = 0.3
+COALESCE_MAX = 2.0
+
+_NETWORK_FS_TYPES = {"cifs", "smb3", "smbfs", "nfs", "nfs4", "afs", "9p", "fuse.sshfs", "fuse.rclone", "davfs"}
+
+
+class FolderDelta:
+    """
+    单个子文件夹的变化量。
+    added / removed：[(名称, 是否文件夹)]；folder_added 时 added 为该文件夹的全部条目；folder_removed 表示文件夹已删除。
+    """
+
+    def __init__(self, name, path, added=(), removed=(), folder_added=False, folder_removed=False):
+        self.name = name
+        self.path = path
+        self.added = list(added)
+        self.removed = list(removed)
+        self.folder_added = folder_added
+        self.folder_removed = folder_removed
+
+    def __repr__(self):
+        if self.folder_removed:
+            return "<FolderDelta %s removed>" % self.name
+        return "<FolderDelta %s%s +%d -%d>" % (
+            self.name, " (new)" if self.folder_added else "", len(self.added), len(self.removed))
+
+
+def _scan_entries(path):
+    """返回 {(名称, 是否文件夹)}；目录不存在或无法访问时返回 None。"""
+    entries = set()
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                entries.add((entry.name, is_dir))
+    except OSError:
+        return None
+    return entries
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _is_network_path(path):
+    """Linux 下根据 /proc/mounts 判断 path 是否位于网络文件系统（inotify 收不到远端修改）。"""
+    try:
+        with open("/proc/mounts", "r", encoding="utf-8", errors="replace") as f:
+            mounts = [line.split()[1:3] for line in f if len(line.split()) >= 3]
+    except OSError:
+        return True
+    real = os.path.realpath(path)
+    best, best_type = "", ""
+    for mount_point, fs_type in mounts:
+        mount_point = mount_point.replace("\\040", " ")
+        prefix = mount_point.rstrip("/") + "/"
+        if (real == mount_point or real.startswith(prefix)) and len(mount_point) > len(best):
+            best, best_type = mount_point, fs_type
+    return best_type in _NETWORK_FS_TYPES
+
+
+class _InotifyBackend:
+    """Linux inotify（ctypes）。wait(timeout) 返回发生变化的文件夹名集合（None 表示根目录），溢出时返回 None 要求全量比对。"""
+
+    _IN_MOVED_FROM = 0x40
+    _IN_MOVED_TO = 0x80
+    _IN_CREATE = 0x100
+    _IN_DELETE = 0x200
+    _IN_DELETE_SELF = 0x400
+    _IN_MOVE_SELF = 0x800
+    _IN_Q_OVERFLOW = 0x4000
+    _IN_NONBLOCK = 0x800
+    _IN_CLOEXEC = 0x80000
+    _MASK = _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF | _IN_MOVE_SELF
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = self._libc.inotify_init1(self._IN_NONBLOCK | self._IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        self._wd_names = {}
+
+    def add(self, path, name):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), self._MASK)
+        if wd >= 0:
+            self._wd_names[wd] = name
+
+    def wait(self, timeout):
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+        try:
+            data = os.read(self._fd, 65536)
+        except BlockingIOError:
+            return set()
+        dirty = set()
+        pos = 0
+        while pos + self._EVENT.size <= len(data):
+            wd, mask, _, name_len = self._EVENT.unpack_from(data, pos)
+            pos += self._EVENT.size + name_len
+            if mask & self._IN_Q_OVERFLOW:
+                return None
+            if wd in self._wd_names:
+                dirty.add(self._wd_names[wd])
+        return dirty
+
+    def wait_batch(self, timeout):
+        """同 wait，但收到事件后继续合并后续事件，直到静默 COALESCE_DELAY 秒或累计 COALESCE_MAX 秒。"""
+        dirty = self.wait(timeout)
+        deadline = time.monotonic() + COALESCE_MAX
+        while dirty and time.monotonic() < deadline:
+            more = self.wait(COALESCE_DELAY)
+            if more is None:
+                return None
+            if not more:
+                break
+            dirty |= more
+        return dirty
+
+    def close(self):
+        os.close(self._fd)
+
+
+class ProjectWatcher:
+    """
+    监视 root_path 下一级子文件夹的条目变化。
+
+    on_change(deltas)：在监视线程中调用，deltas 为 FolderDelta 列表（回到 Tk 主线程请用 root.after）；
+    snapshot：{文件夹名: [(名称, 是否文件夹)]}，传入刚扫描好的网格模型可省去首次全量扫描；
+    excluded：忽略的子文件夹名；backend："auto" / "inotify" / "poll"。
+    """
+
+    def __init__(self, root_path, on_change, snapshot=None, excluded=(), interval=DEFAULT_POLL_INTERVAL, backend="auto"):
+        self.root_path = root_path
+        self.on_change = on_change
+        self.excluded = set(excluded)
+        self.interval = interval
+        self.backend = backend
+        self._snapshot = {name: set(entries) for name, entries in snapshot.items()} if snapshot is not None else None
+        self._mtimes = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止监视（不等待线程退出，最迟 interval 秒后结束）。"""
+        self._stop.set()
+
+    def _folder_path(self, name):
+        return self.root_path if name is None else os.path.join(self.root_path, name)
+
+    def _make_backend(self):
+        use_inotify = self.backend == "inotify" or (
+            self.backend == "auto" and sys.platform.startswith("linux") and not _is_network_path(self.root_path))
+        if not use_inotify:
+            return None
+        try:
+            return _InotifyBackend()
+        except (OSError, AttributeError):
+            return None
+
+    def _run(self):
+        if self._snapshot is None:
+            self._snapshot = {}
+            self._rescan_root()
+        inotify = self._make_backend()
+        try:
+            if inotify is not None:
+                inotify.add(self.root_path, None)
+                for name in self._snapshot:
+                    inotify.add(self._folder_path(name), name)
+                # 补上建立快照与添加监视之间发生的变化
+                self._emit(self._check(set([None]) | set(self._snapshot)))
+                while not self._stop.is_set():
+                    dirty = inotify.wait_batch(self.interval)
+                    if self._stop.is_set():
+                        break
+                    if dirty is None:
+                        dirty = set([None]) | set(self._snapshot)
+                    if dirty:
+                        deltas = self._check(dirty)
+                        for d in deltas:
+                            if d.folder_added:
+                                inotify.add(d.path, d.name)
+                        self._emit(deltas)
+            else:
+                for name in [None] + list(self._snapshot):
+                    self._mtimes[name] = _mtime(self._folder_path(name))
+                rounds = 0
+                while not self._stop.wait(self.interval):
+                    rounds += 1
+                    full = rounds % FULL_RESCAN_EVERY == 0
+                    dirty = set()
+                    for name in [None] + list(self._snapshot):
+                        mtime = _mtime(self._folder_path(name))
+                        if full or mtime != self._mtimes.get(name):
+                            self._mtimes[name] = mtime
+                            dirty.add(name)
+                    if dirty:
+                        self._emit(self._check(dirty))
+        finally:
+            if inotify is not None:
+                inotify.close()
+
+    def _emit(self, deltas):
+        if deltas and not self._stop.is_set():
+            self.on_change(deltas)
+
+    def _check(self, dirty):
+        """重新扫描 dirty 中的文件夹（None 为根目录），与快照比对后返回 FolderDelta 列表。"""
+        deltas = []
+        if None in dirty:
+            deltas.extend(self._rescan_root())
+        for name in dirty:
+            if name is None or name not in self._snapshot:
+                continue
+            entries = _scan_entries(self._folder_path(name))
+            if entries is None:
+                continue  # 文件夹已删除，由根目录比对处理
+            old = self._snapshot[name]
+            if entries != old:
+                self._snapshot[name] = entries
+                deltas.append(FolderDelta(name, self._folder_path(name), added=entries - old, removed=old - entries))
+        return deltas
+
+    def _rescan_root(self):
+        root_entries = _scan_entries(self.root_path)
+        if root_entries is None:
+            return []
+        names = {n for n, is_dir in root_entries if is_dir and n not in self.excluded}
+        deltas = []
+        for name in sorted(names - set(self._snapshot)):
+            path = self._folder_path(name)
+            self._mtimes[name] = _mtime(path)
+            entries = _scan_entries(path) or set()
+            self._snapshot[name] = entries
+            deltas.append(FolderDelta(name, path, added=entries, folder_added=True))
+        for name in sorted(set(self._snapshot) - names):
+            del self._snapshot[name]
+            self._mtimes.pop(name, None)
+            deltas.append(FolderDelta(name, self._folder_path(name), folder_removed=True))
+        return deltas
@@ -1,11 +1,21 @@
 """
 解析批处理 .sas 脚本中的 %batch_submit()，根据 role/target/pgm 推导出 SAS 程序路径，
-再使用 linux_sas_call_from_python.run_sas 依次执行这些程序。
+再使用 linux_sas_call_from_python.run_sas 执行这些程序。
+
+多个程序时按依赖图调度：依赖来自 %batch_submit 的 depends= 声明、各程序读写的数据集，
+以及「同一 role 下 data 程序先于 safety/efficacy/pkpd/stats」的规则；互不依赖的程序在
+SAS 会话池中并行运行，developer 与 validator 之间无默认依赖、可同时运行。
+
+--incremental：为每个程序记录指纹（.sas 内容哈希、%include 宏内容哈希、输入数据集 mtime），
+指纹与上次干净运行一致、日志无 ERROR/WARNING 且上游程序本次未重跑时跳过该程序。
 """
 import argparse
+import hashlib
+import json
 import os
 import re
 import sys
+from concurrent.futures import FIRST_COMPLETED, wait
 
 # role -> 顶层目录名
 ROLE_DIR = {
@@ -33,6 +43,36 @@ BATCH_SUBMIT_RE = re.compile(
     re.IGNORECASE
 )
 
+# %batch_submit(..., depends=adsl adae) 中声明的前置程序（空格分隔的 pgm 名）
+DEPENDS_RE = re.compile(r'\bdepends\s*=\s*([\w\s]*?)\s*(?:,|\)|$)', re.IGNORECASE)
+
+# 数据集读写识别（仅识别 libref.member 两级名，忽略 work）
+_BLOCK_COMMENT_RE = re.compile(r'/\*.*?\*/', re.DOTALL)
+_PAREN_RE = re.compile(r'\([^()]*\)')
+_TWO_LEVEL_RE = re.compile(r'(?<![\w&.])([A-Za-z_]\w{0,7})\.([A-Za-z_]\w{0,31})\b')
+_DATA_STMT_RE = re.compile(r'\bdata\s+(?!=)([^;]*);', re.IGNORECASE)
+_WRITE_RES = (
+    re.compile(r'\bout\s*=\s*(\w+\.\w+)', re.IGNORECASE),
+    re.compile(r'\bcreate\s+table\s+(\w+\.\w+)', re.IGNORECASE),
+)
+_READ_STMT_RE = re.compile(r'\b(?:set|merge|update|modify)\s+([^;]*);', re.IGNORECASE)
+_READ_RES = (
+    re.compile(r'\b(?:data|base|compare)\s*=\s*(\w+\.\w+)', re.IGNORECASE),
+    re.compile(r'\b(?:from|join)\s+(\w+\.\w+)', re.IGNORECASE),
+)
+
+
+# 增量运行：libref -> 项目下的数据集目录（用于取输入数据集 mtime）
+LIBREF_DIR = {
+    'sdtm': '01_sdtm',
+    'adam': '02_adam',
+}
+
+# 增量运行状态文件（位于 <项目>/07_logs 下）
+RUN_STATE_FILE = '_batch_run_state.json'
+
+_INCLUDE_RE = re.compile(r"%include\s+['\"]([^'\"]+)['\"]", re.IGNORECASE)
+
 
 def parse_batch_submits(batch_script_path: str) -> list[tuple[str, str, str]]:
     """
@@ -48,6 +88,241 @@ def parse_batch_submits(batch_script_path: str) -> list[tuple[str, str, str]]:
     return found
 
 
+def parse_batch_submit_depends(batch_script_path: str) -> list[list[str]]:
+    """
+    与 parse_batch_submits 一一对应，返回每个 %batch_submit 中 depends= 声明的前置 pgm 列表（小写），
+    未声明时为空列表。
+    """
+    with open(batch_script_path, 'r', encoding='utf-8', errors='replace') as f:
+        content = f.read()
+    result = []
+    for m in BATCH_SUBMIT_RE.finditer(content):
+        close = content.find(')', m.end())
+        rest = content[m.end(): close if close >= 0 else len(content)]
+        dm = DEPENDS_RE.search(rest)
+        result.append(dm.group(1).lower().split() if dm else [])
+    return result
+
+
+def _two_level_names(text: str) -> set[str]:
+    """提取文本中的 libref.member 数据集名（小写，去掉数据集选项括号，忽略 work）。"""
+    while True:
+        stripped = _PAREN_RE.sub(' ', text)
+        if stripped == text:
+            break
+        text = stripped
+    names = set()
+    for lib, mem in _TWO_LEVEL_RE.findall(text):
+        if lib.lower() != 'work':
+            names.add(f"{lib.lower()}.{mem.lower()}")
+    return names
+
+
+def scan_program_datasets(sas_path: str):
+    """
+    粗略扫描 SAS 程序读写的永久数据集，返回 (reads, writes) 两个集合；文件不可读时返回 None。
+    写：data 语句、out=、create table；读：set/merge/update/modify、data=/base=/compare=、from/join。
+    """
+    try:
+        with open(sas_path, 'r', encoding='utf-8', errors='replace') as f:
+            code = _BLOCK_COMMENT_RE.sub(' ', f.read())
+    except OSError:
+        return None
+    writes = set()
+    for m in _DATA_STMT_RE.finditer(code):
+        writes |= _two_level_names(m.group(1))
+    for pat in _WRITE_RES:
+        writes |= {n.lower() for n in pat.findall(code) if not n.lower().startswith('work.')}
+    reads = set()
+    for m in _READ_STMT_RE.finditer(code):
+        reads |= _two_level_names(m.group(1))
+    for pat in _READ_RES:
+        reads |= {n.lower() for n in pat.findall(code) if not n.lower().startswith('work.')}
+    return reads, writes
+
+
+def build_dependency_graph(submits, paths, declared=None) -> list[set[int]]:
+    """
+    为每个程序计算前置程序下标集合 deps[i]。只保留脚本中靠前程序指向靠后程序的边，
+    因此图必无环，且任何一条边都不会与原串行顺序冲突。边的来源：
+    1. depends= 声明；
+    2. 同一 role 下 target=data 的程序先于其余 target 的程序（TFL 常经宏参数读数据，扫描不到）；
+    3. 数据集：前者写、后者读（或两者写同一数据集）；
+    4. 同一 role 的 data 程序之间若任一方扫描不到数据集，按脚本顺序串行，保证安全。
+    """
+    declared = declared or [[] for _ in submits]
+    scans = [scan_program_datasets(p) for p in paths]
+    deps = [set() for _ in submits]
+    for i, (role_i, target_i, pgm_i) in enumerate(submits):
+        reads_i, writes_i = scans[i] if scans[i] else (set(), set())
+        wanted = set(declared[i])
+        for j in range(i):
+            role_j, target_j, pgm_j = submits[j]
+            reads_j, writes_j = scans[j] if scans[j] else (set(), set())
+            if pgm_j.lower() in wanted:
+                deps[i].add(j)
+            elif role_i == role_j and target_j == 'data' and target_i != 'data':
+                deps[i].add(j)
+            elif writes_j & (reads_i | writes_i):
+                deps[i].add(j)
+            elif role_i == role_j and target_i == target_j == 'data' and not (writes_i and writes_j):
+                deps[i].add(j)
+    return deps
+
+
+def _sha1_file(path):
+    """文件内容 SHA-1；不可读时返回 None。"""
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def program_fingerprint(sas_path: str, base_path: str) -> dict:
+    """
+    程序指纹：.sas 内容哈希、%include 的宏（autorun.sas 及程序内字面路径）内容哈希、
+    输入数据集（LIBREF_DIR 中的 libref）文件 mtime。任何一项变化都会使指纹不同。
+    """
+    from linux_sas_call_from_python import AUTORUN_MACRO_PATH, convert_windows_path_to_linux, to_local_path
+
+    try:
+        with open(sas_path, 'r', encoding='utf-8', errors='replace') as f:
+            code = f.read()
+    except OSError:
+        code = None
+    includes = {}
+    for inc in [AUTORUN_MACRO_PATH] + (_INCLUDE_RE.findall(code) if code else []):
+        includes[inc] = _sha1_file(to_local_path(convert_windows_path_to_linux(inc)))
+    inputs = {}
+    scanned = scan_program_datasets(sas_path)
+    for name in sorted(scanned[0] if scanned else ()):
+        lib, member = name.split('.', 1)
+        if lib not in LIBREF_DIR:
+            continue
+        ds_path = os.path.join(base_path, LIBREF_DIR[lib], member + '.sas7bdat')
+        inputs[name] = os.path.getmtime(ds_path) if os.path.isfile(ds_path) else None
+    return {
+        'sas': hashlib.sha1(code.encode('utf-8')).hexdigest() if code is not None else None,
+        'includes': includes,
+        'inputs': inputs,
+    }
+
+
+def log_is_clean(sas_path: str) -> bool:
+    """run_sas 为该程序写的日志存在且不含 ERROR/WARNING。"""
+    from linux_sas_call_from_python import get_log_output_path, to_local_path
+    from sas_log_scan import has_issue, scan_log_file
+
+    try:
+        return not has_issue(scan_log_file(to_local_path(get_log_output_path(sas_path))))
+    except OSError:
+        return False
+
+
+def _run_state_path(base_path: str) -> str:
+    return os.path.join(base_path, '07_logs', RUN_STATE_FILE)
+
+
+def load_run_state(base_path: str) -> dict:
+    """读取增量运行状态 {sas 路径: 上次干净运行时的指纹}；不存在或损坏时返回空字典。"""
+    try:
+        with open(_run_state_path(base_path), 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        return state if isinstance(state, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def save_run_state(base_path: str, state: dict) -> None:
+    """写入增量运行状态（先写临时文件再替换，避免中断时留下半个文件）。"""
+    path = _run_state_path(base_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def run_dependency_graph(paths, deps, workers=None, on_event=None, should_skip=None):
+    """
+    按依赖图在 SAS 会话池中并行执行 paths，阻塞至全部结束。
+    某程序出错（含 SAS 进程意外终止）时，其所有下游程序跳过。返回与 paths 对齐的状态列表：'ok' / 'uptodate' / 'failed' / 'skipped'。
+    on_event(kind, index, detail)：kind 为 start / ok / uptodate / failed / skipped，在调用方线程中回调。
+    should_skip(index, upstream_ran)：可选，程序就绪时调用，返回 True 则判定为最新、不运行（增量模式）。
+    """
+    from sas_session_pool import DEFAULT_POOL_SIZE, SASSessionPool
+
+    n = len(paths)
+    workers = workers or DEFAULT_POOL_SIZE
+    status = [None] * n
+    remaining = [set(d) for d in deps]
+    dependents = [[] for _ in range(n)]
+    for i, d in enumerate(deps):
+        for j in d:
+            dependents[j].append(i)
+
+    def emit(kind, i, detail=None):
+        if on_event:
+            on_event(kind, i, detail)
+
+    def skip_downstream(i):
+        stack = list(dependents[i])
+        while stack:
+            k = stack.pop()
+            if status[k] is None:
+                status[k] = 'skipped'
+                emit('skipped', k, paths[i])
+                stack.extend(dependents[k])
+
+    ran = [False] * n
+
+    def release(i):
+        for k in dependents[i]:
+            remaining[k].discard(i)
+            if not remaining[k] and status[k] is None:
+                ready.append(k)
+
+    ready = [i for i in range(n) if not remaining[i]]
+    running = {}
+    pool = None  # 首次需要运行程序时才建立会话（增量模式下可能全部跳过）
+    try:
+        while ready or running:
+            # 按脚本顺序提交，线程池先进先出，靠前的程序优先运行
+            while ready:
+                i = min(ready)
+                ready.remove(i)
+                if should_skip and should_skip(i, any(ran[j] for j in deps[i])):
+                    status[i] = 'uptodate'
+                    emit('uptodate', i)
+                    release(i)
+                    continue
+                if pool is None:
+                    pool = SASSessionPool(min(workers, n)).start()
+                running[pool.submit(paths[i])] = i
+                emit('start', i)
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                i = running.pop(fut)
+                res = fut.result()
+                # SAS 进程意外终止（terminated）同样视为失败，下游全部跳过
+                if res['ok'] and not res['terminated']:
+                    status[i] = 'ok'
+                    ran[i] = True
+                    emit('ok', i)
+                    release(i)
+                else:
+                    status[i] = 'failed'
+                    emit('failed', i, res['error'])
+                    skip_downstream(i)
+    finally:
+        if pool is not None:
+            pool.close()
+    return status
+
+
 def build_sas_paths(base_path: str, submits: list[tuple[str, str, str]]) -> list[str]:
     """
     根据 (role, target, pgm) 列表和 base_path 拼出完整 .sas 路径列表。
@@ -82,6 +357,17 @@ def main():
         required=True,
         help='包含 06_programs/09_validation 的项目目录，如 Z:\\projects\\HRS2129\\HRS2129_test\\csr_01',
     )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help='并行 SAS 会话数（默认 4；设为 1 即按依赖顺序串行）',
+    )
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='增量运行：程序、宏与输入数据集均未变化且日志干净时跳过',
+    )
     args = parser.parse_args()
 
     batch_script_path = os.path.normpath(args.batch_script)
@@ -107,20 +393,58 @@ def main():
 
     # 复用 linux_sas_call_from_python 的 run_sas（同目录导入）
     from linux_sas_call_from_python import run_sas
-    import saspy
 
-    if len(paths) == 1:
+    if len(paths) == 1 and not args.incremental:
         run_sas(paths[0])
         return
 
-    sas = saspy.SASsession(cfgname='winiomlinux')
-    try:
-        for i, sas_file_path in enumerate(paths, 1):
-            print(f"\n[{i}/{len(paths)}] 执行: {sas_file_path}")
-            run_sas(sas_file_path, sas_session=sas, check_log=False)
-        print(f"\n全部 {len(paths)} 个 SAS 程序已提交执行。")
-    finally:
-        sas.endsas()
+    declared = parse_batch_submit_depends(batch_script_path)
+    deps = build_dependency_graph(submits, paths, declared)
+    print("依赖关系：")
+    for i, d in enumerate(deps):
+        if d:
+            print(f"  {submits[i][2]} <- {', '.join(submits[j][2] for j in sorted(d))}")
+    print()
+
+    state = load_run_state(args.base_path) if args.incremental else None
+    fingerprints = {}
+
+    def should_skip(i, upstream_ran):
+        # 运行前记录指纹（此时上游已完成，输入数据集 mtime 为最新），成功且日志干净后写入状态
+        fingerprints[i] = program_fingerprint(paths[i], args.base_path)
+        return not upstream_ran and state.get(paths[i]) == fingerprints[i] and log_is_clean(paths[i])
+
+    def on_event(kind, i, detail):
+        label = f"[{i + 1}/{len(paths)}] {submits[i][2]}"
+        if kind == 'start':
+            print(f"开始: {label} -> {paths[i]}")
+        elif kind == 'ok':
+            print(f"完成: {label}")
+        elif kind == 'uptodate':
+            print(f"最新: {label}（未变化，跳过）")
+        elif kind == 'failed':
+            print(f"出错: {label}：{detail}")
+        else:
+            print(f"跳过: {label}（上游 {os.path.basename(detail)} 出错）")
+        if state is not None and kind in ('ok', 'failed'):
+            if kind == 'ok' and log_is_clean(paths[i]):
+                state[paths[i]] = fingerprints[i]
+            else:
+                state.pop(paths[i], None)
+            save_run_state(args.base_path, state)
+
+    status = run_dependency_graph(
+        paths, deps, workers=args.workers, on_event=on_event,
+        should_skip=should_skip if args.incremental else None,
+    )
+    n_ok = status.count('ok')
+    n_uptodate = status.count('uptodate')
+    print(
+        f"\n共 {len(paths)} 个 SAS 程序：完成 {n_ok}，未变化 {n_uptodate}，"
+        f"出错 {status.count('failed')}，跳过 {status.count('skipped')}。"
+    )
+    if n_ok + n_uptodate != len(paths):
+        sys.exit(1)
 
 
 if __name__ == '__main__':
@@ -6,7 +6,7 @@ import os
 import tkinter as tk
 from tkinter import messagebox, filedialog
 
-from tfls_pdt import gen_toc_study
+from toc_engine import gen_toc_study
 
 
 def show_sap_toc_dialog(gui):
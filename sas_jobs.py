@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+SAS 后台作业（独立模块）
+
+各对话框原先在 Tk 主线程直接调用 run_sas，SAS 运行期间整个窗口卡死。本模块提供：
+- submit_sas_job(path, ...) -> JobHandle：在后台工作线程中运行 run_sas（流式模式，可取消）；
+- submit_job(func, ...) -> JobHandle：在后台运行任意耗时函数（如会话池批量运行）。
+JobHandle 提供 status / done() / result() / cancel() / add_done_callback()，并可 await。
+传入 tk_root 时，完成回调与进度回调均通过 root.after 回到 Tk 主线程执行；多个作业可同时运行。
+"""
+import asyncio
+import threading
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+# 同时运行的后台作业上限（每个 SAS 作业占用一个会话）
+MAX_CONCURRENT_JOBS = 4
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+_executor = None
+_executor_lock = threading.Lock()
+_active_jobs = set()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_JOBS, thread_name_prefix="sas-job")
+        return _executor
+
+
+class JobHandle:
+    """
+    后台作业句柄。
+
+    status：pending / running / done / failed / cancelled；
+    result(timeout=None)：阻塞等待并返回结果（作业出错时抛出其异常）；
+    cancel()：排队中直接取消，运行中通过 cancel_event 通知 run_sas 断开会话中止；
+    add_done_callback(fn)：作业结束后调用 fn(handle)（有 tk_root 时在 Tk 主线程中调用）；
+    在 asyncio 协程中可直接 await handle 得到结果。
+    """
+
+    def __init__(self, name="", tk_root=None):
+        self.name = name
+        self.tk_root = tk_root
+        self.status = JOB_PENDING
+        self.cancel_event = threading.Event()
+        self.has_issue = None  # review_log 时的日志审阅结果
+        self._future = None
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return "<JobHandle %s %s>" % (self.name, self.status)
+
+    def __await__(self):
+        return asyncio.wrap_future(self._future).__await__()
+
+    def _run(self, func, args, kwargs):
+        if self.cancel_event.is_set():
+            self.status = JOB_CANCELLED
+            raise CancelledError()
+        self.status = JOB_RUNNING
+        try:
+            result = func(*args, **kwargs)
+        except BaseException:
+            self.status = JOB_CANCELLED if self.cancel_event.is_set() else JOB_FAILED
+            raise
+        self.status = JOB_DONE
+        return result
+
+    def _on_future_done(self, future):
+        if future.cancelled():
+            self.status = JOB_CANCELLED
+        _active_jobs.discard(self)
+        with self._lock:
+            callbacks, self._callbacks = self._callbacks, None
+        for fn in callbacks:
+            self._dispatch(fn)
+
+    def _dispatch(self, fn):
+        """在 Tk 主线程（有 tk_root 时）或当前线程调用 fn(self)。"""
+        if self.tk_root is not None:
+            self.tk_root.after(0, fn, self)
+        else:
+            fn(self)
+
+    def add_done_callback(self, fn):
+        with self._lock:
+            if self._callbacks is not None:
+                self._callbacks.append(fn)
+                return
+        self._dispatch(fn)
+
+    def done(self):
+        return self._future.done()
+
+    def result(self, timeout=None):
+        return self._future.result(timeout)
+
+    def exception(self, timeout=None):
+        """返回作业异常（已取消时返回 CancelledError 实例），无异常时返回 None。"""
+        if self._future.cancelled():
+            return CancelledError()
+        return self._future.exception(timeout)
+
+    def cancel(self):
+        """请求取消作业。"""
+        self.cancel_event.set()
+        if self._future.cancel():
+            self.status = JOB_CANCELLED
+
+
+def submit_job(func, *args, name="", tk_root=None, on_done=None, pass_cancel_event=False, **kwargs):
+    """
+    在后台工作线程中运行 func(*args, **kwargs)，返回 JobHandle。on_done(handle) 在作业结束后调用。
+    pass_cancel_event=True 时另以关键字参数 cancel_event 传入 handle.cancel_event，运行中的 func 据此响应 cancel()
+    （如 SASSessionPool.run_files 停止分派并断开会话）。
+    """
+    handle = JobHandle(name or getattr(func, "__name__", ""), tk_root)
+    if pass_cancel_event:
+        kwargs["cancel_event"] = handle.cancel_event
+    _active_jobs.add(handle)
+    handle._future = _get_executor().submit(handle._run, func, args, kwargs)
+    if on_done:
+        handle.add_done_callback(on_done)
+    handle._future.add_done_callback(handle._on_future_done)
+    return handle
+
+
+def submit_sas_job(sas_file_path, tk_root=None, on_done=None, on_progress=None, abort_on_error=False, review_log=False):
+    """
+    后台运行 run_sas(sas_file_path)，返回 JobHandle（result() 为 run_sas 的返回值）。
+    on_progress(event)：日志流式进度（见 linux_sas_call_from_python._submit_with_log_tail），有 tk_root 时回到 Tk 主线程；
+    review_log：运行成功后在 Tk 主线程审阅日志（与 run_sas(check_log=True) 相同的弹窗），结果存于 handle.has_issue，
+    随后再调用 on_done。
+    """
+    from linux_sas_call_from_python import review_sas_log, run_sas
+
+    progress_cb = None
+    if on_progress is not None:
+        progress_cb = (lambda e: tk_root.after(0, on_progress, e)) if tk_root is not None else on_progress
+
+    handle = JobHandle(sas_file_path, tk_root)
+
+    def job():
+        return run_sas(
+            sas_file_path, check_log=False, on_progress=progress_cb,
+            abort_on_error=abort_on_error, cancel_event=handle.cancel_event,
+        )
+
+    def after_job(h):
+        if review_log and h.status == JOB_DONE:
+            h.has_issue = review_sas_log(sas_file_path)
+        if on_done:
+            on_done(h)
+
+    _active_jobs.add(handle)
+    handle._future = _get_executor().submit(handle._run, job, (), {})
+    handle.add_done_callback(after_job)
+    handle._future.add_done_callback(handle._on_future_done)
+    return handle
+
+
+def cancel_all_jobs():
+    """取消所有未结束的作业（主窗口关闭时调用）。"""
+    for handle in list(_active_jobs):
+        handle.cancel()
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+SAS 日志扫描（独立模块）
+
+所有规则编译为一个带命名分组的正则，对整个日志单遍扫描、逐行归类：
+ERROR、WARNING、[FAILED] / WARNINGS（%batch_submit 汇总行）、未初始化变量、MERGE 重复 BY 值等需关注的 NOTE。
+scan_log_text / scan_log_file 为每个日志返回一条汇总记录（各类计数、首次出现行号、命中行），
+供 linux_sas_call_from_python 的日志审阅、tfls_batch_run 的 Batch Run 结果弹窗等使用。
+"""
+import re
+
+# (类别, 正则)：顺序即同一行命中多类时的主类优先级
+LOG_RULES = (
+    ("error", r"ERROR\s*::|ERROR\s*:"),
+    ("warning", r"WARNING\s*::|WARNING\s*:"),
+    ("failed", r"(?-i:\[FAILED\])"),
+    ("batch_warnings", r"(?-i:WARNINGS)"),
+    ("uninitialized", r"\bis uninitialized\b"),
+    ("merge_by", r"MERGE statement has more than one data set with repeating BY values"),
+    ("invalid_data", r"\bInvalid (?:data|numeric data|argument)\b"),
+    ("missing_values", r"Missing values were generated"),
+    ("type_conversion", r"values have been converted to (?:numeric|character) values"),
+    ("division_by_zero", r"Division by zero"),
+    ("format_too_small", r"format was too small"),
+    ("math_ops", r"Mathematical operations could not be performed"),
+)
+
+# 日志审阅弹窗关注的类别（与原 ERROR_PATTERN / WARNING_PATTERN 一致）
+ISSUE_KINDS = ("error", "warning")
+# Batch Run 脚本日志中表示程序失败或有警告的汇总行
+BATCH_FAILED_KINDS = ("failed", "batch_warnings")
+
+_KIND_ORDER = {kind: i for i, (kind, _) in enumerate(LOG_RULES)}
+_LOG_RE = re.compile("|".join("(?P<%s>%s)" % (kind, pattern) for kind, pattern in LOG_RULES), re.IGNORECASE)
+
+
+def classify_line(line):
+    """返回单行命中的类别集合（无命中为空集合）。"""
+    return {m.lastgroup for m in _LOG_RE.finditer(line)}
+
+
+def primary_kind(kinds, among=None):
+    """按 LOG_RULES 优先级取主类别；among 限定候选类别，无命中返回 None。"""
+    candidates = [k for k in kinds if among is None or k in among]
+    return min(candidates, key=_KIND_ORDER.__getitem__) if candidates else None
+
+
+def scan_log_text(text, path=None):
+    """
+    单遍扫描日志文本，返回汇总记录 dict：
+    path、lines（总行数）、counts（类别 -> 命中行数）、first_line（类别 -> 首次出现行号）、
+    hits（[(行号, 行文本含换行符, 类别集合)]，按行号升序）。
+    """
+    text = text or ""
+    counts = {}
+    first_line = {}
+    hits = []
+    lineno = 1
+    pos = 0
+    current = None  # 当前命中行 [lineno, line, kinds]
+    for m in _LOG_RE.finditer(text):
+        start = m.start()
+        lineno += text.count("\n", pos, start)
+        pos = start
+        if current is None or current[0] != lineno:
+            line_start = text.rfind("\n", 0, start) + 1
+            line_end = text.find("\n", start)
+            line = text[line_start:] if line_end < 0 else text[line_start:line_end + 1]
+            current = [lineno, line, set()]
+            hits.append(current)
+        current[2].add(m.lastgroup)
+    for lineno, _, kinds in hits:
+        for kind in kinds:
+            counts[kind] = counts.get(kind, 0) + 1
+            first_line.setdefault(kind, lineno)
+    total_lines = text.count("\n") + (1 if text and not text.endswith("\n") else 0)
+    return {
+        "path": path,
+        "lines": total_lines,
+        "counts": counts,
+        "first_line": first_line,
+        "hits": [tuple(h) for h in hits],
+    }
+
+
+def scan_log_file(path):
+    """读取并扫描日志文件（utf-8，无法解码的字节替换）；读取失败时抛出 OSError。"""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return scan_log_text(f.read(), path)
+
+
+def has_issue(summary, kinds=ISSUE_KINDS):
+    """汇总记录中是否存在指定类别（默认 ERROR / WARNING）。"""
+    return any(summary["counts"].get(k) for k in kinds)
+
+
+def hit_lines(summary, kinds=ISSUE_KINDS):
+    """取命中指定类别的行：[(行文本, 主类别)]，主类别按 LOG_RULES 优先级在 kinds 中选取。"""
+    return [
+        (line, primary_kind(line_kinds, kinds))
+        for _, line, line_kinds in summary["hits"]
+        if not line_kinds.isdisjoint(kinds)
+    ]
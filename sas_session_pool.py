@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+"""
+SAS 会话池与会话管理器（独立模块）
+
+- SASSessionPool：维护 N 个常驻的 saspy 会话，并发执行多个 SAS 文件（Batch Run 第一步的 (out)_call.sas、
+  第三步的 _log_chk_N_call.sas 等）。某个会话被宏强制终止（terminated unexpectedly）时，
+  在后台重建该会话，其余工作线程不受影响继续执行；全部完成后按提交顺序返回每个文件的结果。
+- SASSessionManager：进程级单例（get_session_manager）。GUI 启动时在后台预热一个会话，
+  run_sas 未传入会话时从这里借用，省去每次点击「运行」的 SSH + SAS 启动时间。
+"""
+import atexit
+import os
+import queue
+import threading
+from concurrent.futures import FIRST_COMPLETED, CancelledError, ThreadPoolExecutor, wait
+
+from linux_sas_call_from_python import LOG_TAIL_INTERVAL, SAS_CFGNAME, SASRunAborted, is_session_terminated_error, run_sas
+
+# 默认并发会话数（每个会话在服务器上占一个 SAS 进程）
+DEFAULT_POOL_SIZE = 4
+
+
+def _new_session():
+    """建立一个新的 saspy 会话。"""
+    import saspy
+    return saspy.SASsession(cfgname=SAS_CFGNAME)
+
+
+def _end_session(sas):
+    """断开会话，忽略已退出会话的异常。"""
+    try:
+        sas.endsas()
+    except Exception:
+        pass
+
+
+def _session_alive(sas):
+    """健康检查：提交一条空语句，能正常返回即会话可用（空闲会话可能已被服务器回收）。"""
+    try:
+        sas.submit("%put;")
+        return True
+    except Exception:
+        return False
+
+
+class SASSessionPool:
+    """
+    有界 SAS 会话池。
+
+    用法：
+        with SASSessionPool(4) as pool:
+            results = pool.run_files(paths, on_file_done=callback)
+    每个结果为 dict：path / ok / terminated / error。terminated 表示该文件运行中 SAS 进程意外终止，会话在后台重建。
+    run_files 传入 cancel_event（如后台作业的 JobHandle.cancel_event）时，置位后不再分派未开始的文件，
+    运行中的文件断开会话中止，随后抛出 CancelledError。
+    terminated_ok=True 时视为成功（仅用于会主动结束 SAS 进程的 %batch_script_generator 等宏）；
+    默认视为失败（ok=False，error 为终止异常），避免程序崩溃后仍当作成功继续执行下游。
+    """
+
+    def __init__(self, size=DEFAULT_POOL_SIZE, terminated_ok=False):
+        self.size = max(1, int(size))
+        self.terminated_ok = terminated_ok
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._live = 0  # 已建立或正在建立的会话数
+        self._sessions = set()
+        self._closed = False
+        self._executor = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def start(self):
+        """后台并行建立 size 个会话，立即返回；首个会话就绪后即可开始执行。"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="sas-pool")
+            for _ in range(self.size):
+                self._spawn()
+        return self
+
+    def _spawn(self, old_session=None):
+        """后台线程中建立会话（可先断开 old_session），就绪后放入空闲队列。"""
+        with self._lock:
+            self._live += 1
+        threading.Thread(target=self._connect, args=(old_session,), daemon=True).start()
+
+    def _connect(self, old_session=None):
+        if old_session is not None:
+            _end_session(old_session)
+        try:
+            sas = _new_session()
+        except Exception as e:
+            with self._lock:
+                self._live -= 1
+                exhausted = self._live == 0
+            if exhausted:
+                # 所有会话均无法建立：放入异常唤醒等待中的工作线程
+                self._idle.put(e)
+            return
+        with self._lock:
+            closed = self._closed
+            if not closed:
+                self._sessions.add(sas)
+        if closed:
+            _end_session(sas)
+            return
+        self._idle.put(sas)
+
+    def _acquire(self):
+        item = self._idle.get()
+        if isinstance(item, BaseException):
+            self._idle.put(item)
+            raise item
+        return item
+
+    def _replace(self, sas):
+        """会话已失效：从池中移除，并在后台断开、重建。"""
+        with self._lock:
+            self._sessions.discard(sas)
+            self._live -= 1
+            closed = self._closed
+        if closed:
+            _end_session(sas)
+            return
+        self._spawn(old_session=sas)
+
+    def _run_one(self, sas_path, check_log=False, cancel_event=None):
+        result = {"path": sas_path, "ok": False, "terminated": False, "error": None}
+        try:
+            sas = self._acquire()
+        except Exception as e:
+            result["error"] = e
+            return result
+        if cancel_event is not None and cancel_event.is_set():
+            self._idle.put(sas)
+            result["error"] = CancelledError()
+            return result
+        try:
+            run_sas(sas_path, sas_session=sas, check_log=check_log, cancel_event=cancel_event)
+        except Exception as e:
+            if isinstance(e, SASRunAborted):
+                # 已取消：run_sas 已断开该会话
+                self._replace(sas)
+                result["error"] = e
+            elif is_session_terminated_error(e):
+                self._replace(sas)
+                result["terminated"] = True
+                if self.terminated_ok:
+                    result["ok"] = True
+                else:
+                    result["error"] = e
+            else:
+                self._idle.put(sas)
+                result["error"] = e
+            return result
+        self._idle.put(sas)
+        result["ok"] = True
+        return result
+
+    def submit(self, sas_path, check_log=False, cancel_event=None):
+        """提交单个 SAS 文件，返回 concurrent.futures.Future（结果 dict 同 run_files）。"""
+        self.start()
+        return self._executor.submit(self._run_one, sas_path, check_log, cancel_event)
+
+    def run_files(self, sas_paths, on_file_done=None, cancel_event=None):
+        """
+        并发执行 sas_paths，阻塞至全部完成，按提交顺序返回结果列表。
+        on_file_done(result, done_count, total)：每完成一个文件在调用方线程中回调（可安全更新界面状态）。
+        cancel_event：threading.Event，置位后取消未开始的文件、中止运行中的文件并断开全部会话，抛出 CancelledError。
+        """
+        futures = {self.submit(p, cancel_event=cancel_event): i for i, p in enumerate(sas_paths)}
+        results = [None] * len(sas_paths)
+        pending = set(futures)
+        done_count = 0
+        while pending:
+            done, pending = wait(pending, timeout=LOG_TAIL_INTERVAL, return_when=FIRST_COMPLETED)
+            for fut in done:
+                if fut.cancelled():
+                    continue
+                done_count += 1
+                res = fut.result()
+                results[futures[fut]] = res
+                if on_file_done:
+                    on_file_done(res, done_count, len(sas_paths))
+            if cancel_event is not None and cancel_event.is_set() and not self._closed:
+                with self._lock:
+                    self._closed = True  # 不再重建会话
+                self._idle.put(CancelledError())  # 唤醒等待会话的工作线程
+                for fut in pending:
+                    fut.cancel()
+        if cancel_event is not None and cancel_event.is_set():
+            self.close()
+            raise CancelledError()
+        return results
+
+    def close(self):
+        """等待已提交的文件执行完毕后断开全部会话。"""
+        with self._lock:
+            self._closed = True
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        with self._lock:
+            sessions = list(self._sessions)
+            self._sessions.clear()
+        for sas in sessions:
+            _end_session(sas)
+
+
+class SASSessionManager:
+    """
+    进程级 SAS 会话管理器。
+
+    - prewarm()：后台建立会话，保持 warm_count 个空闲会话随时可借；
+    - acquire()：借出一个经过健康检查的会话，预热中则等待其就绪，无可用会话时立即新建；
+    - release(sas, broken=False)：归还会话；broken=True（如 terminated unexpectedly）时断开并在后台重连；
+    - shutdown()：断开全部会话（程序退出时自动调用）。
+    """
+
+    def __init__(self, warm_count=1):
+        self.warm_count = warm_count
+        self._cond = threading.Condition()
+        self._idle = []
+        self._pending = 0  # 后台正在建立的会话数
+        self._closed = False
+
+    def prewarm(self):
+        """在后台补足空闲会话，立即返回。"""
+        with self._cond:
+            if self._closed:
+                return
+            need = self.warm_count - len(self._idle) - self._pending
+            self._pending += max(0, need)
+        for _ in range(max(0, need)):
+            threading.Thread(target=self._connect, daemon=True).start()
+
+    def _connect(self):
+        try:
+            sas = _new_session()
+        except Exception:
+            sas = None
+        with self._cond:
+            self._pending -= 1
+            closed = self._closed
+            if sas is not None and not closed:
+                self._idle.append(sas)
+            self._cond.notify_all()
+        if sas is not None and closed:
+            _end_session(sas)
+
+    def acquire(self):
+        """借出一个可用会话；使用完毕后须调用 release。"""
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError("SAS 会话管理器已关闭。")
+                while not self._idle and self._pending > 0:
+                    self._cond.wait()
+                sas = self._idle.pop() if self._idle else None
+            if sas is None:
+                # 预热失败或未预热：当场建立（失败时直接抛出连接异常）
+                sas = _new_session()
+                break
+            if _session_alive(sas):
+                break
+            _end_session(sas)
+        self.prewarm()
+        return sas
+
+    def release(self, sas, broken=False):
+        """归还会话。broken 表示 SAS 进程已退出，断开后在后台重连以备下次使用。"""
+        with self._cond:
+            keep = not broken and not self._closed and len(self._idle) < self.warm_count
+            if keep:
+                self._idle.append(sas)
+                self._cond.notify_all()
+        if not keep:
+            threading.Thread(target=_end_session, args=(sas,), daemon=True).start()
+            self.prewarm()
+
+    def shutdown(self):
+        """断开全部空闲会话；之后归还的会话也会被断开。"""
+        with self._cond:
+            self._closed = True
+            sessions = self._idle[:]
+            self._idle.clear()
+            self._cond.notify_all()
+        for sas in sessions:
+            _end_session(sas)
+
+
+_session_manager = None
+_session_manager_lock = threading.Lock()
+
+
+def get_session_manager():
+    """返回进程级 SASSessionManager 单例（首次调用时创建并注册退出时关闭）。"""
+    global _session_manager
+    with _session_manager_lock:
+        if _session_manager is None:
+            _session_manager = SASSessionManager()
+            atexit.register(_session_manager.shutdown)
+        return _session_manager
+
+
+def format_failed_results(results):
+    """将 run_files 结果中失败的文件整理为多行文本，供错误弹窗使用。"""
+    return "\n".join(
+        "%s：%s" % (os.path.basename(r["path"]), r["error"])
+        for r in results if not r["ok"]
+    )
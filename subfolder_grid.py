@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+"""
+主页 Subfolders 网格（独立模块）
+
+原实现为每个文件建一个 tk.Label 并逐个绑定悬停事件，07_logs、03_reports 动辄上千个文件，
+每次切换路径都要销毁重建，耗时且占内存。本模块改为在一个 Canvas 上直接绘制：
+- build_grid_model 对项目下每个子文件夹只做一次目录扫描，得到各列的条目列表；
+- SubfolderGrid 只绘制当前可见区域内的单元格，滚动时重绘，渲染耗时与列中文件数无关；
+- 外观与交互保持原样：列宽 120、列间距 2、灰色列标题、蓝色可点击条目、.ps1 黑色不可点击、
+  悬停高亮，名称被截断时悬停显示完整名称。
+"""
+import os
+import tkinter as tk
+import tkinter.font as tkfont
+from tkinter import ttk
+
+COLUMN_WIDTH = 120  # 与 SASEGGUI._jump_to_column 的列宽一致
+COLUMN_PADX = 2
+COLUMN_STRIDE = COLUMN_WIDTH + COLUMN_PADX * 2
+HEADER_HEIGHT = 26
+ROW_HEIGHT = 19
+
+# 任何时候都不显示的文件夹
+EXCLUDED_FOLDERS = ("00_source_data", "91_export", "92_import", "99_archive")
+# 这些文件夹下的文件名截断显示（前 30 个字符）
+TRUNCATE_FOLDERS = ("03_reports", "07_logs", "09_validation")
+TRUNCATE_LENGTH = 30
+
+_BG = "#f5f5f5"
+_HEADER_BG = "#d0d0d0"
+_HEADER_HOVER_BG = "#b0b0b0"
+_CELL_BG = "#ffffff"
+_CELL_HOVER_BG = "#e0e0e0"
+
+
+class GridColumn:
+    """网格中的一列：子文件夹名、完整路径及条目 [(名称, 是否文件夹)]（先文件夹后文件，各自按字母排序）。"""
+
+    def __init__(self, name, path, entries):
+        self.name = name
+        self.path = path
+        self.entries = entries
+
+
+def _sorted_entries(entries):
+    """先文件夹后文件，各自按名称排序。"""
+    return sorted(entries, key=lambda e: (not e[1], e[0]))
+
+
+def scan_column(dir_index, name, path):
+    """扫描单个子文件夹，返回 GridColumn；无法访问时条目为空。"""
+    try:
+        dirs, files = dir_index.scan(path)
+    except OSError:
+        dirs, files = [], []
+    return GridColumn(name, path, [(d, True) for d in dirs] + [(f, False) for f in files])
+
+
+def build_grid_model(dir_index, current_path):
+    """扫描 current_path 下各子文件夹（过滤 EXCLUDED_FOLDERS），返回按名称排序的 GridColumn 列表。"""
+    subfolders = [d for d in dir_index.list_dirs(current_path) if d not in EXCLUDED_FOLDERS]
+    return [scan_column(dir_index, name, os.path.join(current_path, name)) for name in subfolders]
+
+
+def _is_ps1(name, is_dir):
+    return not is_dir and os.path.splitext(name)[1].lower() == ".ps1"
+
+
+class SubfolderGrid:
+    """
+    Canvas 绘制的虚拟化网格。
+
+    set_columns(columns)：显示新的列模型；clear()：清空；
+    on_header_click(folder_path)：点击列标题；on_item_click(item_path)：点击条目（.ps1 不响应）。
+    """
+
+    def __init__(self, parent, on_header_click=None, on_item_click=None):
+        self.on_header_click = on_header_click
+        self.on_item_click = on_item_click
+        self.columns = []
+        self._display_cache = {}  # (列, 行) -> (显示文本, 是否截断)
+        self._cell_rects = {}  # 可见单元格 (列, 行) -> 背景矩形 id；行 -1 为列标题
+        self._hover = None
+        self._tooltip = None
+        self._render_pending = False
+
+        self.font = tkfont.Font(family="Arial", size=8)
+        self.header_font = tkfont.Font(family="Arial", size=9, weight="bold")
+
+        self.canvas = tk.Canvas(parent, bg=_BG, highlightthickness=0, yscrollincrement=ROW_HEIGHT)
+        v_scrollbar = ttk.Scrollbar(parent, orient="vertical", command=self._yview)
+        h_scrollbar = ttk.Scrollbar(parent, orient="horizontal", command=self._xview)
+        # 视图任何变化（滚动条、滚轮、xview_moveto 跳转）都经由滚动命令，在此触发重绘
+        self.canvas.configure(
+            yscrollcommand=lambda *a: self._on_view_changed(v_scrollbar, *a),
+            xscrollcommand=lambda *a: self._on_view_changed(h_scrollbar, *a),
+        )
+
+        self.canvas.grid(row=0, column=0, sticky="nsew")
+        v_scrollbar.grid(row=0, column=1, sticky="ns")
+        h_scrollbar.grid(row=1, column=0, sticky="ew")
+        parent.grid_rowconfigure(0, weight=1)
+        parent.grid_columnconfigure(0, weight=1)
+
+        self.canvas.bind("<Configure>", lambda e: self._schedule_render())
+        self.canvas.bind("<Motion>", self._on_motion)
+        self.canvas.bind("<Leave>", lambda e: self._set_hover(None))
+        self.canvas.bind("<Button-1>", self._on_click)
+        self.canvas.bind("<MouseWheel>", self._on_mousewheel)
+        self.canvas.bind("<Shift-MouseWheel>", self._on_shift_mousewheel)
+        self.canvas.bind("<Button-4>", lambda e: self._yview("scroll", -3, "units"))
+        self.canvas.bind("<Button-5>", lambda e: self._yview("scroll", 3, "units"))
+
+    # ---------- 模型 ----------
+
+    def set_columns(self, columns):
+        """显示新的列模型（滚动回左上角）。"""
+        self.columns = list(columns)
+        self._display_cache.clear()
+        self._set_hover(None)
+        self._update_scrollregion()
+        self.canvas.xview_moveto(0)
+        self.canvas.yview_moveto(0)
+        self._schedule_render()
+
+    def clear(self):
+        self.set_columns([])
+
+    def apply_deltas(self, deltas):
+        """
+        按 project_watcher.FolderDelta 列表增量更新列（新增 / 删除列、列内新增 / 删除条目），保持当前滚动位置。
+        返回是否有列被新增或删除。
+        """
+        columns_changed = False
+        by_name = {col.name: col for col in self.columns}
+        for d in deltas:
+            col = by_name.get(d.name)
+            if d.folder_removed:
+                if col is not None:
+                    self.columns.remove(col)
+                    del by_name[d.name]
+                    columns_changed = True
+            elif col is None:
+                col = GridColumn(d.name, d.path, _sorted_entries(d.added))
+                self.columns.append(col)
+                by_name[d.name] = col
+                columns_changed = True
+            else:
+                entries = set(col.entries)
+                entries.difference_update(d.removed)
+                entries.update(d.added)
+                col.entries = _sorted_entries(entries)
+        if columns_changed:
+            self.columns.sort(key=lambda c: c.name)
+        self._display_cache.clear()
+        self._set_hover(None)
+        self._update_scrollregion()
+        self._schedule_render()
+        return columns_changed
+
+    def _update_scrollregion(self):
+        max_rows = max((len(col.entries) for col in self.columns), default=0)
+        width = len(self.columns) * COLUMN_STRIDE
+        height = HEADER_HEIGHT + max_rows * ROW_HEIGHT + COLUMN_PADX
+        self.canvas.configure(scrollregion=(0, 0, width, height))
+
+    def _display(self, ci, ri):
+        """条目显示文本：指定文件夹按字符数截断，再按列宽截断；返回 (文本, 是否截断)。"""
+        key = (ci, ri)
+        hit = self._display_cache.get(key)
+        if hit is None:
+            col = self.columns[ci]
+            name = col.entries[ri][0]
+            text = name
+            if col.name in TRUNCATE_FOLDERS and len(name) > TRUNCATE_LENGTH:
+                text = name[:TRUNCATE_LENGTH] + "..."
+            text = self._fit(text, self.font, COLUMN_WIDTH - 10)
+            hit = self._display_cache[key] = (text, text != name)
+        return hit
+
+    @staticmethod
+    def _fit(text, font, width):
+        if font.measure(text) <= width:
+            return text
+        lo, hi = 0, len(text)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if font.measure(text[:mid] + "...") <= width:
+                lo = mid
+            else:
+                hi = mid - 1
+        return text[:lo] + "..."
+
+    # ---------- 绘制 ----------
+
+    def _on_view_changed(self, scrollbar, first, last):
+        scrollbar.set(first, last)
+        self._schedule_render()
+
+    def _schedule_render(self):
+        if not self._render_pending:
+            self._render_pending = True
+            self.canvas.after_idle(self._render)
+
+    def _render(self):
+        """只绘制可见区域内的单元格。"""
+        self._render_pending = False
+        c = self.canvas
+        c.delete("cell")
+        self._cell_rects = {}
+        if not self.columns:
+            return
+        x0 = c.canvasx(0)
+        y0 = c.canvasy(0)
+        x1 = x0 + c.winfo_width()
+        y1 = y0 + c.winfo_height()
+        first_col = max(0, int(x0 // COLUMN_STRIDE))
+        last_col = min(len(self.columns) - 1, int(x1 // COLUMN_STRIDE))
+        first_row = max(0, int((y0 - HEADER_HEIGHT) // ROW_HEIGHT))
+        last_row = int((y1 - HEADER_HEIGHT) // ROW_HEIGHT)
+
+        for ci in range(first_col, last_col + 1):
+            col = self.columns[ci]
+            x = ci * COLUMN_STRIDE + COLUMN_PADX
+            if y0 < HEADER_HEIGHT:
+                self._cell_rects[(ci, -1)] = c.create_rectangle(
+                    x, COLUMN_PADX, x + COLUMN_WIDTH, HEADER_HEIGHT - COLUMN_PADX,
+                    fill=_HEADER_BG, outline="#a0a0a0", tags=("cell",))
+                c.create_text(
+                    x + COLUMN_WIDTH / 2, HEADER_HEIGHT / 2,
+                    text=self._fit(col.name, self.header_font, COLUMN_WIDTH - 10),
+                    font=self.header_font, fill="blue", tags=("cell",))
+            for ri in range(first_row, min(last_row, len(col.entries) - 1) + 1):
+                name, is_dir = col.entries[ri]
+                y = HEADER_HEIGHT + ri * ROW_HEIGHT
+                self._cell_rects[(ci, ri)] = c.create_rectangle(
+                    x, y + 1, x + COLUMN_WIDTH, y + ROW_HEIGHT,
+                    fill=_CELL_BG, outline="", tags=("cell",))
+                c.create_text(
+                    x + 5, y + 1 + ROW_HEIGHT / 2, anchor="w", text=self._display(ci, ri)[0],
+                    font=self.font, fill="black" if _is_ps1(name, is_dir) else "blue", tags=("cell",))
+
+        if self._hover in self._cell_rects:
+            c.itemconfig(self._cell_rects[self._hover], fill=self._hover_bg(self._hover))
+
+    def _yview(self, *args):
+        self._set_hover(None)
+        self.canvas.yview(*args)
+
+    def _xview(self, *args):
+        self._set_hover(None)
+        self.canvas.xview(*args)
+
+    def _on_mousewheel(self, event):
+        self._yview("scroll", int(-event.delta / 120) * 3, "units")
+
+    def _on_shift_mousewheel(self, event):
+        self._xview("scroll", int(-event.delta / 120), "units")
+
+    # ---------- 交互 ----------
+
+    def _cell_at(self, event):
+        """事件位置对应的单元格 (列, 行)，行 -1 为列标题；不在单元格上返回 None。"""
+        cx = self.canvas.canvasx(event.x)
+        cy = self.canvas.canvasy(event.y)
+        ci = int(cx // COLUMN_STRIDE)
+        if cx < 0 or ci >= len(self.columns):
+            return None
+        offset = cx - ci * COLUMN_STRIDE
+        if offset < COLUMN_PADX or offset > COLUMN_PADX + COLUMN_WIDTH:
+            return None
+        if cy < HEADER_HEIGHT:
+            return (ci, -1)
+        ri = int((cy - HEADER_HEIGHT) // ROW_HEIGHT)
+        if ri >= len(self.columns[ci].entries):
+            return None
+        return (ci, ri)
+
+    def _clickable(self, cell):
+        if cell is None:
+            return False
+        ci, ri = cell
+        return ri < 0 or not _is_ps1(*self.columns[ci].entries[ri])
+
+    def _hover_bg(self, cell):
+        return _HEADER_HOVER_BG if cell[1] < 0 else _CELL_HOVER_BG
+
+    def _set_hover(self, cell, event=None):
+        if cell == self._hover:
+            return
+        if self._hover in self._cell_rects:
+            self.canvas.itemconfig(self._cell_rects[self._hover], fill=_HEADER_BG if self._hover[1] < 0 else _CELL_BG)
+        if self._tooltip is not None:
+            self._tooltip.destroy()
+            self._tooltip = None
+        self._hover = cell if self._clickable(cell) else None
+        self.canvas.config(cursor="hand2" if self._hover else "")
+        if self._hover is None:
+            return
+        if self._hover in self._cell_rects:
+            self.canvas.itemconfig(self._cell_rects[self._hover], fill=self._hover_bg(self._hover))
+        ci, ri = self._hover
+        if ri >= 0 and event is not None and self._display(ci, ri)[1]:
+            self._show_tooltip(self.columns[ci].entries[ri][0], event)
+
+    def _show_tooltip(self, text, event):
+        tooltip = tk.Toplevel(self.canvas)
+        tooltip.wm_overrideredirect(True)
+        tooltip.wm_geometry("+%d+%d" % (event.x_root + 10, event.y_root + 10))
+        tk.Label(
+            tooltip, text=text, bg="#ffffe0", relief=tk.SOLID, borderwidth=1,
+            padx=5, pady=2, font=("Arial", 8)
+        ).pack()
+        self._tooltip = tooltip
+
+    def _on_motion(self, event):
+        self._set_hover(self._cell_at(event), event)
+
+    def _on_click(self, event):
+        cell = self._cell_at(event)
+        if not self._clickable(cell):
+            return
+        ci, ri = cell
+        col = self.columns[ci]
+        if ri < 0:
+            if self.on_header_click:
+                self.on_header_click(col.path)
+        elif self.on_item_click:
+            self.on_item_click(os.path.join(col.path, col.entries[ri][0]))
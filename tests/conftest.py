@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+"""pytest 配置：将项目根目录加入 sys.path（模块均为根目录下的平铺模块）。"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""tfls_pdt_gen._compact_rows：删除行后行高、合并单元格、数据验证、条件格式、超链接随行移动（openpyxl 与补丁写入两条路径）。"""
+import pytest
+from openpyxl import Workbook, load_workbook
+from openpyxl.formatting.rule import CellIsRule
+from openpyxl.styles import PatternFill
+from openpyxl.worksheet.datavalidation import DataValidation
+from openpyxl.worksheet.hyperlink import Hyperlink
+
+from pdt_xlsx_patch import XlsxPatch, compact_range, compact_sqref
+from tfls_pdt_gen import _compact_rows
+
+
+def _make_sheet(path):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Deliverables"
+    for r in range(1, 9):
+        ws.cell(row=r, column=1, value="R%d" % r)
+        ws.cell(row=r, column=3, value=r)
+    ws.merge_cells("A6:B6")
+    ws.merge_cells("D2:E3")  # 全部位于被删除的行中
+    ws.merge_cells("F3:F5")  # 左上角所在行被删除
+    ws.row_dimensions[5].height = 40
+    dv = DataValidation(type="list", formula1='"a,b"', allow_blank=True)
+    ws.add_data_validation(dv)
+    dv.add("C2:C7")
+    dv_gone = DataValidation(type="list", formula1='"x,y"', allow_blank=True)
+    ws.add_data_validation(dv_gone)
+    dv_gone.add("G2:G3")
+    red = PatternFill(fill_type="solid", fgColor="FF0000")
+    ws.conditional_formatting.add("C4:C8", CellIsRule(operator="greaterThan", formula=["5"], fill=red))
+    ws.auto_filter.ref = "A1:C8"
+    ws["B2"].hyperlink = "https://example.com/deleted"  # 位于被删除的行中
+    ws["B5"].hyperlink = "https://example.com/moved"
+    ws["B7"].hyperlink = Hyperlink(ref="B7", location="'Deliverables'!A1")
+    wb.save(path)
+
+
+def _hyperlinks(ws):
+    return {c.coordinate: c.hyperlink.target or c.hyperlink.location
+            for row in ws.iter_rows() for c in row if c.hyperlink is not None}
+
+
+def _check(ws):
+    assert [ws.cell(row=r, column=1).value for r in range(1, 7)] == ["R1", "R4", "R5", "R6", "R7", "R8"]
+    assert sorted(str(r) for r in ws.merged_cells.ranges) == ["A4:B4", "F2:F3"]
+    assert ws.row_dimensions[3].height == 40
+    assert not ws.row_dimensions[5].height
+    dvs = ws.data_validations.dataValidation
+    assert [str(dv.sqref) for dv in dvs] == ["C2:C5"]
+    assert [str(cf.sqref) for cf in ws.conditional_formatting] == ["C2:C6"]
+    assert ws.auto_filter.ref == "A1:C6"
+    assert _hyperlinks(ws) == {"B3": "https://example.com/moved", "B5": "'Deliverables'!A1"}
+
+
+def test_compact_range():
+    rows = [2, 3]
+    assert compact_range("A6:B6", rows) == "A4:B4"
+    assert compact_range("C2:C7", rows) == "C2:C5"
+    assert compact_range("D2:E3", rows) is None
+    assert compact_range("F3:F5", rows) == "F2:F3"
+    assert compact_range("B1", rows) == "B1"
+    assert compact_range("A:C", rows) == "A:C"
+    assert compact_range("4:9", rows) == "2:7"
+    assert compact_sqref("C2:C3 D1:D9", rows) == "D1:D7"
+
+
+def test_compact_rows_openpyxl(tmp_path):
+    path = str(tmp_path / "pdt.xlsx")
+    _make_sheet(path)
+    wb = load_workbook(path)
+    _compact_rows(wb["Deliverables"], [2, 3])
+    _check(wb["Deliverables"])
+    wb.save(path)
+    _check(load_workbook(path)["Deliverables"])
+
+
+def test_compact_rows_patch(tmp_path):
+    path = str(tmp_path / "pdt.xlsx")
+    _make_sheet(path)
+    wb = XlsxPatch(path)
+    _compact_rows(wb["Deliverables"], [2, 3])
+    wb.save()
+    _check(load_workbook(path)["Deliverables"])
+
+
+@pytest.mark.parametrize("rows", [[], [8], [1, 8], [2, 4, 6]])
+def test_patch_matches_openpyxl(tmp_path, rows):
+    """两条路径删除相同的行后，单元格值与各区域一致。"""
+    p1, p2 = str(tmp_path / "a.xlsx"), str(tmp_path / "b.xlsx")
+    _make_sheet(p1)
+    _make_sheet(p2)
+    wb = load_workbook(p1)
+    _compact_rows(wb["Deliverables"], rows)
+    wb.save(p1)
+    patch = XlsxPatch(p2)
+    _compact_rows(patch["Deliverables"], rows)
+    patch.save()
+    a, b = load_workbook(p1)["Deliverables"], load_workbook(p2)["Deliverables"]
+    assert [[c.value for c in r] for r in a.iter_rows()] == [[c.value for c in r] for r in b.iter_rows()]
+    assert sorted(map(str, a.merged_cells.ranges)) == sorted(map(str, b.merged_cells.ranges))
+    assert [str(d.sqref) for d in a.data_validations.dataValidation] == [str(d.sqref) for d in b.data_validations.dataValidation]
+    assert [str(cf.sqref) for cf in a.conditional_formatting] == [str(cf.sqref) for cf in b.conditional_formatting]
+    assert {r: d.height for r, d in a.row_dimensions.items() if d.height} == {r: d.height for r, d in b.row_dimensions.items() if d.height}
+    assert _hyperlinks(a) == _hyperlinks(b)
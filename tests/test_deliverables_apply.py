@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""tfls_pdt_gen apply 模式：删除的 Output 行之下的合并单元格、行高、条件格式仍对应原记录。"""
+import pytest
+from openpyxl import Workbook, load_workbook
+from openpyxl.formatting.rule import CellIsRule
+from openpyxl.styles import PatternFill
+
+import tfls_pdt_gen
+from pdt_xlsx_patch import XlsxPatch
+
+HEADERS = ["OUTCAT", "OUTTYPE", "OUTTITLE", "OUTPOP", "OUTFNOTE", "OUTREF", "USERDEV", "USERQC", "PGMLEVEL", "OUTSTS", "STASCHK"]
+FILL = PatternFill(fill_type="solid", fgColor="DDEBF7")
+
+
+def _make_pdt(path):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Deliverables"
+    ws.append(HEADERS)
+    for i in range(1, 6):
+        ws.append(["Output", "Table", "T%d" % i, "SS", "", "14.1.%d" % i, "Dev%d" % i, "QC", "Non-critical", "", "Not Started"])
+        for col in range(1, len(HEADERS) + 1):
+            ws.cell(row=i + 1, column=col).fill = FILL
+    ws.append(["Program", "", "Program row", "", "", "P1"])
+    ws.merge_cells("C7:E7")  # 位于被删除行之下的非 Output 记录
+    ws.row_dimensions[7].height = 33
+    ws.conditional_formatting.add("F7", CellIsRule(operator="equal", formula=['"P1"'], fill=FILL))
+    wb.create_sheet("List Values")
+    wb.save(path)
+
+
+def _new_rows(refs):
+    return [dict(tfls_pdt_gen.DELIVERABLES_ROW_DEFAULTS, **{
+        "Output Type": "Table", "Title": "T%s" % ref.rsplit(".", 1)[1], "Population": "SS", "Footnotes": "",
+        "Output Reference": ref}) for ref in refs]
+
+
+@pytest.mark.parametrize("opener", [load_workbook, XlsxPatch], ids=["openpyxl", "patch"])
+def test_apply_keeps_ranges_on_their_records(tmp_path, monkeypatch, opener):
+    monkeypatch.setattr(tfls_pdt_gen, "_backup_pdt", lambda path: None)
+    path = str(tmp_path / "pdt.xlsx")
+    _make_pdt(path)
+    # 删除 14.1.2、14.1.3，新增 14.1.9
+    ok, _ = tfls_pdt_gen._write_deliverables(opener(path), path, _new_rows(["14.1.1", "14.1.4", "14.1.5", "14.1.9"]), "apply")
+    assert ok
+    ws = load_workbook(path)["Deliverables"]
+    refs = [ws.cell(row=r, column=6).value for r in range(2, ws.max_row + 1)]
+    assert refs == ["14.1.1", "14.1.4", "14.1.5", "P1", "14.1.9"]
+    # 人工分配的 Developers 保持不变
+    assert [ws.cell(row=r, column=7).value for r in range(2, 5)] == ["Dev1", "Dev4", "Dev5"]
+    program_row = refs.index("P1") + 2
+    assert [str(r) for r in ws.merged_cells.ranges] == ["C%d:E%d" % (program_row, program_row)]
+    assert ws.row_dimensions[program_row].height == 33
+    assert [str(cf.sqref) for cf in ws.conditional_formatting] == ["F%d" % program_row]
+
+
+def _move_validations_to_x14(path):
+    """模拟 Excel 保存：引用其他 sheet 的数据验证写在 extLst 的 x14:dataValidations 中，另加一个用户自建的验证。"""
+    import re
+    import zipfile
+
+    with zipfile.ZipFile(path) as zf:
+        parts = {n: zf.read(n) for n in zf.namelist()}
+    xml = parts["xl/worksheets/sheet1.xml"].decode("utf-8")
+    block = re.search(r"<dataValidations\b.*?</dataValidations>", xml, re.S).group(0)
+    items = []
+    for m in re.finditer(r"<dataValidation\b([^>]*)>\s*<formula1>=?(.*?)</formula1>", block, re.S):
+        sqref = re.search(r'sqref="([^"]*)"', m.group(1)).group(1)
+        items.append('<x14:dataValidation type="list" allowBlank="1"><x14:formula1><xm:f>%s</xm:f></x14:formula1>'
+                     "<xm:sqref>%s</xm:sqref></x14:dataValidation>" % (m.group(2), sqref))
+    items.append('<x14:dataValidation type="list" allowBlank="1"><x14:formula1><xm:f>\'List Values\'!$H$2:$H$5</xm:f>'
+                 "</x14:formula1><xm:sqref>K2:K6</xm:sqref></x14:dataValidation>")
+    ext = ('<extLst><ext uri="{CCE6A557-97BC-4b89-ADB6-D9C93CAAB3DF}" '
+           'xmlns:x14="http://schemas.microsoft.com/office/spreadsheetml/2009/9/main">'
+           '<x14:dataValidations count="%d" xmlns:xm="http://schemas.microsoft.com/office/excel/2006/main">%s'
+           "</x14:dataValidations></ext></extLst>" % (len(items), "".join(items)))
+    xml = xml.replace(block, "").replace("</worksheet>", ext + "</worksheet>")
+    parts["xl/worksheets/sheet1.xml"] = xml.encode("utf-8")
+    with zipfile.ZipFile(path, "w") as zf:
+        for n, data in parts.items():
+            zf.writestr(n, data)
+    return len(items)
+
+
+def test_patch_merges_x14_list_validations(tmp_path, monkeypatch):
+    import zipfile
+
+    monkeypatch.setattr(tfls_pdt_gen, "_backup_pdt", lambda path: None)
+    path = str(tmp_path / "pdt.xlsx")
+    _make_pdt(path)
+    rows = _new_rows(["14.1.1", "14.1.4", "14.1.9"])
+    assert tfls_pdt_gen._write_deliverables(load_workbook(path), path, rows, "apply")[0]
+    assert _move_validations_to_x14(path) == 5
+    for ref in ("14.1.10", "14.1.11"):  # Excel 编辑后反复重新生成，验证个数不增长
+        rows = rows + _new_rows([ref])
+        ok, _ = tfls_pdt_gen._write_deliverables(XlsxPatch(path), path, rows, "apply")
+        assert ok
+        with zipfile.ZipFile(path) as zf:
+            xml = zf.read("xl/worksheets/sheet1.xml").decode("utf-8")
+        assert "x14:dataValidations" not in xml and "<extLst" not in xml
+        dvs = load_workbook(path)["Deliverables"].data_validations.dataValidation
+        keys = [tfls_pdt_gen._formula_key(dv.formula1) for dv in dvs]
+        assert len(keys) == len(set(keys)) == 5
+    by_key = {tfls_pdt_gen._formula_key(dv.formula1): str(dv.sqref) for dv in dvs}
+    assert by_key["'LIST VALUES'!$H$2:$H$5"] == "K2:K6"  # 用户自建的验证保留
+    assert by_key["'LIST VALUES'!$A$2:$A$200"] == "G5:H7"  # 历次追加的区域合并为一个
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""tfls_pdt_gen.gen_toc_study 沿用 PDT 的 OUTREF 规则，与 SAP 页面「初版TOC」（toc_engine.gen_toc_study）不同。"""
+from openpyxl import Workbook, load_workbook
+
+import tfls_pdt_gen
+import toc_engine
+
+
+def _make_template(path):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "PH1"
+    ws.append(["Template#", "Output Type", "Title_CN", "Title_EN", "Population", "Footnotes_CN", "Footnotes_EN",
+               "Category_CN", "SAD", "FE", "MAD", "BE", "MB"])
+    ws.append(["14.1.1", "Table", "受试者分布", "Disposition", "SS", "", "", "受试者", "Y", None, "Y", None, None])
+    ws.append(["14.3.1-5", "Table", "导致[AEACN]的不良事件", "AE leading to [AEACN]", "SS", "", "", "安全性",
+               "Y", None, None, None, None])
+    wb.save(path)
+
+
+def _toc_rows(path):
+    ws = load_workbook(path)["TOC"]
+    return [(ws.cell(row=r, column=2).value, ws.cell(row=r, column=3).value) for r in range(2, ws.max_row + 1)]
+
+
+def test_pdt_rules_differ_from_initial_toc(tmp_path, monkeypatch):
+    monkeypatch.setattr(toc_engine, "load_cached", lambda namespace, path, build, **kwargs: build())
+    template = str(tmp_path / "TOC_template.xlsx")
+    _make_template(template)
+    pdt_toc, sap_toc = str(tmp_path / "pdt" / "TOC.xlsx"), str(tmp_path / "sap" / "TOC.xlsx")
+    assert tfls_pdt_gen.gen_toc_study(template, pdt_toc, None, ["SAD"], [])[0]
+    # 单选设计类型也追加 .1，[AEACN] 不展开
+    assert _toc_rows(pdt_toc) == [("14.1.1.1", "受试者分布"), ("14.3.1-5.1", "导致[AEACN]的不良事件")]
+    assert toc_engine.gen_toc_study(template, sap_toc, None, ["SAD"], [])[0]
+    assert _toc_rows(sap_toc) == [("14.1.1", "受试者分布")]  # 无 AEACN 标签时 [AEACN] 行不输出
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""pdt_xlsx_patch：对 openpyxl 写出的 PDT 做补丁读写，结果与 openpyxl 读取一致。"""
+import datetime
+import zipfile
+
+import pytest
+from openpyxl import Workbook, load_workbook
+from openpyxl.worksheet.datavalidation import DataValidation
+
+from pdt_xlsx_patch import PatchUnsupported, XlsxPatch
+
+
+@pytest.fixture
+def pdt_path(tmp_path):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Deliverables"
+    ws.append(["OUTCAT", "OUTTITLE", "OUTREF", "N", "TOTAL"])
+    for i in range(1, 7):
+        ws.append(["Output", "标题 <%d> & \"x\"" % i, "14.1.%d" % i, i, "=D%d*2" % (i + 1)])
+    ws["F2"] = 1.5
+    ws["G2"] = True
+    dv = DataValidation(type="list", formula1='"Y,N"', allow_blank=True)
+    ws.add_data_validation(dv)
+    dv.add("G2:G7")
+    wb.create_sheet("List Values").append(["Gang Cheng"])
+    path = str(tmp_path / "pdt.xlsx")
+    wb.save(path)
+    return path
+
+
+def _values(ws, max_col=7):
+    return [[ws.cell(row=r, column=c).value for c in range(1, max_col + 1)] for r in range(1, ws.max_row + 1)]
+
+
+def test_reads_shared_strings_numbers_and_formulas(pdt_path):
+    expected = _values(load_workbook(pdt_path)["Deliverables"])
+    ws = XlsxPatch(pdt_path)["Deliverables"]
+    assert _values(ws) == expected
+    assert ws.cell(row=2, column=2).value == "标题 <1> & \"x\""  # 共享字符串（含需转义字符）
+    assert ws.cell(row=2, column=5).value == "=D2*2"
+    assert ws.max_row == 7
+
+
+def test_write_inline_strings_and_formulas_round_trip(pdt_path):
+    wb = XlsxPatch(pdt_path)
+    ws = wb["Deliverables"]
+    ws.cell(row=3, column=2, value="新标题 <a> & 'b'")
+    ws.cell(row=3, column=5, value="=D3+100")
+    ws.cell(row=8, column=1, value="Output")
+    ws.cell(row=8, column=4, value=42)
+    ws.cell(row=2, column=6).value = None
+    wb.save()
+    # 补丁再次读取与 openpyxl 读取一致
+    ws2 = XlsxPatch(pdt_path)["Deliverables"]
+    ws_o = load_workbook(pdt_path)["Deliverables"]
+    assert _values(ws2) == _values(ws_o)
+    assert ws_o["B3"].value == "新标题 <a> & 'b'"
+    assert ws_o["E3"].value == "=D3+100"
+    assert (ws_o["A8"].value, ws_o["D8"].value, ws_o["F2"].value) == ("Output", 42, None)
+    assert ws2.cell(row=3, column=2).attrs.get("t") == "inlineStr"
+
+
+def test_untouched_parts_are_copied_verbatim(pdt_path):
+    with zipfile.ZipFile(pdt_path) as zf:
+        before = {n: zf.read(n) for n in zf.namelist()}
+    wb = XlsxPatch(pdt_path)
+    wb["Deliverables"].cell(row=2, column=2, value="x")
+    wb.save()
+    with zipfile.ZipFile(pdt_path) as zf:
+        after = {n: zf.read(n) for n in zf.namelist()}
+    assert set(before) == set(after)
+    changed = {n for n in before if before[n] != after[n]}
+    assert changed <= {"xl/worksheets/sheet1.xml", "xl/workbook.xml"}
+    assert "xl/worksheets/sheet1.xml" in changed
+
+
+def test_row_deletion(pdt_path):
+    wb = XlsxPatch(pdt_path)
+    wb["Deliverables"].compact_rows([3, 5])
+    wb.save()
+    ws = load_workbook(pdt_path)["Deliverables"]
+    assert [ws.cell(row=r, column=3).value for r in range(2, ws.max_row + 1)] == ["14.1.1", "14.1.3", "14.1.5", "14.1.6"]
+    assert [str(dv.sqref) for dv in ws.data_validations.dataValidation] == ["G2:G5"]
+
+
+def test_shared_formula_rows_cannot_move(tmp_path, pdt_path):
+    # 将 E 列改为共享公式：移动这些行时抛出 PatchUnsupported，且不修改状态
+    with zipfile.ZipFile(pdt_path) as zf:
+        parts = {n: zf.read(n) for n in zf.namelist()}
+    xml = parts["xl/worksheets/sheet1.xml"].decode("utf-8")
+    xml = xml.replace("<f>D3*2</f>", '<f t="shared" ref="E3:E4" si="0">D3*2</f>', 1)
+    parts["xl/worksheets/sheet1.xml"] = xml.encode("utf-8")
+    path = str(tmp_path / "shared.xlsx")
+    with zipfile.ZipFile(path, "w") as zf:
+        for n, data in parts.items():
+            zf.writestr(n, data)
+    ws = XlsxPatch(path)["Deliverables"]
+    with pytest.raises(PatchUnsupported):
+        ws.compact_rows([2])
+    assert ws.cell(row=3, column=3).value == "14.1.2"
+
+
+def test_data_validation_rewrite(pdt_path):
+    wb = XlsxPatch(pdt_path)
+    ws = wb["Deliverables"]
+    existing = ws.data_validations.dataValidation
+    assert [(dv.formula1, str(dv.sqref)) for dv in existing] == [('"Y,N"', "G2:G7")]
+    existing[0].sqref.add("G8:G9")
+    dv = DataValidation(type="list", formula1="='List Values'!$A$2:$A$200", allow_blank=True)
+    ws.add_data_validation(dv)
+    dv.add("H2:H9")
+    wb.save()
+    dvs = load_workbook(pdt_path)["Deliverables"].data_validations.dataValidation
+    assert sorted((d.formula1, str(d.sqref)) for d in dvs) == [
+        ('"Y,N"', "G2:G7 G8:G9"), ("='List Values'!$A$2:$A$200", "H2:H9")]
+    with zipfile.ZipFile(pdt_path) as zf:
+        assert zf.read("xl/worksheets/sheet1.xml").count(b"<dataValidations") == 1
+
+
+def test_date_cells_are_unsupported(tmp_path):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Deliverables"
+    ws["A1"] = datetime.date(2024, 1, 2)
+    ws["B1"] = 45293
+    path = str(tmp_path / "dates.xlsx")
+    wb.save(path)
+    ws = XlsxPatch(path)["Deliverables"]
+    assert ws.cell(row=1, column=2).value == 45293
+    with pytest.raises(PatchUnsupported):
+        ws.cell(row=1, column=1).value
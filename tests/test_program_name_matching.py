@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+program_name 标题匹配的差分测试：section 标题索引（_SectionMatcher.best_row）与
+原先对全部 shell 行线性扫描的 _match_single_level / _match_two_level / _match_three_level 结果一致。
+设置环境变量 PROGRAM_NAME_XLSX 指向真实的 program_name.xlsx 时，另对其中全部 section 做同样比对。
+"""
+import os
+import random
+
+import pytest
+
+import pdt_fill_from_program_name as pf
+
+SECTION_OUTREF = {
+    "14.1": "Table 14.1.1", "14.2": "Table 14.2.3", "14.3.1": "Table 14.3.1.2", "14.3.4": "Table 14.3.4.1",
+    "14.3.2": "Table 14.3.2.5", "14.3.5": "Table 14.3.5.1", "14.4": "Table 14.4.1", "16.2": "Listing 16.2.7",
+}
+
+
+def _linear_best(section, outtitle, outref, outtype, outpop, shell_rows):
+    """原 match_pdt_row 的匹配部分：按 section 层级对全部 shell 行线性扫描。"""
+    norm = pf._lowcase(outtitle)
+    if section in ("14.3.1", "14.3.4"):
+        return pf._match_three_level(norm, outtitle, outref, outtype, outpop, shell_rows)
+    if section in ("14.3.2", "14.3.5"):
+        return pf._match_two_level(norm, outtitle, outref, outtype, outpop, shell_rows)
+    return pf._match_single_level(norm, shell_rows, outtype, outpop)
+
+
+def _assert_same(section, shell_rows, outputs):
+    matcher = pf._SectionMatcher(shell_rows, pf.SECTION_TITLE_LEVELS.get(section, 1))
+    outref = SECTION_OUTREF.get(section, section)
+    for outtitle, outtype, outpop in outputs:
+        expected = _linear_best(section, outtitle, outref, outtype, outpop, shell_rows)
+        row_idx = matcher.best_row(pf._lowcase(outtitle))
+        got = None if row_idx is None else _linear_best(
+            section, outtitle, outref, outtype, outpop, [shell_rows[row_idx]])
+        assert got == expected, (section, outtitle)
+
+
+def _shell_row(titles, pgms, sysparms):
+    row = {"title1": "", "title2": "", "title3": "", "pgm1": "", "pgm2": "", "pgm3": "",
+           "sysparm1": "", "sysparm2": "", "sysparm3": ""}
+    for i, (t, p, s) in enumerate(zip(titles, pgms, sysparms), start=1):
+        row["title%d" % i], row["pgm%d" % i], row["sysparm%d" % i] = t, p, s
+    return row
+
+
+def _generated_table(rng, levels, n_rows):
+    # 小字母表 + 短片段：标题之间大量互为子串、重复、仅大小写 / 空白不同，覆盖并列与重叠情形
+    alphabet = "abcAB 不良事件"
+    words = ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))) for _ in range(25)]
+    rows = []
+    for i in range(n_rows):
+        titles = [rng.choice(words + [""]) if rng.random() < 0.05 else rng.choice(words) for _ in range(levels)]
+        pgms = ["p%d_%d" % (i, k) for k in range(levels)]
+        if levels > 1 and rng.random() < 0.3:
+            pgms[-1] = rng.choice(["byvis", "shift", "shift_byvis"])
+        sysparms = [rng.choice(["", "lbcat=1", "@sevcol=x", "data_scr=%str (a)", "vscat pecat"]) for _ in range(levels)]
+        rows.append(_shell_row(titles, pgms, sysparms))
+    outputs = []
+    for _ in range(300):
+        parts = [rng.choice(words) for _ in range(rng.randint(0, 2 * levels + 1))]
+        noise = "".join(rng.choice(alphabet + "xyz") for _ in range(rng.randint(0, 3)))
+        title = " ".join(parts[:1] + [noise] + parts[1:])
+        if rng.random() < 0.2:
+            title += rng.choice(["发生率>=10", "发生率>=5"])
+        outputs.append((title, rng.choice(["Table", "Listing"]), rng.choice(["Safety Set", "全分析集", ""])))
+    return rows, outputs
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("section", sorted(SECTION_OUTREF))
+def test_generated_tables_match_linear_scan(section, seed):
+    rng = random.Random("%s-%d" % (section, seed))
+    rows, outputs = _generated_table(rng, pf.SECTION_TITLE_LEVELS.get(section, 1), rng.randint(1, 80))
+    _assert_same(section, rows, outputs)
+
+
+def test_realistic_tables_match_linear_scan():
+    ae = [
+        _shell_row(["不良事件", "按系统器官分类和首选术语", "按严重程度"], ["ae", "soc_pt", "sev"], ["", "", "@sevcol=aesev"]),
+        _shell_row(["不良事件", "按系统器官分类和首选术语", "按严重程度"], ["ae", "soc_pt", "sev_dup"], ["", "", ""]),
+        _shell_row(["严重不良事件", "按系统器官分类和首选术语", "按严重程度"], ["sae", "soc_pt", "sev"], ["aeser=\"Y\"", "", ""]),
+        _shell_row(["治疗期间出现的不良事件", "按首选术语", "按与研究药物的相关性"], ["teae", "pt", "rel"], ["", "", ""]),
+        _shell_row(["Adverse Events", "by SOC and PT", "by Severity"], ["ae", "soc_pt", "sev"], ["", "lbcat", "@sevcol=x"]),
+    ]
+    lab = [
+        _shell_row(["实验室检查", "血液学"], ["lb", "byvis"], ["lbcat=\"血液学\"", "data_scr=%str (x)"]),
+        _shell_row(["实验室检查", "血液学"], ["lb", "shift"], ["lbcat", ""]),
+        _shell_row(["实验室检查", "血生化"], ["lb", "shift_byvis"], ["vscat", ""]),
+        _shell_row(["生命体征", "访视"], ["vs", "byvis"], ["vscat pecat egscat pdcat", ""]),
+    ]
+    single = [
+        _shell_row(["受试者分布"], ["ds"], [""]),
+        _shell_row(["受试者分布 按中心"], ["ds_site"], ["bysite"]),
+        _shell_row(["人口统计学和基线特征"], ["dm"], [""]),
+        _shell_row(["人口统计学"], ["dm_short"], [""]),
+        _shell_row(["Subject Disposition"], ["ds_en"], [""]),
+    ]
+    outputs = [
+        (t, otype, pop)
+        for t in [
+            "不良事件 按系统器官分类和首选术语 按严重程度", "严重不良事件 按系统器官分类和首选术语 按严重程度 发生率>=5",
+            "治疗期间出现的不良事件 按首选术语 按与研究药物的相关性 发生率>=10", "adverse events BY SOC AND PT by severity",
+            "实验室检查 血液学 访视", "实验室检查 血生化", "生命体征 访视 变化", "受试者分布", "受试者分布 按中心",
+            "人口统计学和基线特征", "人口统计学", "subject  disposition", "无关标题", "",
+        ]
+        for otype in ("Table", "Listing")
+        for pop in ("安全性分析集", "Full Analysis Set")
+    ]
+    for section, rows in (("14.3.1", ae), ("14.3.4", ae), ("14.3.2", lab), ("14.3.5", lab),
+                          ("14.1", single), ("16.2", single)):
+        _assert_same(section, rows, outputs)
+
+
+def test_match_pdt_row_uses_section_index():
+    rows = [_shell_row(["受试者分布"], ["ds"], [""]), _shell_row(["受试者分布 按中心"], ["ds_site"], ["bysite"])]
+    program_data = pf._compile_program_data({"over": [{"title": "按中心", "pgm": "site", "sysparm": ""}],
+                                             "sections": {"14.1": rows}})
+    assert pf.match_pdt_row("Table 14.1.1", "受试者分布 按中心", "Table", "", program_data) == ("ds_site_site.sas", "bysite")
+    assert pf.match_pdt_row("Table 14.1.2", "其他", "Table", "", program_data) == ("", "")
+
+
+@pytest.mark.skipif(not os.environ.get("PROGRAM_NAME_XLSX"), reason="未设置 PROGRAM_NAME_XLSX")
+@pytest.mark.parametrize("lng", ["cn", "en"])
+def test_real_program_name_tables_match_linear_scan(lng):
+    data = pf._parse_program_name_excel(os.environ["PROGRAM_NAME_XLSX"], lng=lng)
+    for section, rows in data["sections"].items():
+        levels = pf.SECTION_TITLE_LEVELS.get(section, 1)
+        titles = [" ".join(r["title%d" % k] for k in range(1, levels + 1)) for r in rows]
+        # 用 shell 标题本身及其两两拼接作为 PDT 标题
+        outputs = [(t, otype, "安全性分析集") for t in titles + [a + b for a, b in zip(titles, titles[1:])]
+                   for otype in ("Table", "Listing")]
+        _assert_same(section, rows, outputs)
+
+
+def _write_program_name_xlsx(path):
+    import pandas as pd
+    with pd.ExcelWriter(path) as w:
+        pd.DataFrame({"TITLE_SHELL_CN": ["按中心"], "PGM_SHELL": ["site"], "SYSPARM_SHELL": [""]}).to_excel(
+            w, sheet_name="over", index=False)
+        pd.DataFrame({"title_shell_cn": ["受试者分布", "受试者分布 按中心"], "pgm_shell": ["ds", "ds_site"],
+                      "sysparm_shell": ["", "bysite"]}).to_excel(w, sheet_name="s14_1", index=False)
+        pd.DataFrame({"title_shell_cn": ["不良事件", "不良事件"], "title2_shell_cn": ["按SOC", "按PT"],
+                      "title3_shell_cn": ["按严重程度", "按严重程度"], "pgm_shell": ["ae", "ae"],
+                      "pgm2_shell": ["soc", "pt"], "pgm3_shell": ["sev", "sev"],
+                      "sysparm3_shell": ["@sevcol=a", "@sevcol=b"]}).to_excel(w, sheet_name="s14_3_1", index=False)
+
+
+def test_shared_index_is_plain_json(tmp_path, monkeypatch):
+    import json
+    import file_cache
+
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    excel_path = shared / "program_name.xlsx"
+    _write_program_name_xlsx(str(excel_path))
+    local = tmp_path / "local"
+    monkeypatch.setattr(file_cache, "cache_dir", lambda: str(local))
+    parse = pf._parse_program_name_excel
+    pf._index_memo.clear()
+
+    cases = [("Table 14.1.1", "受试者分布 按中心"), ("Table 14.3.1.1", "不良事件 按PT 按严重程度 发生率>=5"),
+             ("Table 14.3.2.1", "不良事件 按SOC")]
+    data = pf.load_program_name_excel(excel_path)
+    expected = [pf.match_pdt_row(ref, title, "Table", "安全性分析集", data) for ref, title in cases]
+
+    # 共享盘上只有 JSON 纯数据索引，pickle 只在本地 cache 目录
+    assert sorted(p.name for p in shared.iterdir()) == ["program_name.xlsx", "program_name.xlsx.cn.index.json"]
+    with open(str(shared / "program_name.xlsx.cn.index.json"), encoding="utf-8") as f:
+        index = json.load(f)
+    assert set(index["data"]) == {"over", "sections", "over_norm", "titles"}
+    assert [p.suffix for p in local.iterdir()] == [".pickle"]
+
+    # 其他用户：本地无缓存，从 JSON 重建标题索引，不再解析 Excel
+    def fail_parse(*args, **kwargs):
+        raise AssertionError("不应重新解析 program_name.xlsx")
+
+    monkeypatch.setattr(pf, "_parse_program_name_excel", fail_parse)
+    for p in local.iterdir():
+        p.unlink()
+    pf._index_memo.clear()
+    data = pf.load_program_name_excel(excel_path)
+    assert [pf.match_pdt_row(ref, title, "Table", "安全性分析集", data) for ref, title in cases] == expected
+    assert len(list(local.iterdir())) == 1
+
+    # 损坏的 JSON 索引：回退为解析 Excel 并重写
+    monkeypatch.setattr(pf, "_parse_program_name_excel", parse)
+    (shared / "program_name.xlsx.cn.index.json").write_text("{not json", encoding="utf-8")
+    for p in local.iterdir():
+        p.unlink()
+    pf._index_memo.clear()
+    data = pf.load_program_name_excel(excel_path)
+    assert [pf.match_pdt_row(ref, title, "Table", "安全性分析集", data) for ref, title in cases] == expected
+    with open(str(shared / "program_name.xlsx.cn.index.json"), encoding="utf-8") as f:
+        assert json.load(f)["version"] == pf.PROGRAM_NAME_INDEX_VERSION
+    pf._index_memo.clear()
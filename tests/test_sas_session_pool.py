@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""SASSessionPool.run_files 取消：不再分派未开始的文件，中止运行中的文件并断开全部会话。"""
+import threading
+import time
+from concurrent.futures import CancelledError
+
+import pytest
+
+pytest.importorskip("saspy")
+
+import sas_session_pool  # noqa: E402
+from linux_sas_call_from_python import SASRunAborted  # noqa: E402
+
+
+class _FakeSession:
+    def __init__(self):
+        self.ended = False
+
+    def endsas(self):
+        self.ended = True
+
+
+def test_run_files_stops_on_cancel(monkeypatch):
+    sessions = []
+    started = []
+    cancel_event = threading.Event()
+
+    def new_session():
+        sas = _FakeSession()
+        sessions.append(sas)
+        return sas
+
+    def run_sas(path, sas_session=None, check_log=False, cancel_event=None):
+        started.append(path)
+        if len(started) == 2:
+            cancel_event.set()
+        while not cancel_event.is_set():  # 模拟长时间运行，置位后像 run_sas 一样断开会话并中止
+            time.sleep(0.01)
+        sas_session.endsas()
+        raise SASRunAborted("已取消运行。")
+
+    monkeypatch.setattr(sas_session_pool, "_new_session", new_session)
+    monkeypatch.setattr(sas_session_pool, "run_sas", run_sas)
+    paths = ["p%d.sas" % i for i in range(20)]
+    with sas_session_pool.SASSessionPool(2) as pool:
+        with pytest.raises(CancelledError):
+            pool.run_files(paths, cancel_event=cancel_event)
+    assert sorted(started) == paths[:2]  # 置位后不再开始新的文件
+    assert sessions and all(s.ended for s in sessions)
+
+
+def test_run_files_without_cancel(monkeypatch):
+    monkeypatch.setattr(sas_session_pool, "_new_session", _FakeSession)
+    monkeypatch.setattr(sas_session_pool, "run_sas", lambda path, **kwargs: None)
+    paths = ["p%d.sas" % i for i in range(6)]
+    with sas_session_pool.SASSessionPool(3) as pool:
+        results = pool.run_files(paths, cancel_event=threading.Event())
+    assert [r["path"] for r in results] == paths and all(r["ok"] for r in results)
@@ -12,6 +12,8 @@ import subprocess
 import tkinter as tk
 from tkinter import messagebox, filedialog, scrolledtext
 
+from sas_log_scan import BATCH_FAILED_KINDS, has_issue, hit_lines, scan_log_file
+
 
 def _get_project_base_path(gui):
     """从 gui 获取当前项目根路径（前四个下拉框拼接）。"""
@@ -250,8 +252,9 @@ def run_batch_run(gui):
         return
 
     try:
-        from linux_sas_call_from_python import run_sas, convert_windows_path_to_linux
-        import saspy
+        from linux_sas_call_from_python import is_session_terminated_error
+        from sas_session_pool import SASSessionPool, DEFAULT_POOL_SIZE, format_failed_results
+        from sas_jobs import JOB_CANCELLED, submit_job, submit_sas_job
     except ImportError as e:
         messagebox.showerror("错误", "无法导入 linux_sas_call_from_python 或 saspy（请确保该模块在项目目录下且已安装 saspy）。\n\n%s" % e)
         return
@@ -270,6 +273,10 @@ def run_batch_run(gui):
     main = tk.Frame(dlg, padx=20, pady=16, bg="#f0f0f0")
     main.pack(fill=tk.BOTH, expand=True)
 
+    def _result_parent():
+        """后台作业结束时弹窗的父窗口：弹窗已关闭则用主窗口。"""
+        return dlg if dlg.winfo_exists() else gui.root
+
     # ---------- 第一步 ----------
     step1_title = tk.Label(
         main,
@@ -315,7 +322,7 @@ def run_batch_run(gui):
     _hint_text_step1 = "初版Batch Run脚本生成中，可前往utility\\tools\\文件夹下查看细节。初版Batch Run脚本完成后将跳出日志弹窗，请耐心等待。"
 
     def run_step1():
-        """点击「初版Batch Run脚本」：第一步展示蓝色提示；第二步解析 92 并生成 (out)_call.sas；第三步批量运行生成的 sas。"""
+        """点击「初版Batch Run脚本」：第一步展示蓝色提示；第二步解析 92 并生成 (out)_call.sas；第三步由会话池并行运行生成的 sas。"""
         path = entry_sas92.get().strip()
         if not path or not os.path.isfile(path):
             messagebox.showwarning("提示", "请选择有效的 92_batch_script_generator_call.sas 文件。")
@@ -327,36 +334,38 @@ def run_batch_run(gui):
         try:
             # 第二步：读取 92 程序，在 utility\tools 下生成 (out)_call.sas
             generated = _generate_call_sas_files(path, tools_dir)
-            if not generated:
-                messagebox.showwarning("提示", "未在 92 程序中找到包含 %batch_script_generator 的行，或 out= 解析失败。")
+        except Exception as e:
+            gui.update_status("Batch Run 执行出错。")
+            messagebox.showerror("错误", "执行失败：%s" % e)
+            return
+        if not generated:
+            messagebox.showwarning("提示", "未在 92 程序中找到包含 %batch_script_generator 的行，或 out= 解析失败。")
+            return
+        gui.update_status("已生成 %d 个初版 Batch Run 脚本，正在后台并行运行…" % len(generated))
+
+        # 第三步：后台作业中由会话池并行运行。%batch_script_generator 会强制终止 SAS 进程，该会话在后台重建，其余文件继续
+        def on_file_done(res, done_count, total):
+            # 在后台线程中回调，经 root.after 回到主线程更新状态栏
+            gui.root.after(0, gui.update_status, "[%d/%d] 已运行 %s" % (done_count, total, os.path.basename(res["path"])))
+
+        def run_pool(cancel_event):
+            with SASSessionPool(min(DEFAULT_POOL_SIZE, len(generated)), terminated_ok=True) as pool:
+                return pool.run_files(generated, on_file_done=on_file_done, cancel_event=cancel_event)
+
+        def on_done(job):
+            if job.status == JOB_CANCELLED:
                 return
-            gui.update_status("已生成 %d 个初版 Batch Run 脚本，正在批量运行…" % len(generated))
-            # 第三步：批量运行。%batch_script_generator 会强制终止 SAS 进程，遇此情况不弹窗，新建会话后继续下一个
-            sas = saspy.SASsession(cfgname='winiomlinux')
             try:
-                for sas_path in generated:
-                    sas_path_linux = convert_windows_path_to_linux(sas_path)
-                    try:
-                        run_sas(sas_path_linux, sas_session=sas, check_log=False)
-                    except Exception as e:
-                        err_msg = str(e)
-                        if "terminated unexpectedly" in err_msg or "No SAS process attached" in err_msg:
-                            # 宏强制终止了 SAS 进程：不进行日志检查、不弹窗，直接运行下一个
-                            try:
-                                sas.endsas()
-                            except Exception:
-                                pass
-                            sas = saspy.SASsession(cfgname='winiomlinux')
-                            gui.update_status("已运行 %s，继续下一个…" % os.path.basename(sas_path))
-                        else:
-                            gui.update_status("Batch Run 执行出错：%s" % e)
-                            messagebox.showerror("错误", "运行 %s 时出错：%s" % (os.path.basename(sas_path), e))
-                            return
-            finally:
-                try:
-                    sas.endsas()
-                except Exception:
-                    pass
+                results = job.result()
+            except Exception as e:
+                gui.update_status("Batch Run 执行出错。")
+                messagebox.showerror("错误", "执行失败：%s" % e)
+                return
+            failed_text = format_failed_results(results)
+            if failed_text:
+                gui.update_status("Batch Run 执行出错。")
+                messagebox.showerror("错误", "以下程序运行出错：\n%s" % failed_text)
+                return
             gui.update_status("初版 Batch Run 脚本已全部执行完成。")
             messagebox.showinfo("完成", "恭喜您，初版Batch Run 脚本已全部执行完成。")
             # 删除第二步产生的 sas 程序文件及对应的日志文件（日志与 sas 同目录，同名 .log）
@@ -372,9 +381,8 @@ def run_batch_run(gui):
                         os.remove(log_path)
                 except Exception:
                     pass
-        except Exception as e:
-            gui.update_status("Batch Run 执行出错。")
-            messagebox.showerror("错误", "执行失败：%s" % e)
+
+        submit_job(run_pool, name="初版 Batch Run 脚本", tk_root=gui.root, on_done=on_done, pass_cancel_event=True)
 
     btn_row1 = tk.Frame(main, bg="#f0f0f0")
     btn_row1.pack(anchor="w", pady=(4, 0))
@@ -413,27 +421,33 @@ def run_batch_run(gui):
     tk.Button(row_batch_script, text="浏览...", command=browse_batch_script, width=8, font=("Microsoft YaHei UI", 9)).pack(side=tk.LEFT, padx=(0, 4))
 
     def run_batch_script():
-        """点击「运行」：用 linux_sas_call_from_python 运行浏览框中的 SAS 程序；忽略 %batch_wrap_up 导致的 SAS 进程退出；完成后根据同路径下 .log 是否含 [FAILED] 弹窗并可选查看日志。"""
+        """点击「运行」：后台运行浏览框中的 SAS 程序（不阻塞界面）；忽略 %batch_wrap_up 导致的 SAS 进程退出；完成后根据同路径下 .log 是否含 [FAILED] 弹窗并可选查看日志。"""
         batch_script_path = entry_batch_script.get().strip()
         if not batch_script_path or not os.path.isfile(batch_script_path):
             messagebox.showwarning("提示", "请先选择有效的 Batch Run 脚本。")
             return
-        try:
-            from linux_sas_call_from_python import run_sas
-        except ImportError as e:
-            messagebox.showerror("错误", "无法导入 linux_sas_call_from_python。\n\n%s" % e)
-            return
-        gui.update_status("正在运行 Batch Run 脚本：%s" % os.path.basename(batch_script_path))
-        dlg.update_idletasks()
-        try:
-            run_sas(batch_script_path, check_log=False)
-        except Exception as e:
-            err_msg = str(e)
-            if "SAS process has terminated unexpectedly" not in err_msg and "terminated unexpectedly" not in err_msg:
-                gui.update_status("Batch Run 执行出错：%s" % e)
-                messagebox.showerror("错误", "运行 Batch Run 脚本时出错：%s" % e)
+        gui.update_status("正在后台运行 Batch Run 脚本：%s" % os.path.basename(batch_script_path))
+
+        def on_progress(event):
+            # 边运行边读取日志，状态栏实时显示进度
+            if event["kind"] == "progress":
+                gui.update_status("Batch Run 运行中：日志 %d 行，ERROR %d，WARNING %d" % (event["lines"], event["errors"], event["warnings"]))
+
+        def on_done(job):
+            if job.status == JOB_CANCELLED:
                 return
+            err = job.exception()
             # 忽略 %batch_wrap_up 导致的进程退出，继续检查日志
+            if err is not None and not is_session_terminated_error(err):
+                gui.update_status("Batch Run 执行出错：%s" % err)
+                messagebox.showerror("错误", "运行 Batch Run 脚本时出错：%s" % err)
+                return
+            _show_batch_script_result(batch_script_path)
+
+        submit_sas_job(batch_script_path, tk_root=gui.root, on_done=on_done, on_progress=on_progress)
+
+    def _show_batch_script_result(batch_script_path):
+        """Batch Run 脚本运行结束后：根据同路径下 .log 是否含 [FAILED]/WARNINGS 弹窗，并可选查看日志。"""
         log_path = os.path.join(
             os.path.dirname(batch_script_path),
             os.path.splitext(os.path.basename(batch_script_path))[0] + ".log",
@@ -443,21 +457,17 @@ def run_batch_run(gui):
             messagebox.showinfo("完成", "Batch Run 已完成。未找到日志文件。")
             return
         try:
-            with open(log_path, "r", encoding="utf-8", errors="replace") as f:
-                log_content = f.read()
+            summary = scan_log_file(log_path)
         except Exception as e:
             messagebox.showerror("错误", "读取日志文件失败：%s" % e)
             return
-        has_issues = "[FAILED]" in log_content or "WARNINGS" in log_content
-        if has_issues:
-            failed_lines = [
-                line.rstrip() for line in log_content.splitlines()
-                if "[FAILED]" in line or "WARNINGS" in line
-            ]
-            win_fail = tk.Toplevel(dlg)
+        if has_issue(summary, BATCH_FAILED_KINDS):
+            failed_lines = [line.rstrip() for line, _ in hit_lines(summary, BATCH_FAILED_KINDS)]
+            parent = _result_parent()
+            win_fail = tk.Toplevel(parent)
             win_fail.title("完成")
             win_fail.configure(bg="#f0f0f0")
-            win_fail.transient(dlg)
+            win_fail.transient(parent)
             win_fail.grab_set()
             n = len(failed_lines)
             tk.Label(
@@ -560,7 +570,7 @@ def run_batch_run(gui):
     tk.Button(row_log_check, text="浏览...", command=browse_log_check, width=8, font=("Microsoft YaHei UI", 9)).pack(side=tk.LEFT, padx=(0, 4))
 
     def run_log_check():
-        """点击「运行」：读取 Log Check 脚本，识别每个 %log_chk 为单独 SAS 宏，用 linux_sas_call_from_python 依次运行。"""
+        """点击「运行」：读取 Log Check 脚本，识别每个 %log_chk 为单独 SAS 宏，由 SAS 会话池并行运行。"""
         path = entry_log_check.get().strip()
         if not path or not os.path.isfile(path):
             messagebox.showwarning("提示", "请先选择有效的 Log Check 脚本。")
@@ -569,12 +579,6 @@ def run_batch_run(gui):
         if not log_chk_calls:
             messagebox.showwarning("提示", "未在脚本中找到任何 %log_chk(...) 语句。")
             return
-        try:
-            from linux_sas_call_from_python import run_sas
-            import saspy
-        except ImportError as e:
-            messagebox.showerror("错误", "无法导入 linux_sas_call_from_python。\n\n%s" % e)
-            return
         script_dir = os.path.dirname(path)
         autorun_block = """data _null_;
   if libref('adam') then call execute('%nrstr(%autorun)');
@@ -591,48 +595,49 @@ run;
         except Exception as e:
             messagebox.showerror("错误", "写入临时 SAS 文件失败：%s" % e)
             return
-        gui.update_status("已解析 %d 个 %%log_chk 宏，正在依次运行…" % len(log_chk_calls))
-        dlg.update_idletasks()
-        sas = saspy.SASsession(cfgname='winiomlinux')
-        try:
-            for i, sas_path in enumerate(temp_files, 1):
-                gui.update_status("[%d/%d] Log Check: %s" % (i, len(temp_files), os.path.basename(sas_path)))
-                dlg.update_idletasks()
-                try:
-                    run_sas(sas_path, sas_session=sas, check_log=False)
-                except Exception as e:
-                    err_msg = str(e)
-                    if "terminated unexpectedly" in err_msg or "No SAS process attached" in err_msg:
-                        try:
-                            sas.endsas()
-                        except Exception:
-                            pass
-                        sas = saspy.SASsession(cfgname='winiomlinux')
-                        gui.update_status("已运行 %s，继续下一个…" % os.path.basename(sas_path))
-                    else:
-                        gui.update_status("Log Check 执行出错：%s" % e)
-                        messagebox.showerror("错误", "运行 %s 时出错：%s" % (os.path.basename(sas_path), e))
-                        return
-        finally:
+        gui.update_status("已解析 %d 个 %%log_chk 宏，正在后台并行运行…" % len(log_chk_calls))
+
+        def on_file_done(res, done_count, total):
+            gui.root.after(0, gui.update_status, "[%d/%d] Log Check: %s" % (done_count, total, os.path.basename(res["path"])))
+
+        def run_pool(cancel_event):
             try:
-                sas.endsas()
-            except Exception:
-                pass
-            for fpath in temp_files:
-                try:
-                    if os.path.isfile(fpath):
-                        os.remove(fpath)
-                except Exception:
-                    pass
-                log_path = os.path.join(script_dir, os.path.splitext(os.path.basename(fpath))[0] + ".log")
-                try:
-                    if os.path.isfile(log_path):
-                        os.remove(log_path)
-                except Exception:
-                    pass
-        gui.update_status("Log Check 已全部执行完成。")
-        messagebox.showinfo("完成", "恭喜您，Log Check 已全部执行完成。")
-        _show_log_check_xml_list(dlg, base_path, gui)
+                # Log Check 程序与原逐个运行时一致：SAS 进程终止视为已运行，继续下一个
+                with SASSessionPool(min(DEFAULT_POOL_SIZE, len(temp_files)), terminated_ok=True) as pool:
+                    return pool.run_files(temp_files, on_file_done=on_file_done, cancel_event=cancel_event)
+            finally:
+                for fpath in temp_files:
+                    try:
+                        if os.path.isfile(fpath):
+                            os.remove(fpath)
+                    except Exception:
+                        pass
+                    log_path = os.path.join(script_dir, os.path.splitext(os.path.basename(fpath))[0] + ".log")
+                    try:
+                        if os.path.isfile(log_path):
+                            os.remove(log_path)
+                    except Exception:
+                        pass
+
+        def on_done(job):
+            if job.status == JOB_CANCELLED:
+                return
+            try:
+                results = job.result()
+            except Exception as e:
+                gui.update_status("Log Check 执行出错：%s" % e)
+                messagebox.showerror("错误", "Log Check 执行失败：%s" % e)
+                return
+            failed_text = format_failed_results(results)
+            if failed_text:
+                gui.update_status("Log Check 执行出错。")
+                messagebox.showerror("错误", "以下 Log Check 运行出错：\n%s" % failed_text)
+                return
+            gui.update_status("Log Check 已全部执行完成。")
+            messagebox.showinfo("完成", "恭喜您，Log Check 已全部执行完成。")
+            _show_log_check_xml_list(_result_parent(), base_path, gui)
+
+        submit_job(run_pool, name="Log Check", tk_root=gui.root, on_done=on_done, pass_cancel_event=True)
 
     def edit_log_check():
         """点击「编辑」：打开选中的 Log Check 脚本。"""
@@ -652,6 +657,30 @@ run;
     btn_row3.pack(anchor="w", pady=(4, 0))
     tk.Button(btn_row3, text="运行", command=run_log_check, width=8, font=("Microsoft YaHei UI", 9)).pack(side=tk.LEFT)
 
+    def run_log_audit():
+        """点击「快速审计」：不经 SAS，在本机并行扫描 07_logs 下全部日志并生成汇总 XML。"""
+        from log_audit import audit_project_logs
+        gui.update_status("正在审计 07_logs 下的日志…")
+
+        def on_done(job):
+            if job.status == JOB_CANCELLED:
+                return
+            try:
+                xml_path, records = job.result()
+            except Exception as e:
+                gui.update_status("日志审计出错：%s" % e)
+                messagebox.showerror("错误", "日志审计失败：%s" % e)
+                return
+            n_error = sum(1 for r in records if r["counts"].get("error"))
+            n_warning = sum(1 for r in records if not r["counts"].get("error") and r["counts"].get("warning"))
+            gui.update_status("日志审计完成：共 %d 个日志，%d 个含 ERROR，%d 个含 WARNING；汇总：%s" % (
+                len(records), n_error, n_warning, os.path.basename(xml_path)))
+            _show_log_check_xml_list(_result_parent(), base_path, gui)
+
+        submit_job(audit_project_logs, base_path, name="Log Audit", tk_root=gui.root, on_done=on_done)
+
+    tk.Button(btn_row3, text="快速审计", command=run_log_audit, width=8, font=("Microsoft YaHei UI", 9)).pack(side=tk.LEFT, padx=(6, 0))
+
     # ---------- 第四步 ----------
     default_compare_check_sas = os.path.join(base_path, "utility", "tools", "94_compare_check_call.sas")
     step4_title = tk.Label(
@@ -683,27 +712,30 @@ run;
     tk.Button(row_compare_check, text="浏览...", command=browse_compare_check, width=8, font=("Microsoft YaHei UI", 9)).pack(side=tk.LEFT, padx=(0, 4))
 
     def run_compare_check():
-        """点击「运行」：用 linux_sas_call_from_python 运行浏览框中的 Compare Check 脚本。"""
+        """点击「运行」：后台运行浏览框中的 Compare Check 脚本（不阻塞界面，可与 Log Check 同时运行）。"""
         path = entry_compare_check.get().strip()
         if not path or not os.path.isfile(path):
             messagebox.showwarning("提示", "请先选择有效的 Compare Check 脚本。")
             return
-        try:
-            from linux_sas_call_from_python import run_sas
-        except ImportError as e:
-            messagebox.showerror("错误", "无法导入 linux_sas_call_from_python。\n\n%s" % e)
-            return
-        gui.update_status("正在运行 Compare Check 脚本：%s" % os.path.basename(path))
-        dlg.update_idletasks()
-        try:
-            run_sas(path, check_log=False)
-        except Exception as e:
-            gui.update_status("Compare Check 执行出错：%s" % e)
-            messagebox.showerror("错误", "运行 Compare Check 脚本时出错：%s" % e)
-            return
-        gui.update_status("Compare Check 已执行完成。")
-        messagebox.showinfo("完成", "恭喜您，Compare Check 已执行完成。")
-        _show_compare_check_xml_list(dlg, base_path, gui)
+        gui.update_status("正在后台运行 Compare Check 脚本：%s" % os.path.basename(path))
+
+        def on_progress(event):
+            if event["kind"] == "progress":
+                gui.update_status("Compare Check 运行中：日志 %d 行，ERROR %d，WARNING %d" % (event["lines"], event["errors"], event["warnings"]))
+
+        def on_done(job):
+            if job.status == JOB_CANCELLED:
+                return
+            err = job.exception()
+            if err is not None:
+                gui.update_status("Compare Check 执行出错：%s" % err)
+                messagebox.showerror("错误", "运行 Compare Check 脚本时出错：%s" % err)
+                return
+            gui.update_status("Compare Check 已执行完成。")
+            messagebox.showinfo("完成", "恭喜您，Compare Check 已执行完成。")
+            _show_compare_check_xml_list(_result_parent(), base_path, gui)
+
+        submit_sas_job(path, tk_root=gui.root, on_done=on_done, on_progress=on_progress)
 
     def edit_compare_check():
         """点击「编辑」：打开选中的 Compare Check 脚本。"""
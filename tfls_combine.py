@@ -141,29 +141,30 @@ def run_tfls_combine(gui):
             messagebox.showerror("错误", "未找到程序：%s" % sas_path)
             return
         try:
-            from linux_sas_call_from_python import run_sas
+            from linux_sas_call_from_python import is_session_terminated_error
+            from sas_jobs import JOB_CANCELLED, submit_sas_job
         except ImportError as e:
             messagebox.showerror("错误", "无法导入 linux_sas_call_from_python。\n\n%s" % e)
             return
         hint_combine.config(text="TFLs合并中，请耐心等待。")
         hint_combine.pack(anchor="w", pady=(8, 0))
-        dlg.update_idletasks()
-        gui.update_status("正在运行 31_rtf_combine_call.sas…")
-        try:
-            run_sas(sas_path, check_log=False)
-        except Exception as e:
-            err_msg = str(e)
-            if "terminated unexpectedly" in err_msg or "No SAS process attached" in err_msg or "terminate" in err_msg.lower():
-                pass
-            else:
+        gui.update_status("正在后台运行 31_rtf_combine_call.sas…")
+
+        def on_done(job):
+            if hint_combine.winfo_exists():
                 hint_combine.config(text="")
-                gui.update_status("Combine TFLs 执行出错：%s" % e)
-                messagebox.showerror("错误", "运行 31_rtf_combine_call.sas 时出错：%s" % e)
+            if job.status == JOB_CANCELLED:
                 return
-        hint_combine.config(text="")
-        gui.update_status("Combine TFLs 已执行完成。")
-        reports_dir = os.path.join(base_path, "03_reports")
-        _show_folder_window(dlg, reports_dir)
+            err = job.exception()
+            if err is not None and not (is_session_terminated_error(err) or "terminate" in str(err).lower()):
+                gui.update_status("Combine TFLs 执行出错：%s" % err)
+                messagebox.showerror("错误", "运行 31_rtf_combine_call.sas 时出错：%s" % err)
+                return
+            gui.update_status("Combine TFLs 已执行完成。")
+            reports_dir = os.path.join(base_path, "03_reports")
+            _show_folder_window(dlg if dlg.winfo_exists() else gui.root, reports_dir)
+
+        submit_sas_job(sas_path, tk_root=gui.root, on_done=on_done)
 
     def _show_folder_window(parent, folder_path):
         """弹出新窗口：按钮在文字说明上方，展示文件夹路径。"""
@@ -30,7 +30,7 @@ def run_initial_pgm(gui):
         return
 
     try:
-        from linux_sas_call_from_python import run_sas
+        from sas_jobs import JOB_CANCELLED, submit_sas_job
     except ImportError as e:
         messagebox.showerror("错误", "无法导入 linux_sas_call_from_python（请确保该模块在项目目录下且已安装 saspy）。\n\n%s" % e)
         return
@@ -91,12 +91,19 @@ def run_initial_pgm(gui):
             return
         # 先展示蓝色提示性文字，再调用 SAS
         hint_step1.config(text=_hint_text_step1)
-        dlg.update_idletasks()
-        try:
-            has_issue = run_sas(path, check_log=True)  # 通过 linux_sas_call_from_python 在 PROD 端执行
-            gui.update_status("60_initial_pgm_call.sas 已执行完成（有 ERROR/WARNING 时已由日志审阅窗口提示）。" if has_issue else "已在 PROD 端执行 60_initial_pgm_call.sas。")
-        except Exception as e:
-            messagebox.showerror("错误", "调用 SAS 程序时出错：%s" % e)
+        gui.update_status("正在 PROD 端后台运行 60_initial_pgm_call.sas…")
+
+        def on_done(job):
+            if job.status == JOB_CANCELLED:
+                return
+            err = job.exception()
+            if err is not None:
+                messagebox.showerror("错误", "调用 SAS 程序时出错：%s" % err)
+                return
+            # 日志审阅（ERROR/WARNING 弹窗）已在作业结束后于主线程完成
+            gui.update_status("60_initial_pgm_call.sas 已执行完成（有 ERROR/WARNING 时已由日志审阅窗口提示）。" if job.has_issue else "已在 PROD 端执行 60_initial_pgm_call.sas。")
+
+        submit_sas_job(path, tk_root=gui.root, on_done=on_done, review_log=True)  # 通过 linux_sas_call_from_python 在 PROD 端执行
 
     def open_06_programs():
         folder = os.path.join(base_path, "06_programs")
@@ -152,12 +159,19 @@ def run_initial_pgm(gui):
         # 先展示蓝色提示性文字，再调用 SAS
         hint_step2.config(text=_hint_text_step2)
         hint_step2.pack(anchor="w", pady=(6, 0))
-        dlg.update_idletasks()
-        try:
-            has_issue = run_sas(path, check_log=True)  # 通过 linux_sas_call_from_python 在 PROD 端执行
-            gui.update_status("61_ladae_template_call.sas 已执行完成（有 ERROR/WARNING 时已由日志审阅窗口提示）。" if has_issue else "已在 PROD 端执行 61_ladae_template_call.sas。")
-        except Exception as e:
-            messagebox.showerror("错误", "调用 SAS 程序时出错：%s" % e)
+        gui.update_status("正在 PROD 端后台运行 61_ladae_template_call.sas…")
+
+        def on_done(job):
+            if job.status == JOB_CANCELLED:
+                return
+            err = job.exception()
+            if err is not None:
+                messagebox.showerror("错误", "调用 SAS 程序时出错：%s" % err)
+                return
+            # 日志审阅（ERROR/WARNING 弹窗）已在作业结束后于主线程完成
+            gui.update_status("61_ladae_template_call.sas 已执行完成（有 ERROR/WARNING 时已由日志审阅窗口提示）。" if job.has_issue else "已在 PROD 端执行 61_ladae_template_call.sas。")
+
+        submit_sas_job(path, tk_root=gui.root, on_done=on_done, review_log=True)  # 通过 linux_sas_call_from_python 在 PROD 端执行
 
     def open_062_safety():
         folder = os.path.join(base_path, "06_programs", "062_safety")
@@ -10,10 +10,14 @@ import logging
 import os
 import re
 import shutil
+from collections import namedtuple
 from datetime import datetime
 import tkinter as tk
 from tkinter import messagebox, filedialog
 
+from file_cache import load_cached
+from metadata_catalog import catalog
+
 logger = logging.getLogger(__name__)
 
 
@@ -110,100 +114,153 @@ def _find_excel_column(df, candidates):
     return None
 
 
-def parse_adam_spec_for_randfl_enrlfl(adam_excel_path):
+# ADaM 说明文件 variables sheet 中用到的列：逻辑名 -> _find_excel_column 候选列名
+_ADAM_SPEC_COLUMNS = {
+    "dataset": ("Dataset", "Data Set", "数据集", "Dataset Name"),
+    "variable": ("Variable", "变量", "Variable Name"),
+    "study_specific": ("Study Specific", "StudySpecific", "Study Specific Flag"),
+    "label": ("Variable Label", "Label", "变量标签", "标签", "VariableLabel"),
+}
+# AdamSpec 缓存格式版本（结构变化时递增，使旧缓存失效）
+ADAM_SPEC_CACHE_VERSION = 1
+
+# variables sheet 中的一个变量：原始变量名、Study Specific 是否为 Y（无该列时为 None）、变量标签
+AdamVariable = namedtuple("AdamVariable", ("name", "study_specific", "label"))
+
+
+class AdamSpec:
+    """
+    ADaM 说明文件 variables sheet 的索引：只读取一次且只读所需列（Dataset / Variable / Study Specific / Label），
+    按 (数据集, 变量) 建索引（均按大写比较），RANDFL / ENRLFL / EOTSTT 等查找为 O(1)。
+    AdamSpec.load 以文件内容哈希缓存解析结果，说明文件未变时不再解析 Excel。
+    """
+
+    def __init__(self, sheet_name, columns, datasets):
+        self.sheet_name = sheet_name
+        self.columns = columns     # 逻辑名 -> 实际列名（未找到为 None）
+        self._datasets = datasets  # 大写数据集名 -> {大写变量名: AdamVariable}，按表中首次出现的顺序
+
+    @classmethod
+    def load(cls, adam_excel_path):
+        """
+        文件未变（mtime、大小）时直接返回 metadata_catalog 中的同一对象；
+        否则按文件内容哈希读取磁盘缓存，未命中时解析 adam_excel_path。
+        """
+        return catalog().get(adam_excel_path, "adam_spec", lambda p: load_cached(
+            "adam_spec", p, lambda: cls.parse(p), version=ADAM_SPEC_CACHE_VERSION))
+
+    @classmethod
+    def parse(cls, adam_excel_path):
+        """解析 variables sheet；未找到 sheet、所需列或 sheet 为空时抛出 ValueError。"""
+        try:
+            import pandas as pd
+        except ImportError:
+            raise RuntimeError(
+                "请先安装 pandas：pip install pandas\n"
+                "若提示权限错误，请以管理员身份打开命令行再执行，或在项目目录使用：python -m venv venv 后激活 venv 再 pip install pandas"
+            )
+
+        with pd.ExcelFile(adam_excel_path) as xl:
+            sheet_name = next((s for s in xl.sheet_names if "variable" in s.lower()), None)
+            if sheet_name is None:
+                logger.warning("[ADaM] 未找到 variables 相关 sheet，sheet 列表：%s", xl.sheet_names)
+                raise ValueError("ADaM 说明文件中未找到 variables 相关 sheet。")
+            # 先只读表头定位列，再只读取这些列
+            header = xl.parse(sheet_name, header=0, nrows=0)
+            columns = {key: _find_excel_column(header, cands) for key, cands in _ADAM_SPEC_COLUMNS.items()}
+            if columns["dataset"] is None or columns["variable"] is None:
+                raise ValueError("variables sheet 中未找到 Dataset 或 Variable 列。")
+            usecols = list(dict.fromkeys(c for c in columns.values() if c is not None))
+            df = xl.parse(sheet_name, header=0, usecols=usecols, dtype=str)
+        if df.empty:
+            raise ValueError("variables sheet 为空。")
+
+        def _col(key):
+            col = columns[key]
+            return df[col].fillna("").str.strip() if col is not None else None
+
+        ds_col = _col("dataset").str.upper()
+        var_col = _col("variable")
+        ss_col = _col("study_specific")
+        ss_col = (ss_col.str.upper() == "Y").tolist() if ss_col is not None else [None] * len(df)
+        label_col = _col("label")
+        label_col = label_col.tolist() if label_col is not None else [""] * len(df)
+
+        datasets = {}
+        for ds, var, ss, label in zip(ds_col.tolist(), var_col.tolist(), ss_col, label_col):
+            if not ds or not var:
+                continue
+            variables = datasets.setdefault(ds, {})
+            key = var.upper()
+            hit = variables.get(key)
+            if hit is None:
+                variables[key] = AdamVariable(var, ss, label)
+            elif ss and not hit.study_specific:
+                # 同一变量多行时，任一行 Study Specific=Y 即视为 Y；名称与标签取第一行
+                variables[key] = hit._replace(study_specific=True)
+        return cls(sheet_name, columns, datasets)
+
+    def variables(self, dataset):
+        """数据集下的全部变量（AdamVariable 列表，按表中顺序）。"""
+        return list(self._datasets.get(dataset.strip().upper(), {}).values())
+
+    def find(self, dataset, variable):
+        """精确查找 (数据集, 变量)，返回 AdamVariable 或 None。"""
+        return self._datasets.get(dataset.strip().upper(), {}).get(variable.strip().upper())
+
+    def find_prefix(self, dataset, prefix):
+        """优先精确匹配 prefix，否则返回按表中顺序第一个以 prefix 开头的变量；均无则返回 None。"""
+        hit = self.find(dataset, prefix)
+        if hit is not None:
+            return hit
+        prefix = prefix.strip().upper()
+        return next((v for k, v in self._datasets.get(dataset.strip().upper(), {}).items() if k.startswith(prefix)), None)
+
+    def has_flag(self, dataset, variable):
+        """变量存在且 Study Specific = Y（无 Study Specific 列时存在即可）。"""
+        hit = self.find(dataset, variable)
+        return hit is not None and hit.study_specific is not False
+
+
+def parse_adam_spec_for_randfl_enrlfl(adam_spec):
     """
     从 ADaM 数据集说明 Excel 的 variables sheet 中判断 ADSL 是否存在 RANDFL/ENRLFL。
     检查路径：variables sheet → ADSL 数据集 → RANDFL 且 Study Specific = Y，或 ENRLFL。
     若既有 RANDFL 也有 ENRLFL 则都返回，顺序为 RANDFL 先、ENRLFL 后。
+    adam_spec: ADaM 说明文件路径，或已加载的 AdamSpec（同一次初始化中与 parse_adam_spec_for_eotstt_label 共用）。
     返回: tuple of "randfl" 和/或 "enrlfl"，如 ("randfl",)、("enrlfl",)、("randfl", "enrlfl")；均不存在时返回 ("randfl",) 作为默认。
     详细日志写入 logs/tfls_metadata.log，便于排查为何出现 ENRLFL 块。
     """
     _setup_log_file()
-    logger.info("[RANDFL/ENRLFL] 开始解析 ADaM 说明文件：%s", adam_excel_path)
-    try:
-        import pandas as pd
-    except ImportError:
-        raise RuntimeError(
-            "请先安装 pandas：pip install pandas\n"
-            "若提示权限错误，请以管理员身份打开命令行再执行，或在项目目录使用：python -m venv venv 后激活 venv 再 pip install pandas"
-        )
-
-    xl = pd.ExcelFile(adam_excel_path)
-    sheet_name = None
-    for s in xl.sheet_names:
-        if "variable" in s.lower():
-            sheet_name = s
-            break
-    if sheet_name is None:
-        logger.warning("[RANDFL/ENRLFL] 未找到 variables 相关 sheet，sheet 列表：%s", xl.sheet_names)
-        raise ValueError("ADaM 说明文件中未找到 variables 相关 sheet。")
-
-    logger.info("[RANDFL/ENRLFL] 使用 sheet：%s", sheet_name)
-    df = pd.read_excel(adam_excel_path, sheet_name=sheet_name, header=0)
-    if df.empty:
-        raise ValueError("variables sheet 为空。")
+    if not isinstance(adam_spec, AdamSpec):
+        logger.info("[RANDFL/ENRLFL] 开始解析 ADaM 说明文件：%s", adam_spec)
+        adam_spec = AdamSpec.load(adam_spec)
 
-    col_dataset = _find_excel_column(df, ("Dataset", "Data Set", "数据集", "Dataset Name"))
-    col_var = _find_excel_column(df, ("Variable", "变量", "Variable Name"))
-    col_study_spec = _find_excel_column(df, ("Study Specific", "StudySpecific", "Study Specific Flag"))
-    logger.info("[RANDFL/ENRLFL] 列名映射：Dataset=%s, Variable=%s, Study Specific=%s",
-                col_dataset, col_var, col_study_spec)
+    cols = adam_spec.columns
+    logger.info("[RANDFL/ENRLFL] 使用 sheet：%s；列名映射：Dataset=%s, Variable=%s, Study Specific=%s",
+                adam_spec.sheet_name, cols["dataset"], cols["variable"], cols["study_specific"])
 
-    if col_dataset is None or col_var is None:
-        raise ValueError("variables sheet 中未找到 Dataset 或 Variable 列。")
-
-    ds_col = df[col_dataset].astype(str).str.strip()
     # 仅匹配 Dataset 列等于 "ADSL" 的行，避免含 "ADSL" 子串的其它数据集（如 ADSL_SUPP）导致误判 ENRLFL
-    adsl_mask = ds_col.str.upper() == "ADSL"
-    adsl_df = df.loc[adsl_mask]
-
-    adsl_dataset_values = ds_col.loc[adsl_mask].unique().tolist()
-    logger.info("[RANDFL/ENRLFL] 筛选条件：Dataset 列等于 'ADSL'（精确）；匹配到的行数=%d，Dataset 取值：%s",
-                len(adsl_df), adsl_dataset_values)
-
-    if adsl_df.empty:
+    adsl_vars = adam_spec.variables("ADSL")
+    if not adsl_vars:
         logger.warning("[RANDFL/ENRLFL] 无 ADSL 行，返回默认 ('randfl',)")
         return ("randfl",)  # 默认
-
-    var_col = adsl_df[col_var].astype(str).str.strip()
     # 记录 ADSL 下 Variable 列的全部取值（用于核对是否含 RANDFL/ENRLFL）
-    unique_vars = sorted(var_col.unique().tolist())
-    logger.info("[RANDFL/ENRLFL] ADSL 行数=%d，Variable 列唯一值（共 %d 个）：%s",
-                len(adsl_df), len(unique_vars), unique_vars)
+    unique_vars = sorted(v.name for v in adsl_vars)
+    logger.info("[RANDFL/ENRLFL] ADSL Variable 列唯一值（共 %d 个）：%s", len(unique_vars), unique_vars)
 
+    # RANDFL / ENRLFL 均需 Study Specific 列=Y（无 Study Specific 列时按存在即采纳）
     out = []
-
-    # 检查 RANDFL 且 Study Specific = Y
-    randfl_mask = var_col.str.upper() == "RANDFL"
-    randfl_found = randfl_mask.any()
-    if randfl_found:
-        if col_study_spec is not None:
-            ss = adsl_df.loc[randfl_mask, col_study_spec].astype(str).str.strip().str.upper()
-            study_spec_y = (ss == "Y").any()
-            logger.info("[RANDFL/ENRLFL] 检测到 RANDFL 行，Study Specific 列含 Y：%s", study_spec_y)
-            if study_spec_y:
-                out.append("randfl")
-        else:
-            logger.info("[RANDFL/ENRLFL] 检测到 RANDFL 行，无 Study Specific 列，按存在即采纳")
-            out.append("randfl")
-    else:
-        logger.info("[RANDFL/ENRLFL] 未在 ADSL 的 Variable 列中找到 RANDFL")
-
-    # 检查 ENRLFL 且 Study Specific = Y（与 RANDFL 一致，均需 Study Specific 列=Y）
-    enrlfl_mask = var_col.str.upper() == "ENRLFL"
-    enrlfl_found = enrlfl_mask.any()
-    if enrlfl_found:
-        if col_study_spec is not None:
-            ss_enrl = adsl_df.loc[enrlfl_mask, col_study_spec].astype(str).str.strip().str.upper()
-            enrlfl_study_spec_y = (ss_enrl == "Y").any()
-            logger.info("[RANDFL/ENRLFL] 检测到 ENRLFL 行，Study Specific 列含 Y：%s（若为 True 则会输出第14-17行）", enrlfl_study_spec_y)
-            if enrlfl_study_spec_y:
-                out.append("enrlfl")
+    for flag in ("randfl", "enrlfl"):
+        hit = adam_spec.find("ADSL", flag)
+        if hit is None:
+            logger.info("[RANDFL/ENRLFL] 未在 ADSL 的 Variable 列中找到 %s", flag.upper())
+        elif hit.study_specific is None:
+            logger.info("[RANDFL/ENRLFL] 检测到 %s 行，无 Study Specific 列，按存在即采纳", flag.upper())
         else:
-            logger.info("[RANDFL/ENRLFL] 检测到 ENRLFL 行，无 Study Specific 列，按存在即采纳")
-            out.append("enrlfl")
-    else:
-        logger.info("[RANDFL/ENRLFL] 未在 ADSL 的 Variable 列中找到 ENRLFL，将不输出入组块（第14-17行）")
+            logger.info("[RANDFL/ENRLFL] 检测到 %s 行，Study Specific 列含 Y：%s", flag.upper(), hit.study_specific)
+        if adam_spec.has_flag("ADSL", flag):
+            out.append(flag)
 
     result = tuple(out) if out else ("randfl",)
     blocks = []
@@ -232,70 +289,71 @@ def _t14_05_texts_from_label(label):
     return (row1, row2, row3)
 
 
-def parse_adam_spec_for_eotstt_label(adam_excel_path):
+def parse_adam_spec_for_eotstt_label(adam_spec):
     """
     从 ADaM 数据集说明 Excel 的 variables sheet 中，在 _T14_05_DATASET 下查找变量（治疗结束状态）：
     优先精确匹配 _T14_05_VAR_EOTSTT，否则匹配以该前缀开头的变量（如 EOTSTT1、EOTSTT2）。
+    adam_spec: ADaM 说明文件路径，或已加载的 AdamSpec。
     返回 (Variable Label/标签列取值, 实际匹配到的变量名)，用于 05 部分 TEXT 与 FILTER；未找到则返回 (默认标签, 宏变量名)。
     """
-    default_label = _T14_05_DEFAULT_LABEL
-    default_var = _T14_05_VAR_EOTSTT.strip()
-    try:
-        import pandas as pd
-    except ImportError:
-        return (default_label, default_var or "EOTSTT")
+    default_var = _T14_05_VAR_EOTSTT.strip() or "EOTSTT"
+    default = (_T14_05_DEFAULT_LABEL, default_var)
+    if not isinstance(adam_spec, AdamSpec):
+        if not adam_spec or not os.path.isfile(adam_spec):
+            return default
+        try:
+            adam_spec = AdamSpec.load(adam_spec)
+        except Exception:
+            return default
 
-    if not adam_excel_path or not os.path.isfile(adam_excel_path):
-        return (default_label, default_var or "EOTSTT")
+    hit = adam_spec.find_prefix(_T14_05_DATASET, default_var)
+    if hit is None or adam_spec.columns["label"] is None:
+        return default
+    return (hit.label or _T14_05_DEFAULT_LABEL, hit.name or default_var)
+
+
+def _edc_reason_columns(columns):
+    """按列名（表头）匹配 _EDC_ALL_REASON_NAMES 的列：列名等于或包含某个原因名称。"""
+    return [col for col in columns if any(name in str(col).strip() for name in _EDC_ALL_REASON_NAMES)]
+
+
+def _edcdef_code_columns(header):
+    """
+    由表头定位 read_edcdef_code 所需的列。
+    返回 (col_name, col_order, col_label, reason_cols)；缺少 CODE_NAME_CHN 或 CODE_LABEL 列时返回 None。
+    """
+    # 与 EDC 表结构一致：CODE_GRP, CODE_NAME_CHN, CODE_LABEL, CODE_ORDER 等；顺序列支持 CODE_ORDER 或 CODE_ORDER_R
+    col_name = _find_excel_column(header, ("CODE_NAME_CHN", "Code_Name_Chn", "code_name_chn"))
+    col_order = _find_excel_column(header, ("CODE_ORDER", "Code_Order", "code_order", "CODE_ORDER_R", "Code_Order_R"))
+    col_label = _find_excel_column(header, ("CODE_LABEL", "Code_Label", "code_label"))
+    if col_name is None or col_label is None:
+        return None
+    return col_name, col_order, col_label, _edc_reason_columns(header.columns)
+
+
+def _text_values(series):
+    """列值转为去首尾空格的字符串（缺失值为空串）。"""
+    return series.fillna("").astype(str).str.strip()
 
-    try:
-        xl = pd.ExcelFile(adam_excel_path)
-        sheet_name = None
-        for s in xl.sheet_names:
-            if "variable" in s.lower():
-                sheet_name = s
-                break
-        if sheet_name is None:
-            return (default_label, default_var or "EOTSTT")
-        df = pd.read_excel(adam_excel_path, sheet_name=sheet_name, header=0)
-        if df.empty:
-            return (default_label, default_var or "EOTSTT")
-
-        col_dataset = _find_excel_column(df, ("Dataset", "Data Set", "数据集", "Dataset Name"))
-        col_var = _find_excel_column(df, ("Variable", "变量", "Variable Name"))
-        col_label = _find_excel_column(df, ("Variable Label", "Label", "变量标签", "标签", "VariableLabel"))
-        if col_dataset is None or col_var is None:
-            return (default_label, default_var or "EOTSTT")
-
-        ds_col = df[col_dataset].astype(str).str.strip()
-        adsl_mask = ds_col.str.upper() == _T14_05_DATASET.upper()
-        adsl_df = df.loc[adsl_mask]
-        if adsl_df.empty:
-            return (default_label, default_var or "EOTSTT")
-
-        var_col = adsl_df[col_var].astype(str).str.strip()
-        var_upper = var_col.str.upper()
-        prefix = (default_var or "EOTSTT").upper()
-        # 优先精确匹配（如 EOTSTT），否则匹配以该前缀开头的变量（如 EOTSTT1、EOTSTT2）
-        eotstt_mask = (var_upper == prefix) if prefix else (var_col == "")
-        if not eotstt_mask.any() and prefix:
-            eotstt_mask = var_upper.str.startswith(prefix)
-        if not eotstt_mask.any():
-            return (default_label, default_var or "EOTSTT")
-        if col_label is None:
-            return (default_label, default_var or "EOTSTT")
-        matched_row = adsl_df.loc[eotstt_mask].iloc[0]
-        label_val = str(matched_row[col_label] or "").strip()
-        actual_var = str(matched_row[col_var] or "").strip() or default_var
-        return (label_val if label_val else default_label, actual_var)
-    except Exception:
-        return (default_label, default_var or "EOTSTT")
+
+def _numeric_values(series, pd):
+    """列值转为数值（无法转换为 NaN）；已是数值列时不经过字符串转换。"""
+    if series.dtype.kind in "iuf":
+        return series.astype(float)
+    return pd.to_numeric(_text_values(series), errors="coerce")
+
+
+def _sorted_pairs(orders, labels):
+    """按顺序值稳定排序，返回 [(order, label), ...]。"""
+    return sorted(zip(orders.tolist(), labels.tolist()), key=lambda x: x[0])
 
 
 def read_edcdef_code(edc_path):
     """
     读取 EDCDEF_code 数据集（SAS 或 Excel 导出），按 CODE_NAME_CHN 提取 CODE_ORDER、CODE_LABEL。
-    返回: dict[str, list[(order, label)]]
+    数据集经 metadata_catalog 共享读取（与初版TOC 的 AEACN 读取共用），按 CODE_NAME_CHN 分组排序（不逐行遍历）；
+    文件未变（mtime、大小）时直接使用目录中缓存的结果。
+    返回: dict[str, list[(order, label)]]（键按首次出现的顺序）
     """
     try:
         import pandas as pd
@@ -307,69 +365,48 @@ def read_edcdef_code(edc_path):
 
     if not edc_path or not os.path.isfile(edc_path):
         return {}
-
-    ext = os.path.splitext(edc_path)[1].lower()
-    if ext == ".sas7bdat":
-        try:
-            import pyreadstat
-            df, _ = pyreadstat.read_sas7bdat(edc_path)
-        except ImportError:
-            raise RuntimeError("读取 SAS 数据集需要 pyreadstat：pip install pyreadstat")
-    elif ext in (".xlsx", ".xls"):
-        df = pd.read_excel(edc_path, header=0)
-    else:
+    if os.path.splitext(edc_path)[1].lower() not in (".sas7bdat", ".xlsx", ".xls"):
         return {}
 
-    if df is None or df.empty:
-        return {}
+    result = catalog().get(edc_path, "edcdef_code", lambda p: _parse_edcdef_code(p, pd))
+    return {k: list(v) for k, v in result.items()}
 
-    # 与 EDC 表结构一致：CODE_GRP, CODE_NAME_CHN, CODE_LABEL, CODE_ORDER 等；顺序列支持 CODE_ORDER 或 CODE_ORDER_R
-    col_name = _find_excel_column(df, ("CODE_NAME_CHN", "Code_Name_Chn", "code_name_chn"))
-    col_order = _find_excel_column(df, ("CODE_ORDER", "Code_Order", "code_order", "CODE_ORDER_R", "Code_Order_R"))
-    col_label = _find_excel_column(df, ("CODE_LABEL", "Code_Label", "code_label"))
 
-    if col_name is None or col_label is None:
+def _parse_edcdef_code(edc_path, pd):
+    """read_edcdef_code 的解析部分（不含结果缓存）。"""
+    df = catalog().table(edc_path)
+    if df is None or df.empty:
         return {}
-
-    result = {}
-    for _, row in df.iterrows():
-        name = str(row.get(col_name, "") or "").strip()
-        if not name:
-            continue
-        order_val = row.get(col_order) if col_order else 0
-        try:
-            order_val = float(order_val) if order_val is not None and str(order_val).strip() else 0
-        except (ValueError, TypeError):
-            order_val = 0
-        label = str(row.get(col_label, "") or "").strip()
-        if name not in result:
-            result[name] = []
-        result[name].append((order_val, label))
-
-    for k in result:
-        result[k].sort(key=lambda x: x[0])
+    cols = _edcdef_code_columns(df)
+    if cols is None:
+        return {}
+    col_name, col_order, col_label, reason_cols = cols
+    df = df.reset_index(drop=True)
+    # 顺序值：无法转为数值时按 0（行值分组）或行号（按列名匹配的原因列）
+    orders = _numeric_values(df[col_order], pd) if col_order is not None else None
+
+    # 按 CODE_NAME_CHN 行值分组：组按首次出现的顺序，组内按 CODE_ORDER 稳定排序
+    names = _text_values(df[col_name])
+    frame = pd.DataFrame({
+        "name": names,
+        "order": orders.fillna(0) if orders is not None else 0.0,
+        "label": _text_values(df[col_label]),
+    })[names != ""]
+    frame["group"] = pd.factorize(frame["name"])[0]
+    frame = frame.sort_values(["group", "order"], kind="stable")
+    starts = frame["group"].ne(frame["group"].shift()).to_numpy().nonzero()[0].tolist() + [len(frame)]
+    pairs = list(zip(frame["order"].tolist(), frame["label"].tolist()))
+    group_names = frame["name"].tolist()
+    result = {group_names[i]: pairs[i:j] for i, j in zip(starts, starts[1:])}
 
     # 按列名（表头）再匹配一轮：EDCDEF 中可能用「筛选失败原因」等作为列名，而非 CODE_NAME_CHN 的行值
-    for col in df.columns:
-        col_strip = str(col).strip()
-        for name in _EDC_ALL_REASON_NAMES:
-            if col_strip != name and not (name in col_strip and len(col_strip) >= len(name)):
-                continue
-            # 用该列的值作为 CODE_LABEL，同一行的 CODE_ORDER 作为顺序
-            pairs = []
-            for idx, row in df.iterrows():
-                try:
-                    o = row.get(col_order) if col_order is not None else idx
-                    o = float(o) if o is not None and str(o).strip() else idx
-                except (ValueError, TypeError):
-                    o = idx
-                lb = str(row.get(col, "") or "").strip()
-                if lb:
-                    pairs.append((o, lb))
-            pairs.sort(key=lambda x: x[0])
-            if pairs:
-                result[col_strip] = pairs
-            break
+    row_idx = pd.Series(range(len(df)), dtype=float)
+    for col in reason_cols:
+        labels = _text_values(df[col])
+        mask = labels != ""
+        if mask.any():
+            col_orders = orders.fillna(row_idx) if orders is not None else row_idx
+            result[str(col).strip()] = _sorted_pairs(col_orders[mask], labels[mask])
 
     return result
 
@@ -890,10 +927,13 @@ def show_metadata_setup_dialog(gui):
         adam_path = adam_entry.get().strip()
         edc_path = edc_entry.get().strip()
 
+        # ADaM 说明文件只加载一次（AdamSpec），RANDFL/ENRLFL 与 EOTSTT 查找共用
+        adam_spec = None
         randfl_enrlfl_flags = ("randfl",)
         if adam_path and os.path.isfile(adam_path):
             try:
-                randfl_enrlfl_flags = parse_adam_spec_for_randfl_enrlfl(adam_path)
+                adam_spec = AdamSpec.load(adam_path)
+                randfl_enrlfl_flags = parse_adam_spec_for_randfl_enrlfl(adam_spec)
                 gui.update_status("ADaM 解析：%s" % (", ".join(randfl_enrlfl_flags) if randfl_enrlfl_flags else "未检测到 RANDFL/ENRLFL"))
             except Exception as e:
                 messagebox.showwarning("ADaM 解析", "无法解析 ADaM 说明文件，将使用默认（随机受试者）：%s" % e)
@@ -915,8 +955,8 @@ def show_metadata_setup_dialog(gui):
 
         treatment_end_label = None
         treatment_end_var_name = None
-        if adam_path and os.path.isfile(adam_path):
-            treatment_end_label, treatment_end_var_name = parse_adam_spec_for_eotstt_label(adam_path)
+        if adam_spec is not None:
+            treatment_end_label, treatment_end_var_name = parse_adam_spec_for_eotstt_label(adam_spec)
 
         try:
             if os.path.isfile(path):
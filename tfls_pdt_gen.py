@@ -4,18 +4,31 @@ PDT 生成模块：备份原PDT，按 TOC 与用户选择生成 Deliverables she
 """
 import os
 import shutil
+from bisect import bisect_left
 from datetime import datetime
 from copy import copy
-from openpyxl import load_workbook, Workbook
+from openpyxl import load_workbook
+from openpyxl.cell.cell import MergedCell
+from openpyxl.formatting.formatting import ConditionalFormatting, ConditionalFormattingList
+from openpyxl.worksheet.merge import MergedCellRange
+from openpyxl.worksheet.cell_range import CellRange, MultiCellRange
 from openpyxl.worksheet.datavalidation import DataValidation
 from openpyxl.utils import quote_sheetname, get_column_letter
 from openpyxl.styles import PatternFill
 
+from pdt_xlsx_patch import PatchUnsupported, SheetPatch, XlsxPatch, compact_range, compact_sqref
+
+# TOC 读取、筛选展开统一在 toc_engine 中实现
+from toc_engine import (
+    filter_and_expand_toc_rows,
+    is_chinese_lng,
+    load_toc_rows,
+    normalize_header as _normalize_header,
+    read_lng,
+    write_toc_study,
+)
+
 # 列名常量
-TOC_COLS = [
-    "Template#", "Output Type", "Title_CN", "Title_EN", "Population",
-    "Footnotes_CN", "Footnotes_EN", "Category_CN", "SAD", "FE", "MAD", "BE", "MB"
-]
 PDT_DELIVERABLES_COLS = ["Category", "Output Type", "Title", "Population", "Footnotes", "Output Reference"]
 # PDT 列别名（实际文件可能使用不同列名）
 PDT_COL_ALIASES = {
@@ -31,32 +44,15 @@ PDT_COL_ALIASES = {
     "OUTSTS": "Output Status",
     "STASCHK": "Validated by Programmer/Statistician",
 }
-EXCLUDED_CATEGORY_CN = {"QT分析", "C-QT分析", "PK浓度", "PK参数", "PD分析", "ADA分析"}
-
-# 终点 -> Category_CN 映射（用于额外添加）
-ENDPOINT_TO_CATEGORY = {
-    "PK浓度(血)": "PK浓度",
-    "PK浓度(尿)": "PK浓度",
-    "PK浓度(粪)": "PK浓度",
-    "PK参数(血)": "PK参数",
-    "PK参数(尿)": "PK参数",
-    "PK参数(粪)": "PK参数",
-    "PD分析": "PD分析",
-    "ADA分析": "ADA分析",
-    "QT分析": "QT分析",
-}
-
-DESIGN_TYPE_COLS = ["SAD", "FE", "MAD", "BE", "MB"]
 # 设计类型 -> Output Reference 后缀
 DESIGN_TYPE_SUFFIX = {"SAD": "a", "FE": "b", "MAD": "c", "BE": "d", "MB": "e"}
-# 问题3 分析物占位符（Title_CN 与 Title_EN 统一为 [Analyte]，与 TOC PH1 中一致）
-PLACEHOLDER_ANALYTE = "[Analyte]"
-# PK浓度/PK参数 血/尿/粪 子类型过滤：Title 中的中英文关键词
-# 选(血)则排除含 尿/粪；选(尿)则排除含 血/粪；选(粪)则排除含 血/尿
-SUBTYPE_TERMS = {
-    "血": ["血", "Blood", "blood", "血浆", "Plasma", "plasma"],
-    "尿": ["尿", "Urine", "urine"],
-    "粪": ["粪", "粪便", "Feces", "feces", "Stool", "stool"],
+# 新增 Output 行的默认字段
+DELIVERABLES_ROW_DEFAULTS = {
+    "Category": "Output",
+    "Validation Level": "Non-critical",
+    "Developers": "Gang Cheng",
+    "Validators": "Jianling Ren",
+    "Validated by Programmer/Statistician": "Not Started",
 }
 
 
@@ -73,291 +69,30 @@ def _backup_pdt(pdt_path):
     return backup_path
 
 
-def _read_lng(setup_path):
-    """
-    从 setup.xlsx 的 Macro Variables sheet 中读取 LNG：
-    B 列值='LNG' 时，取 C 列对应单元格的值。
-    返回 LNG 字符串；若未找到返回空字符串。
-    """
-    wb = load_workbook(setup_path, read_only=True, data_only=True)
-    if "Macro Variables" not in wb.sheetnames:
-        wb.close()
-        return ""
-    ws = wb["Macro Variables"]
-    lng_val = ""
-    for row in ws.iter_rows(min_row=1, max_col=3):
-        b_val = row[1].value if len(row) > 1 else None
-        if b_val is not None and str(b_val).strip().upper() == "LNG":
-            c_val = row[2].value if len(row) > 2 else None
-            lng_val = str(c_val).strip() if c_val is not None else ""
-            break
-    wb.close()
-    return lng_val
-
-
-def _is_chinese_lng(lng_val):
-    """根据 LNG 值判断是否使用中文列（Title_CN, Footnotes_CN）。"""
-    if not lng_val:
-        return True  # 默认中文
-    v = lng_val.upper()
-    if v in ("CHN", "CN", "CHINESE", "中文", "ZH", "ZH-CN"):
-        return True
-    return False
-
-
-def _normalize_header(h):
-    """规范化表头：去除空白、BOM、零宽字符、换行等"""
-    if h is None:
-        return ""
-    s = str(h).strip().replace("\u200b", "").replace("\ufeff", "")
-    return " ".join(s.split())  # 将换行、多空格归一为单空格
-
-
-def _normalize_analyte_placeholder(s):
-    """将 TOC 中旧占位符 <Analyte分析物> / <Analyte> 统一为 [Analyte]。"""
-    if not s:
-        return s
-    s = str(s).replace("<Analyte分析物>", PLACEHOLDER_ANALYTE).replace("<Analyte>", PLACEHOLDER_ANALYTE)
-    return s
-
-
-def _read_toc_rows(toc_path):
-    """
-    读取 TOC 的 PH1 sheet，按列名返回行列表。
-    每行为一个 dict，键为 TOC_COLS 中的列名。
-    支持列别名：Footnote_CN -> Footnotes_CN, Footnote_EN -> Footnotes_EN
-    """
-    wb = load_workbook(toc_path, read_only=True, data_only=True)
-    if "PH1" not in wb.sheetnames:
-        wb.close()
-        return []
-    ws = wb["PH1"]
-    col_idx = {}  # canonical name -> 0-based column index
-    alias_map = {"Footnote_CN": "Footnotes_CN", "Footnote_EN": "Footnotes_EN"}
-    rows = []
-    for row in ws.iter_rows():
-        vals = [c.value for c in row]
-        if not col_idx:
-            for i, h in enumerate(vals):
-                norm = _normalize_header(h)
-                if norm in TOC_COLS:
-                    col_idx[norm] = i
-                elif norm in alias_map:
-                    col_idx[alias_map[norm]] = i
-            continue
-        row_dict = {}
-        for col_name, idx in col_idx.items():
-            val = vals[idx] if idx < len(vals) else None
-            row_dict[col_name] = val
-        rows.append(row_dict)
-    wb.close()
-    return rows
-
-
 def _filter_and_expand_rows(toc_rows, design_types, endpoints, use_cn, analyte_names=None):
     """
-    按基准行、终点额外添加、设计类型展开，生成 Deliverables 行列表。
-    若 analyte_names 有值且 Title 含 [Analyte]，则按分析物展开；若问题2 选了 PK浓度/PK参数 且问题3 为空，则 [Analyte] 赋空值。
-    返回 list of dict: {Category, Output Type, Title, Population, Footnotes, Output Reference}
+    按 TOC 筛选与展开规则（toc_engine）生成 Deliverables 行列表：OUTREF 始终追加设计类型序号，[AEACN] 不展开；
+    每行补充 DELIVERABLES_ROW_DEFAULTS 中的 Category、Developers 等字段。
     """
-    use_title = "Title_CN" if use_cn else "Title_EN"
-    use_footnotes = "Footnotes_CN" if use_cn else "Footnotes_EN"
-    placeholder = PLACEHOLDER_ANALYTE  # Title_CN / Title_EN 统一使用 [Analyte]
-    analytes = [a.strip() for a in (analyte_names or "").split("|") if a.strip()] if analyte_names else []
-
-    # 1. 基准行：排除 EXCLUDED_CATEGORY_CN
-    base_categories = set()
-    for ep in endpoints:
-        if ep in ENDPOINT_TO_CATEGORY:
-            base_categories.add(ENDPOINT_TO_CATEGORY[ep])
-
-    # 1.1 PK浓度/PK参数 血/尿/粪 过滤：选(血)排除 尿/粪；选(尿)排除 血/粪；选(粪)排除 血/尿
-    selected_subtypes = set()
-    for ep in ["PK浓度(血)", "PK浓度(尿)", "PK浓度(粪)", "PK参数(血)", "PK参数(尿)", "PK参数(粪)"]:
-        if ep in endpoints:
-            selected_subtypes.add(ep[-2])  # 取 "血"/"尿"/"粪"
-    excluded_subtype_terms = []
-    for st, terms in SUBTYPE_TERMS.items():
-        if st not in selected_subtypes:
-            excluded_subtype_terms.extend(terms)
-
-    def _title_contains_excluded_subtype(row):
-        """Title_CN 或 Title_EN 含未选中的 尿/粪/血 等关键词则排除"""
-        if not excluded_subtype_terms or not selected_subtypes:
-            return False
-        title_cn = str(row.get("Title_CN") or "")
-        title_en = str(row.get("Title_EN") or "")
-        text = title_cn + " " + title_en
-        text_lower = text.lower()
-        for term in excluded_subtype_terms:
-            if len(term) <= 2:  # 中文单字
-                if term in title_cn or term in title_en:
-                    return True
-            elif term.lower() in text_lower:
-                return True
-        return False
-
-    selected_rows = []
-    for r in toc_rows:
-        cat_cn = (r.get("Category_CN") or "").strip()
-        if not cat_cn:
-            continue
-        if cat_cn in EXCLUDED_CATEGORY_CN:
-            if cat_cn not in base_categories:
-                continue
-        # PK浓度/PK参数 行：排除 Title 中含未选中子类型（尿/粪等）的观测
-        if cat_cn in ("PK浓度", "PK参数") and _title_contains_excluded_subtype(r):
-            continue
-        selected_rows.append(r)
-
-    # 2. 对每行按 design_types 展开
-    result = []
-    for r in selected_rows:
-        template_num = r.get("Template#")
-        if template_num is None:
-            template_num = ""
-        else:
-            template_num = str(template_num).strip()
-        output_type = r.get("Output Type") or ""
-        title = _normalize_analyte_placeholder(r.get(use_title) or "")
-        population = r.get("Population") or ""
-        footnotes = r.get(use_footnotes) or ""
-
-        dt_cols_present = [c for c in DESIGN_TYPE_COLS if c in r and r.get(c) is not None]
-        for dt in DESIGN_TYPE_COLS:
-            if dt not in design_types:
-                continue
-            dt_val = r.get(dt)
-            if dt_cols_present:
-                if dt_val is None or (isinstance(dt_val, str) and not str(dt_val).strip()):
-                    continue
-            # 问题1 设计类型后缀：按实际选择项的序号，后缀为 "." + 序号（如选 SAD、MAD 则 SAD=1、MAD=2）
-            design_ordinal = design_types.index(dt) + 1
-            # Title 显示：多选时加 " - SAD" 等（中英文括号均统一为 " - "）
-            if len(design_types) == 1:
-                base_title = title
-            else:
-                base_title = f"{title} - {dt}" if title else dt
-
-            # OUTREF 规则：先添加 [Analyte] 后缀（用 "." 连接），后添加问题1 序号后缀 "." + design_ordinal
-            def _build_out_ref(analyte_idx=None):
-                parts = [template_num] if (template_num and template_num.strip()) else []
-                if analyte_idx is not None:
-                    parts.append(str(analyte_idx))
-                parts.append(str(design_ordinal))
-                return ".".join(parts)
-
-            # 问题3：若 Title 含 [Analyte] 且 analyte_names 有值则按分析物展开；否则将 [Analyte] 赋空（问题3 空值时）
-            if placeholder in base_title and analytes:
-                for idx, analyte in enumerate(analytes, start=1):
-                    title_with_dt = base_title.replace(placeholder, analyte)
-                    out_ref = _build_out_ref(analyte_idx=idx)  # 先 analyte 后缀（.idx），后 design 后缀（.design_ordinal）
-                    result.append({
-                        "Category": "Output",
-                        "Output Type": output_type,
-                        "Title": title_with_dt,
-                        "Population": population,
-                        "Footnotes": footnotes,
-                        "Output Reference": out_ref,
-                        "Validation Level": "Non-critical",
-                        "Developers": "Gang Cheng",
-                        "Validators": "Jianling Ren",
-                        "Validated by Programmer/Statistician": "Not Started",
-                    })
-            else:
-                # 问题2 选了 PK浓度/PK参数 且问题3 为空时，[Analyte] 赋空值
-                title_with_dt = base_title.replace(placeholder, analytes[0] if analytes else "") if placeholder in base_title else base_title
-                out_ref = _build_out_ref()  # 无 analyte 后缀，仅 template + "." + design_ordinal
-                result.append({
-                    "Category": "Output",
-                    "Output Type": output_type,
-                    "Title": title_with_dt,
-                    "Population": population,
-                    "Footnotes": footnotes,
-                    "Output Reference": out_ref,
-                    "Validation Level": "Non-critical",
-                    "Developers": "Gang Cheng",
-                    "Validators": "Jianling Ren",
-                    "Validated by Programmer/Statistician": "Not Started",
-                })
-    return result
-
-
-# TOC.xlsx 的 TOC sheet 列名（与 generate_pdt.sas 等一致）
-TOC_SHEET_COLS = ["OUTTYPE", "OUTREF", "OUTTITLE", "OUTPOP", "OUTNOTE"]
+    rows = filter_and_expand_toc_rows(
+        toc_rows, design_types, endpoints, use_cn, analyte_names, expand_aeacn=False, design_suffix="always")
+    return [dict(DELIVERABLES_ROW_DEFAULTS, **r) for r in rows]
 
 
 def gen_toc_study(template_path, study_path, setup_path, design_types, endpoints, analyte_names=None):
     """
-    根据 TOC_template.xlsx 与前三个问题（设计类型、终点、分析物），筛选并展开后生成 TOC.xlsx。
-    TOC sheet 列映射：OUTTYPE<-Output Type, OUTREF<-Output Reference, OUTTITLE<-Title, OUTPOP<-Population, OUTNOTE<-Footnotes。
+    根据 TOC_template.xlsx 与前三个问题（设计类型、终点、分析物），按 PDT 的规则筛选展开后生成 TOC.xlsx：
+    OUTREF 始终追加设计类型序号，[AEACN] 不展开（与 gen_pdt_deliverables 的 OUTREF 一致）。
+    SAP 页面「初版TOC」的规则（单选设计类型不加序号、展开 [AEACN]）见 toc_engine.gen_toc_study。
     """
     use_cn = True
     if setup_path and os.path.isfile(setup_path):
-        lng_val = _read_lng(setup_path)
-        use_cn = _is_chinese_lng(lng_val)
-
-    toc_rows = _read_toc_rows(template_path)
+        use_cn = is_chinese_lng(read_lng(setup_path))
+    toc_rows = load_toc_rows(template_path)
     if not toc_rows:
         return False, "TOC_template 的 PH1 sheet 未找到或为空"
-
-    new_rows = _filter_and_expand_rows(toc_rows, design_types, endpoints, use_cn, analyte_names)
-
-    # 映射为 TOC sheet 行：OUTTYPE, OUTREF, OUTTITLE, OUTPOP, OUTNOTE
-    toc_sheet_rows = []
-    for r in new_rows:
-        toc_sheet_rows.append({
-            "OUTTYPE": r.get("Output Type") or "",
-            "OUTREF": r.get("Output Reference") or "",
-            "OUTTITLE": r.get("Title") or "",
-            "OUTPOP": r.get("Population") or "",
-            "OUTNOTE": r.get("Footnotes") or "",
-        })
-
-    d = os.path.dirname(study_path)
-    if d:
-        os.makedirs(d, exist_ok=True)
-
-    # 若原 TOC.xlsx 已存在，先备份到同目录下 99_archive，文件名加年月日时分秒
-    if os.path.isfile(study_path):
-        study_dir = os.path.dirname(os.path.abspath(study_path))
-        archive_dir = os.path.join(study_dir, "99_archive")
-        os.makedirs(archive_dir, exist_ok=True)
-        base_name = os.path.splitext(os.path.basename(study_path))[0]
-        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_path = os.path.join(archive_dir, f"{base_name}_{ts}.xlsx")
-        shutil.copy2(study_path, backup_path)
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "TOC"
-    for col_idx, col_name in enumerate(TOC_SHEET_COLS, start=1):
-        ws.cell(row=1, column=col_idx, value=col_name)
-    for row_idx, row_data in enumerate(toc_sheet_rows, start=2):
-        for col_idx, col_name in enumerate(TOC_SHEET_COLS, start=1):
-            ws.cell(row=row_idx, column=col_idx, value=row_data.get(col_name, ""))
-
-    # 按内容长度适当调整列宽（中文字符按约 2 单位估算）
-    def _cell_width(val):
-        if val is None:
-            return 0
-        s = str(val)
-        n = 0
-        for c in s:
-            n += 2 if "\u4e00" <= c <= "\u9fff" else 1
-        return n
-    for col_idx in range(1, len(TOC_SHEET_COLS) + 1):
-        col_letter = get_column_letter(col_idx)
-        max_w = 8
-        for row_idx in range(1, ws.max_row + 1):
-            cell = ws.cell(row=row_idx, column=col_idx)
-            max_w = max(max_w, _cell_width(cell.value))
-        # 列宽 = 内容宽度 + 余量，限制在 8~55 之间
-        ws.column_dimensions[col_letter].width = min(55, max(8, max_w + 2))
-
-    wb.save(study_path)
-    wb.close()
-    return True, "已生成 TOC.xlsx（TOC sheet 共 %d 行）。" % len(toc_sheet_rows)
+    rows = _filter_and_expand_rows(toc_rows, design_types, endpoints, use_cn, analyte_names)
+    return write_toc_study(study_path, rows, min_content_width=8)
 
 
 def _find_header_row_and_cols(ws):
@@ -405,8 +140,94 @@ def _get_first_output_row_fill(ws, header_row, col_name_to_idx):
     return DEFAULT_DATA_ROW_FILL
 
 
+def _first_output_row_styles(ws, header_row, col_name_to_idx):
+    """
+    补丁写入（SheetPatch）时，新增行沿用第一个 Category=Output 行各列的样式编号 {列: s}。
+    没有 Output 行时需要新建填充样式，抛出 PatchUnsupported 以回退到 openpyxl。
+    """
+    cat_col = col_name_to_idx.get("Category")
+    for row_idx in range(header_row + 1, ws.max_row + 1):
+        val = ws.cell(row=row_idx, column=cat_col).value
+        if val is not None and _normalize_header(val) == "Output":
+            return {col_idx: ws.cell(row=row_idx, column=col_idx).style_id for col_idx in range(1, ws.max_column + 1)}
+    raise PatchUnsupported("Deliverables 中没有可沿用样式的 Output 行")
+
+
+def _compact_rows(ws, rows):
+    """
+    一次删除 rows 中的全部行，其余行依次上移补齐，只遍历单元格一遍，不随删除行数成倍变慢。
+    单元格连同样式、超链接、行高等行属性随行移动（被删除行中的超链接随单元格移除）；合并单元格、数据验证、条件格式、自动筛选区域按删除后的行号
+    收缩 / 上移（区域内的行全部被删除时移除）。公式中的单元格引用不调整（与 openpyxl delete_rows 相同）。
+    """
+    if isinstance(ws, SheetPatch):
+        ws.compact_rows(rows)
+        return
+    rows = sorted(set(rows))
+    if not rows:
+        return
+    deleted = set(rows)
+    cells = ws._cells
+    kept = []
+    for (row_idx, col_idx), cell in cells.items():
+        if row_idx in deleted:
+            continue
+        shift = bisect_left(rows, row_idx)
+        if shift:
+            cell.row = row_idx - shift
+            if cell.hyperlink is not None:
+                cell.hyperlink.ref = cell.coordinate  # 保存时按 ref 写出，需指向移动后的单元格
+        kept.append(((cell.row, col_idx), cell))
+    cells.clear()
+    cells.update(kept)
+    ws._current_row = ws.max_row if cells else 0
+    _compact_row_ranges(ws, rows)
+
+
+def _compact_row_ranges(ws, rows):
+    """_compact_rows 中随行调整的工作表属性：行属性、合并单元格、数据验证、条件格式、自动筛选。"""
+    deleted = set(rows)
+    dims = [(r, dim) for r, dim in ws.row_dimensions.items() if r not in deleted]
+    ws.row_dimensions.clear()
+    for r, dim in dims:
+        dim.index = r - bisect_left(rows, r)
+        ws.row_dimensions[dim.index] = dim
+
+    for mcr in list(ws.merged_cells.ranges):
+        ws.merged_cells.remove(mcr)
+        ref = compact_range(mcr.coord, rows)
+        if ref is None:
+            continue
+        # 原左上角所在行被删除时，新的左上角是随行上移的 MergedCell，需换成普通单元格
+        top_left = (mcr.min_row - bisect_left(rows, mcr.min_row), mcr.min_col)
+        if isinstance(ws._cells.get(top_left), MergedCell):
+            del ws._cells[top_left]
+            ws.cell(row=top_left[0], column=top_left[1])
+        if ":" in ref:  # 收缩为单个单元格时取消合并
+            ws.merged_cells.add(MergedCellRange(ws, ref))
+
+    dv_list = ws.data_validations.dataValidation
+    for dv in list(dv_list):
+        sqref = compact_sqref(dv.sqref, rows)
+        if sqref:
+            dv.sqref = MultiCellRange(sqref)
+        else:
+            dv_list.remove(dv)
+
+    old_cf = ws.conditional_formatting
+    new_cf = ConditionalFormattingList()
+    for cf in old_cf:
+        sqref = compact_sqref(cf.sqref, rows)
+        for rule in cf.rules if sqref else ():
+            new_cf.add(ConditionalFormatting(sqref), rule)  # 规则保留原有 priority
+    new_cf.max_priority = old_cf.max_priority
+    ws.conditional_formatting = new_cf
+
+    if ws.auto_filter.ref:
+        ws.auto_filter.ref = compact_range(ws.auto_filter.ref, rows)
+
+
 def _delete_output_rows(ws, header_row, col_name_to_idx):
-    """从后向前删除 Category='Output' 的行（OUTCAT 等别名同义）。"""
+    """删除 Category='Output' 的行（OUTCAT 等别名同义），其余行上移补齐。"""
     cat_col = col_name_to_idx.get("Category")
     if not cat_col:
         return
@@ -416,8 +237,7 @@ def _delete_output_rows(ws, header_row, col_name_to_idx):
         val = cell.value
         if val is not None and _normalize_header(val) == "Output":
             rows_to_delete.append(row_idx)
-    for row_idx in reversed(rows_to_delete):
-        ws.delete_rows(row_idx, 1)
+    _compact_rows(ws, rows_to_delete)
 
 
 def _find_last_data_row(ws, header_row, cat_col):
@@ -430,42 +250,87 @@ def _find_last_data_row(ws, header_row, cat_col):
     return last_row
 
 
+# 追加行的数据验证：(列名, List Values 中的序列区域)。Developers / Validators 初始值已在行数据中设为默认人员
+DELIVERABLES_VALIDATIONS = [
+    ("Developers", "$A$2:$A$200"),
+    ("Validators", "$A$2:$A$200"),
+    ("Validation Level", "$E$2:$E$4"),
+    ("Output Status", "$F$2:$F$3"),
+    ("Validated by Programmer/Statistician", "$G$2:$G$4"),
+]
+
+
+def _formula_key(formula):
+    """数据验证公式的比较键：忽略开头的 = 与大小写（Excel 中工作表名、单元格引用均不区分大小写）。"""
+    return (formula or "").strip().lstrip("=").upper()
+
+
+def _merge_cell_ranges(ranges):
+    """
+    合并单元格区域：按列合并重叠 / 相邻的行区间，行区间相同的相邻列再合并为一个矩形。
+    返回 MultiCellRange。
+    """
+    spans_by_col = {}
+    for rng in ranges:
+        for col in range(rng.min_col, rng.max_col + 1):
+            spans_by_col.setdefault(col, []).append((rng.min_row, rng.max_row))
+    merged = {}
+    for col, spans in spans_by_col.items():
+        out = []
+        for lo, hi in sorted(spans):
+            if out and lo <= out[-1][1] + 1:
+                out[-1][1] = max(out[-1][1], hi)
+            else:
+                out.append([lo, hi])
+        merged[col] = [tuple(span) for span in out]
+    result = []
+    cols = sorted(merged)
+    i = 0
+    while i < len(cols):
+        j = i
+        while j + 1 < len(cols) and cols[j + 1] == cols[j] + 1 and merged[cols[j + 1]] == merged[cols[i]]:
+            j += 1
+        for lo, hi in merged[cols[i]]:
+            result.append(CellRange(min_col=cols[i], min_row=lo, max_col=cols[j], max_row=hi))
+        i = j + 1
+    return MultiCellRange(result)
+
+
+def _merge_list_validation(ws, formula1, cell_range):
+    """
+    为 cell_range 应用序列型数据验证，同一公式只保留一个验证：
+    已有的同公式验证（历次生成追加的）合并为第一个，区域并入 cell_range 后重新整理；没有时新建。
+    ws 可为 openpyxl Worksheet 或 SheetPatch（两者的 data_validations 均为 DataValidationList；
+    SheetPatch 的列表已包含 Excel 写在 extLst 中的 x14 验证，合并后一并写回主 dataValidations）。
+    """
+    dv_list = ws.data_validations.dataValidation
+    key = _formula_key(formula1)
+    same = [dv for dv in dv_list if dv.type == "list" and _formula_key(dv.formula1) == key]
+    if same:
+        dv = same[0]
+        for other in same[1:]:
+            dv_list.remove(other)
+    else:
+        dv = DataValidation(type="list", formula1=formula1, allow_blank=True)
+        ws.add_data_validation(dv)
+    ranges = [rng for other in same for rng in other.sqref.ranges]
+    ranges.append(CellRange(cell_range))
+    dv.sqref = _merge_cell_ranges(ranges)
+
+
 def _apply_data_validations(ws, start_row, num_rows, col_name_to_idx, list_values_sheet="List Values"):
-    """对新追加的行应用数据验证。"""
+    """
+    对新追加的行应用数据验证。与已有的同公式验证合并（见 _merge_list_validation），
+    反复重新生成时每个公式始终只有一个验证，不会越积越多。
+    """
     qs = quote_sheetname(list_values_sheet)
     end_row = start_row + num_rows - 1
     if end_row < start_row:
         return
-    # Developers: 序列来自 List Values 的 A 列（初始值已在行数据中设为 Gang Cheng）
-    dev_col = col_name_to_idx.get("Developers")
-    if dev_col:
-        dv = DataValidation(type="list", formula1=f"={qs}!$A$2:$A$200", allow_blank=True)
-        ws.add_data_validation(dv)
-        dv.add(f"{_col_letter(dev_col)}{start_row}:{_col_letter(dev_col)}{end_row}")
-    # Validators: 序列来自 List Values 的 A 列（初始值已在行数据中设为 Jianling Ren）
-    val_col = col_name_to_idx.get("Validators")
-    if val_col:
-        dv = DataValidation(type="list", formula1=f"={qs}!$A$2:$A$200", allow_blank=True)
-        ws.add_data_validation(dv)
-        dv.add(f"{_col_letter(val_col)}{start_row}:{_col_letter(val_col)}{end_row}")
-    # Validation Level: $E$2:$E$4
-    vl_col = col_name_to_idx.get("Validation Level")
-    if vl_col:
-        dv = DataValidation(type="list", formula1=f"={qs}!$E$2:$E$4", allow_blank=True)
-        ws.add_data_validation(dv)
-        dv.add(f"{_col_letter(vl_col)}{start_row}:{_col_letter(vl_col)}{end_row}")
-    # Output Status: $F$2:$F$3
-    os_col = col_name_to_idx.get("Output Status")
-    if os_col:
-        dv = DataValidation(type="list", formula1=f"={qs}!$F$2:$F$3", allow_blank=True)
-        ws.add_data_validation(dv)
-        dv.add(f"{_col_letter(os_col)}{start_row}:{_col_letter(os_col)}{end_row}")
-    # Validated by Programmer/Statistician: $G$2:$G$4
-    vbp_col = col_name_to_idx.get("Validated by Programmer/Statistician")
-    if vbp_col:
-        dv = DataValidation(type="list", formula1=f"={qs}!$G$2:$G$4", allow_blank=True)
-        ws.add_data_validation(dv)
-        dv.add(f"{_col_letter(vbp_col)}{start_row}:{_col_letter(vbp_col)}{end_row}")
+    for col_name, source in DELIVERABLES_VALIDATIONS:
+        col = col_name_to_idx.get(col_name)
+        if col:
+            _merge_list_validation(ws, f"={qs}!{source}", f"{_col_letter(col)}{start_row}:{_col_letter(col)}{end_row}")
 
 
 def _col_letter(col_idx):
@@ -474,7 +339,10 @@ def _col_letter(col_idx):
 
 
 def _append_deliverables_rows(ws, new_rows, col_name_to_idx, header_row, row_fill=None):
-    """在数据区末尾（最后一行有内容的行之后）追加新行，应用数据验证，并统一新行背景色。"""
+    """
+    在数据区末尾（最后一行有内容的行之后）追加新行，应用数据验证，并统一新行背景色。
+    补丁写入（SheetPatch）时 row_fill 为 _first_output_row_styles 返回的 {列: 样式编号}。
+    """
     cat_col = col_name_to_idx.get("Category")
     if cat_col:
         start_row = _find_last_data_row(ws, header_row, cat_col) + 1
@@ -489,12 +357,176 @@ def _append_deliverables_rows(ws, new_rows, col_name_to_idx, header_row, row_fil
             if col_idx:
                 ws.cell(row=r, column=col_idx, value=val)
         for col_idx in range(1, max_col + 1):
-            ws.cell(row=r, column=col_idx).fill = copy(fill)
+            if isinstance(ws, SheetPatch):
+                ws.cell(row=r, column=col_idx).style_id = fill.get(col_idx)
+            else:
+                ws.cell(row=r, column=col_idx).fill = copy(fill)
     if new_rows:
         _apply_data_validations(ws, start_row, len(new_rows), col_name_to_idx)
 
 
-def gen_pdt_deliverables(pdt_path, toc_path, setup_path, design_types, endpoints, analyte_names=None):
+# 差异比较的字段（按 Output Reference 对应）；Developers / Validators 等人工维护字段不参与比较
+DIFF_FIELDS = ["Output Type", "Title", "Population", "Footnotes"]
+# 报告中最多列出的明细条数
+DIFF_REPORT_LIMIT = 30
+
+
+def _ref_key(val):
+    """Output Reference 比较键：去首尾空白；整数值的浮点数去掉 .0。"""
+    if val is None:
+        return ""
+    if isinstance(val, float) and val.is_integer():
+        val = int(val)
+    return str(val).strip()
+
+
+def _diff_text(val):
+    return "" if val is None else str(val).strip()
+
+
+class DeliverablesDiff:
+    """
+    新展开的 TOC 行与 Deliverables 现有 Output 行的差异（按 Output Reference 对应）。
+    added：新增行（dict，与 _filter_and_expand_rows 的行相同）；
+    removed：[(行号, Output Reference)]；
+    modified：[(行号, Output Reference, {字段: (原值, 新值)})]；
+    unchanged：未变化的行数。
+    """
+
+    def __init__(self):
+        self.added = []
+        self.removed = []
+        self.modified = []
+        self.unchanged = 0
+
+    @property
+    def has_changes(self):
+        return bool(self.added or self.removed or self.modified)
+
+    def summary(self):
+        return "新增 %d 行，删除 %d 行，修改 %d 行，未变 %d 行。" % (
+            len(self.added), len(self.removed), len(self.modified), self.unchanged)
+
+    def report(self, limit=DIFF_REPORT_LIMIT):
+        """返回多行文本：汇总 + 明细（最多 limit 条）。"""
+        lines = [self.summary()]
+        details = (
+            ["+ %s  %s" % (r.get("Output Reference"), r.get("Title")) for r in self.added]
+            + ["- %s（第 %d 行）" % (ref, row_idx) for row_idx, ref in self.removed]
+            + ["* %s（第 %d 行）：%s" % (ref, row_idx, "、".join(changes)) for row_idx, ref, changes in self.modified]
+        )
+        lines.extend(details[:limit])
+        if len(details) > limit:
+            lines.append("……其余 %d 条略" % (len(details) - limit))
+        return "\n".join(lines)
+
+
+def _read_output_rows(ws, header_row, col_name_to_idx):
+    """返回 Category='Output' 的行：[(行号, {字段: 值})]，字段为 DIFF_FIELDS 与 Output Reference。"""
+    cat_col = col_name_to_idx.get("Category")
+    fields = [f for f in DIFF_FIELDS + ["Output Reference"] if f in col_name_to_idx]
+    result = []
+    for row_idx in range(header_row + 1, ws.max_row + 1):
+        val = ws.cell(row=row_idx, column=cat_col).value
+        if val is None or _normalize_header(val) != "Output":
+            continue
+        result.append((row_idx, {f: ws.cell(row=row_idx, column=col_name_to_idx[f]).value for f in fields}))
+    return result
+
+
+def diff_deliverables(ws, header_row, col_name_to_idx, new_rows):
+    """
+    比较 new_rows 与 Deliverables 现有 Output 行，返回 DeliverablesDiff。
+    Output Reference 重复时按出现顺序一一对应，多出的现有行记为删除，多出的新行记为新增。
+    """
+    existing = {}
+    for row_idx, values in _read_output_rows(ws, header_row, col_name_to_idx):
+        existing.setdefault(_ref_key(values.get("Output Reference")), []).append((row_idx, values))
+    fields = [f for f in DIFF_FIELDS if f in col_name_to_idx]
+    diff = DeliverablesDiff()
+    for row_data in new_rows:
+        matches = existing.get(_ref_key(row_data.get("Output Reference")))
+        if not matches:
+            diff.added.append(row_data)
+            continue
+        row_idx, values = matches.pop(0)
+        changes = {}
+        for f in fields:
+            new_val = row_data.get(f)
+            if _diff_text(values.get(f)) != _diff_text(new_val):
+                changes[f] = (values.get(f), new_val)
+        if changes:
+            diff.modified.append((row_idx, _ref_key(row_data.get("Output Reference")), changes))
+        else:
+            diff.unchanged += 1
+    for ref, matches in existing.items():
+        for row_idx, _ in matches:
+            diff.removed.append((row_idx, ref))
+    diff.removed.sort()
+    return diff
+
+
+def _apply_deliverables_diff(ws, header_row, col_name_to_idx, diff, row_fill=None):
+    """
+    就地应用差异：修改行只改变化的字段（Developers / Validators 等保持不动），删除行其余行上移
+    （行高、合并单元格、条件格式等随行移动，见 _compact_rows），新增行追加在数据区末尾（同 _append_deliverables_rows）。
+    注意：新增行不插入到其在 TOC 中的位置，apply 后 Output 行的顺序可能与 TOC 不一致；需要按 TOC 顺序时使用 replace 模式。
+    """
+    for row_idx, _, changes in diff.modified:
+        for f, (_, new_val) in changes.items():
+            ws.cell(row=row_idx, column=col_name_to_idx[f], value=new_val)
+    _compact_rows(ws, [row_idx for row_idx, _ in diff.removed])
+    _append_deliverables_rows(ws, diff.added, col_name_to_idx, header_row, row_fill)
+
+
+def _write_deliverables(wb, pdt_path, new_rows, mode):
+    """
+    将 new_rows 写入 wb（openpyxl Workbook 或 XlsxPatch）的 Deliverables sheet 并保存，mode 同 gen_pdt_deliverables。
+    返回 (success, message)；XlsxPatch 遇到不支持的结构时抛出 PatchUnsupported（此时尚未写入任何文件）。
+    """
+    if "Deliverables" not in wb.sheetnames:
+        wb.close()
+        return False, "PDT 中未找到 Deliverables sheet"
+
+    ws = wb["Deliverables"]
+    header_row, col_name_to_idx = _find_header_row_and_cols(ws)
+    if header_row is None or "Category" not in col_name_to_idx:
+        wb.close()
+        return False, "Deliverables sheet 中未找到所需列（Category 等）"
+
+    if isinstance(ws, SheetPatch):
+        row_fill = _first_output_row_styles(ws, header_row, col_name_to_idx)
+    else:
+        row_fill = _get_first_output_row_fill(ws, header_row, col_name_to_idx)
+    if mode != "replace":
+        diff = diff_deliverables(ws, header_row, col_name_to_idx, new_rows)
+        if mode == "dry_run" or not diff.has_changes:
+            wb.close()
+            return True, diff.report()
+        _apply_deliverables_diff(ws, header_row, col_name_to_idx, diff, row_fill)
+    else:
+        _delete_output_rows(ws, header_row, col_name_to_idx)
+        _append_deliverables_rows(ws, new_rows, col_name_to_idx, header_row, row_fill)
+
+    # 强制 Excel 打开时自动重算公式（避免 #VALUE! 需手动双击刷新）
+    wb.calculation.fullCalcOnLoad = True
+    wb.calculation.calcMode = "auto"
+    if wb.calculation.calcId is not None:
+        wb.calculation.calcId = (wb.calculation.calcId or 0) + 1
+
+    if mode == "apply":
+        _backup_pdt(pdt_path)
+    wb.save(pdt_path)
+    wb.close()
+
+    if mode == "apply":
+        return True, "1. PDT Deliverables 表单已按差异更新：" + diff.report() + "\n2. 原PDT已备份至 99_archive 文件夹。"
+    msg_line1 = f"1. PDT Deliverables 表单已增加{len(new_rows)}行 TFLs记录。"
+    msg_line2 = "2. 原PDT已备份至 99_archive 文件夹。"
+    return True, msg_line1 + "\n" + msg_line2
+
+
+def gen_pdt_deliverables(pdt_path, toc_path, setup_path, design_types, endpoints, analyte_names=None, mode="replace"):
     """
     备份原PDT，按TOC与用户选择生成 Deliverables sheet 中 Category=Output 的行。
 
@@ -505,53 +537,38 @@ def gen_pdt_deliverables(pdt_path, toc_path, setup_path, design_types, endpoints
         design_types: 设计类型列表，如 ["SAD","FE","MAD"]
         endpoints: 终点列表，如 ["PK浓度(血)","PK参数(血)"]
         analyte_names: 分析物名称（可选，暂未参与逻辑）
+        mode: "replace" 删除全部 Output 行后重新追加（原行为）；
+              "dry_run" 只比较差异（按 Output Reference），不备份、不保存，message 为差异报告；
+              "apply" 只写入差异：修改行仅更新变化字段（保留 Developers / Validators 等人工分配），
+              删除多余行、新增行追加在数据区末尾（不按 TOC 顺序插入，需要 TOC 顺序时用 replace）；
+              无差异时不备份、不保存。
 
     Returns:
         (success: bool, message: str)
     """
+    if mode not in ("replace", "dry_run", "apply"):
+        return False, "未知的 mode：%s" % mode
     try:
-        # 1. 备份
-        backup_path = _backup_pdt(pdt_path)
+        # 1. 备份（仅 replace 模式在此备份；apply 模式有差异时保存前再备份）
+        if mode == "replace":
+            _backup_pdt(pdt_path)
 
         # 2. 读 LNG
-        lng_val = _read_lng(setup_path)
-        use_cn = _is_chinese_lng(lng_val)
+        lng_val = read_lng(setup_path)
+        use_cn = is_chinese_lng(lng_val)
 
         # 3. 读 TOC PH1
-        toc_rows = _read_toc_rows(toc_path)
+        toc_rows = load_toc_rows(toc_path)
         if not toc_rows:
             return False, "TOC PH1 未找到或为空"
 
         # 4. 筛选与展开
         new_rows = _filter_and_expand_rows(toc_rows, design_types, endpoints, use_cn, analyte_names)
 
-        # 5. 写 Deliverables
-        wb = load_workbook(pdt_path, data_only=False)
-        if "Deliverables" not in wb.sheetnames:
-            wb.close()
-            return False, "PDT 中未找到 Deliverables sheet"
-
-        ws = wb["Deliverables"]
-        header_row, col_name_to_idx = _find_header_row_and_cols(ws)
-        if header_row is None or "Category" not in col_name_to_idx:
-            wb.close()
-            return False, "Deliverables sheet 中未找到所需列（Category 等）"
-
-        row_fill = _get_first_output_row_fill(ws, header_row, col_name_to_idx)
-        _delete_output_rows(ws, header_row, col_name_to_idx)
-        _append_deliverables_rows(ws, new_rows, col_name_to_idx, header_row, row_fill)
-
-        # 强制 Excel 打开时自动重算公式（避免 #VALUE! 需手动双击刷新）
-        wb.calculation.fullCalcOnLoad = True
-        wb.calculation.calcMode = "auto"
-        if wb.calculation.calcId is not None:
-            wb.calculation.calcId = (wb.calculation.calcId or 0) + 1
-
-        wb.save(pdt_path)
-        wb.close()
-
-        msg_line1 = f"1. PDT Deliverables 表单已增加{len(new_rows)}行 TFLs记录。"
-        msg_line2 = "2. 原PDT已备份至 99_archive 文件夹。"
-        return True, msg_line1 + "\n" + msg_line2
+        # 5. 写 Deliverables：优先只改写 Deliverables sheet 的 XML，结构不支持时回退到 openpyxl 整体读写
+        try:
+            return _write_deliverables(XlsxPatch(pdt_path), pdt_path, new_rows, mode)
+        except PatchUnsupported:
+            return _write_deliverables(load_workbook(pdt_path, data_only=False), pdt_path, new_rows, mode)
     except Exception as e:
         return False, str(e)
@@ -0,0 +1,456 @@
+# -*- coding: utf-8 -*-
+"""
+TOC 模板引擎（独立模块）
+
+SAP 页面「初版TOC」与 PDT 生成共用：
+- load_toc_rows(path)：解析 TOC_template.xlsx 的 PH1 sheet 为 TocRow 列表，进程内按 (mtime, size) 缓存，
+  磁盘上按文件内容哈希缓存（file_cache），重复点击、反复调整设计类型 / 终点时不再重新打开共享盘上的模板；
+- filter_and_expand_toc_rows(...)：按设计类型、终点、分析物、[AEACN] 筛选并展开；
+- gen_toc_study(...)：生成项目层面 TOC.xlsx（TOC sheet）；write_toc_study 为其写出部分（tfls_pdt_gen 按 PDT 规则生成时共用）。
+
+当问题1 仅选择一个答案时，TOC.xlsx 命名规则（与 OUTTITLE 一致，不追加设计类型后缀）：
+  OUTTITLE：取模板标题（Title_CN/Title_EN），不追加设计类型后缀；[Analyte]/[AEACN] 按规则替换为具体值。
+  OUTREF：不追加设计类型序号，为 Template# 或 Template#.aeacn序号 或 Template#.analyte序号。
+          例：14.1、14.3.1-5.1（AEACN 第1个）、14.1.2（Analyte 第2个）。多选设计类型时才追加 .设计类型序号。
+"""
+import os
+import re
+import shutil
+import threading
+from datetime import datetime
+
+from openpyxl import load_workbook, Workbook
+from openpyxl.utils import get_column_letter
+
+from file_cache import load_cached
+from metadata_catalog import catalog
+
+# TOC PH1 列名
+TOC_COLS = [
+    "Template#", "Output Type", "Title_CN", "Title_EN", "Population",
+    "Footnotes_CN", "Footnotes_EN", "Category_CN", "SAD", "FE", "MAD", "BE", "MB"
+]
+# PH1 列别名
+TOC_COL_ALIASES = {"Footnote_CN": "Footnotes_CN", "Footnote_EN": "Footnotes_EN"}
+# TOC.xlsx 的 TOC sheet 列名（与 generate_pdt.sas 等一致）
+TOC_SHEET_COLS = ["OUTTYPE", "OUTREF", "OUTTITLE", "OUTPOP", "OUTNOTE"]
+EXCLUDED_CATEGORY_CN = {"QT分析", "C-QT分析", "PK浓度", "PK参数", "PD分析", "ADA分析"}
+
+# 终点 -> Category_CN 映射（用于额外添加）
+ENDPOINT_TO_CATEGORY = {
+    "PK浓度(血)": "PK浓度", "PK浓度(尿)": "PK浓度", "PK浓度(粪)": "PK浓度",
+    "PK参数(血)": "PK参数", "PK参数(尿)": "PK参数", "PK参数(粪)": "PK参数",
+    "PD分析": "PD分析", "ADA分析": "ADA分析", "QT分析": "QT分析",
+}
+PK_SUBTYPE_ENDPOINTS = ["PK浓度(血)", "PK浓度(尿)", "PK浓度(粪)", "PK参数(血)", "PK参数(尿)", "PK参数(粪)"]
+
+DESIGN_TYPE_COLS = ["SAD", "FE", "MAD", "BE", "MB"]
+# 问题3 分析物占位符（Title_CN 与 Title_EN 统一为 [Analyte]，与 TOC PH1 中一致）
+PLACEHOLDER_ANALYTE = "[Analyte]"
+PLACEHOLDER_AEACN = "[AEACN]"
+AEACN_EXCLUDED_LABELS = frozenset(
+    s.strip().upper() for s in
+    ("剂量不变", "不适用", "DOSE NOT CHANGED", "NOT APPLICABLE")
+)
+# PK浓度/PK参数 血/尿/粪 子类型过滤：Title 中的中英文关键词
+# 选(血)则排除含 尿/粪；选(尿)则排除含 血/粪；选(粪)则排除含 血/尿
+SUBTYPE_TERMS = {
+    "血": ["血", "Blood", "blood", "血浆", "Plasma", "plasma"],
+    "尿": ["尿", "Urine", "urine"],
+    "粪": ["粪", "粪便", "Feces", "feces", "Stool", "stool"],
+}
+# 无 AE AEDIS 变量时不保留的模板行
+AEDIS_TEMPLATES = ("14.3.1-5.1", "14.3.1-5.2")
+
+# TocRow 结构或解析规则变化时递增，使磁盘缓存失效
+TOC_STORE_VERSION = 1
+
+# 进程内已解析的模板：绝对路径 -> (mtime_ns, size, rows)
+_store_memo = {}
+_store_memo_lock = threading.Lock()
+
+
+def read_lng(setup_path):
+    """
+    从 setup.xlsx 的 Macro Variables sheet 中读取 LNG：
+    B 列值='LNG' 时，取 C 列对应单元格的值。
+    返回 LNG 字符串；若未找到返回空字符串。
+    """
+    wb = load_workbook(setup_path, read_only=True, data_only=True)
+    if "Macro Variables" not in wb.sheetnames:
+        wb.close()
+        return ""
+    ws = wb["Macro Variables"]
+    lng_val = ""
+    for row in ws.iter_rows(min_row=1, max_col=3):
+        b_val = row[1].value if len(row) > 1 else None
+        if b_val is not None and str(b_val).strip().upper() == "LNG":
+            c_val = row[2].value if len(row) > 2 else None
+            lng_val = str(c_val).strip() if c_val is not None else ""
+            break
+    wb.close()
+    return lng_val
+
+
+def is_chinese_lng(lng_val):
+    """根据 LNG 值判断是否使用中文列（Title_CN, Footnotes_CN）。"""
+    if not lng_val:
+        return True  # 默认中文
+    return lng_val.upper() in ("CHN", "CN", "CHINESE", "中文", "ZH", "ZH-CN")
+
+
+def normalize_header(h):
+    """规范化表头：去除空白、BOM、零宽字符、换行等"""
+    if h is None:
+        return ""
+    s = str(h).strip().replace("\u200b", "").replace("\ufeff", "")
+    return " ".join(s.split())  # 将换行、多空格归一为单空格
+
+
+def normalize_analyte_placeholder(s):
+    """将 TOC 中旧占位符 <Analyte分析物> / <Analyte> 统一为 [Analyte]。"""
+    if not s:
+        return s
+    return str(s).replace("<Analyte分析物>", PLACEHOLDER_ANALYTE).replace("<Analyte>", PLACEHOLDER_ANALYTE)
+
+
+class TocRow:
+    """
+    PH1 中的一行（已规范化）。
+    template_num / category_cn 已去首尾空白；title_cn / title_en 已统一 [Analyte] 占位符；
+    designs：该行允许的设计类型（行内各设计类型列均为空时为全部设计类型）。
+    """
+
+    __slots__ = ("template_num", "output_type", "title_cn", "title_en", "population",
+                 "footnotes_cn", "footnotes_en", "category_cn", "designs")
+
+    def __init__(self, template_num, output_type, title_cn, title_en, population,
+                 footnotes_cn, footnotes_en, category_cn, designs):
+        self.template_num = template_num
+        self.output_type = output_type
+        self.title_cn = title_cn
+        self.title_en = title_en
+        self.population = population
+        self.footnotes_cn = footnotes_cn
+        self.footnotes_en = footnotes_en
+        self.category_cn = category_cn
+        self.designs = designs
+
+    def __repr__(self):
+        return "<TocRow %s %s>" % (self.template_num, self.category_cn)
+
+    @classmethod
+    def from_dict(cls, r):
+        template_num = r.get("Template#")
+        dt_present = [c for c in DESIGN_TYPE_COLS if r.get(c) is not None]
+        if dt_present:
+            designs = frozenset(
+                c for c in dt_present
+                if not (isinstance(r[c], str) and not r[c].strip()))
+        else:
+            designs = frozenset(DESIGN_TYPE_COLS)
+        return cls(
+            template_num="" if template_num is None else str(template_num).strip(),
+            output_type=r.get("Output Type") or "",
+            title_cn=normalize_analyte_placeholder(r.get("Title_CN") or ""),
+            title_en=normalize_analyte_placeholder(r.get("Title_EN") or ""),
+            population=r.get("Population") or "",
+            footnotes_cn=r.get("Footnotes_CN") or "",
+            footnotes_en=r.get("Footnotes_EN") or "",
+            category_cn=str(r.get("Category_CN") or "").strip(),
+            designs=designs,
+        )
+
+
+def _parse_toc_template(toc_path):
+    """读取 TOC 的 PH1 sheet，返回 TocRow 列表；无 PH1 时返回空列表。"""
+    wb = load_workbook(toc_path, read_only=True, data_only=True)
+    try:
+        if "PH1" not in wb.sheetnames:
+            return []
+        ws = wb["PH1"]
+        col_idx = {}  # canonical name -> 0-based column index
+        rows = []
+        for vals in ws.iter_rows(values_only=True):
+            if not col_idx:
+                for i, h in enumerate(vals):
+                    norm = normalize_header(h)
+                    if norm in TOC_COLS:
+                        col_idx[norm] = i
+                    elif norm in TOC_COL_ALIASES:
+                        col_idx[TOC_COL_ALIASES[norm]] = i
+                continue
+            rows.append(TocRow.from_dict(
+                {col_name: vals[idx] if idx < len(vals) else None for col_name, idx in col_idx.items()}))
+        return rows
+    finally:
+        wb.close()
+
+
+def load_toc_rows(toc_path):
+    """
+    返回 TOC 模板 PH1 的 TocRow 元组（只读，调用方勿修改）。
+    文件未变（mtime、大小）时直接使用进程内缓存；否则按文件内容哈希读取磁盘缓存，未命中再解析。
+    """
+    abs_path = os.path.abspath(toc_path)
+    st = os.stat(abs_path)
+    with _store_memo_lock:
+        hit = _store_memo.get(abs_path)
+    if hit and hit[0] == st.st_mtime_ns and hit[1] == st.st_size:
+        return hit[2]
+    rows = load_cached("toc_template", abs_path, lambda: tuple(_parse_toc_template(abs_path)),
+                       version=TOC_STORE_VERSION)
+    with _store_memo_lock:
+        _store_memo[abs_path] = (st.st_mtime_ns, st.st_size, rows)
+    return rows
+
+
+class TocExpandPlan:
+    """
+    筛选与展开的编译结果：按一次选择（设计类型、终点、语言、分析物、AEACN）预先构建
+    未选中子类型关键词的合并正则、设计类型序号表与标题 / OUTREF 后缀，expand(toc_rows) 以生成器逐行产出。
+    规则说明见 filter_and_expand_toc_rows。
+    """
+
+    def __init__(self, design_types, endpoints, use_cn, analyte_names=None, aeacn_labels=None,
+                 expand_aeacn=True, design_suffix="multi"):
+        self.title_attr = "title_cn" if use_cn else "title_en"
+        self.footnotes_attr = "footnotes_cn" if use_cn else "footnotes_en"
+        self.expand_aeacn = expand_aeacn
+        analytes = [a.strip() for a in (analyte_names or "").split("|") if a.strip()]
+        self.analyte_items = [(str(i), a) for i, a in enumerate(analytes, start=1)]
+        self.aeacn_items = [(str(i), label) for i, label in enumerate(aeacn_labels or (), start=1)]
+
+        # 1. 基准行：排除 EXCLUDED_CATEGORY_CN（终点选中的类别除外）
+        base_categories = {ENDPOINT_TO_CATEGORY[ep] for ep in endpoints if ep in ENDPOINT_TO_CATEGORY}
+        self.excluded_categories = frozenset(EXCLUDED_CATEGORY_CN - base_categories)
+
+        # 1.1 PK浓度/PK参数 血/尿/粪 过滤：选(血)排除 尿/粪；选(尿)排除 血/粪；选(粪)排除 血/尿。
+        # 中文词（<=2 字）区分大小写，英文词不区分大小写，合并为一个正则
+        selected_subtypes = {ep[-2] for ep in PK_SUBTYPE_ENDPOINTS if ep in endpoints}  # 取 "血"/"尿"/"粪"
+        self.subtype_re = None
+        if selected_subtypes:
+            terms = [t for st, ts in SUBTYPE_TERMS.items() if st not in selected_subtypes for t in ts]
+            short = [re.escape(t) for t in terms if len(t) <= 2]
+            long_ = [re.escape(t) for t in terms if len(t) > 2]
+            alternatives = []
+            if short:
+                alternatives.append("|".join(short))
+            if long_:
+                alternatives.append("(?i:%s)" % "|".join(long_))
+            if alternatives:
+                self.subtype_re = re.compile("|".join(alternatives))
+
+        # 2. 设计类型：按 DESIGN_TYPE_COLS 顺序，序号为在 design_types 中的位置（如选 SAD、MAD 则 SAD=1、MAD=2）
+        single_design = len(design_types) == 1
+        add_design_ordinal = design_suffix == "always" or not single_design
+        ordinals = {}
+        for i, dt in enumerate(design_types, start=1):
+            ordinals.setdefault(dt, i)
+        # (设计类型, 标题后缀, OUTREF 序号后缀)；多选时 Title 加 " - SAD" 等
+        self.designs = [
+            (dt, None if single_design else dt, str(ordinals[dt]) if add_design_ordinal else "")
+            for dt in DESIGN_TYPE_COLS if dt in ordinals
+        ]
+
+    def keep(self, row):
+        cat_cn = row.category_cn
+        if not cat_cn or cat_cn in self.excluded_categories:
+            return False
+        if self.subtype_re is not None and cat_cn in ("PK浓度", "PK参数"):
+            # Title_CN 或 Title_EN 含未选中的 尿/粪/血 等关键词则排除
+            if self.subtype_re.search(row.title_cn) or self.subtype_re.search(row.title_en):
+                return False
+        return True
+
+    def expand(self, toc_rows):
+        placeholder = PLACEHOLDER_ANALYTE
+        for r in toc_rows:
+            if not self.keep(r):
+                continue
+            template_num = r.template_num
+            title = getattr(r, self.title_attr)
+            footnotes = getattr(r, self.footnotes_attr)
+            for dt, title_suffix, ordinal in self.designs:
+                if dt not in r.designs:
+                    continue
+                if title_suffix is None:
+                    base_title = title
+                else:
+                    base_title = "%s - %s" % (title, title_suffix) if title else title_suffix
+                # OUTREF：Template# . aeacn/analyte 序号 . 设计类型序号（空部分省略）
+                if self.expand_aeacn and PLACEHOLDER_AEACN in base_title:
+                    items, token = self.aeacn_items, PLACEHOLDER_AEACN
+                elif placeholder in base_title and self.analyte_items:
+                    items, token = self.analyte_items, placeholder
+                else:
+                    # 问题3 为空时 [Analyte] 赋空值
+                    items, token = ((None, ""),), placeholder
+                for idx, value in items:
+                    yield {
+                        "Output Type": r.output_type,
+                        "Title": base_title.replace(token, value),
+                        "Population": r.population,
+                        "Footnotes": footnotes,
+                        "Output Reference": ".".join(p for p in (template_num, idx, ordinal) if p),
+                    }
+
+
+def filter_and_expand_toc_rows(toc_rows, design_types, endpoints, use_cn, analyte_names=None,
+                               aeacn_labels=None, expand_aeacn=True, design_suffix="multi"):
+    """
+    按基准行、终点额外添加、设计类型展开，生成输出行列表。
+    analyte_names：以 | 分隔；Title 含 [Analyte] 时按分析物展开，为空时 [Analyte] 赋空值。
+    aeacn_labels：EDCDEF_code 中 CODE_NAME='AEACN' 的 CODE_LABEL 列表（已排序）。expand_aeacn 为 True 时，
+        Title 含 [AEACN] 的行按其展开，列表为空则不保留该行；为 False 时 [AEACN] 原样保留。
+    design_suffix："multi" 仅多选设计类型时 OUTREF 追加 .设计类型序号；"always" 始终追加。
+    OUTREF 后缀顺序：Template# . aeacn序号 . analyte序号 . 设计类型序号。
+    返回 list of dict: {Output Type, Title, Population, Footnotes, Output Reference}；
+    PDT Deliverables 所需的 Category、Developers 等字段由调用方补充。需要逐行处理时可直接使用 TocExpandPlan.expand。
+    """
+    plan = TocExpandPlan(design_types, endpoints, use_cn, analyte_names, aeacn_labels,
+                         expand_aeacn=expand_aeacn, design_suffix=design_suffix)
+    return list(plan.expand(toc_rows))
+
+
+def _edcdef_code_aeacn_labels(edcdef_code_path):
+    """
+    从 EDCDEF_code.sas7bdat（或 .xlsx，经 metadata_catalog 共享读取）中读取 CODE_NAME='AEACN' 的 CODE_LABEL 列表。
+    筛选条件：CODE_NAME='AEACN' 且 CODE_LABEL 不在 ('剂量不变','不适用','DOSE NOT CHANGED','NOT APPLICABLE')；
+    按 CODE_ORDER 排序后返回 CODE_LABEL 值列表。文件不存在或读取失败返回 []。
+    """
+    if not edcdef_code_path or not os.path.isfile(edcdef_code_path):
+        return []
+    try:
+        df = catalog().table(edcdef_code_path)
+    except Exception:
+        return []
+    if df is None or df.empty:
+        return []
+    cols_upper = {str(c).upper(): c for c in df.columns}
+    code_name_col = cols_upper.get("CODE_NAME") or cols_upper.get("CODE_NAME_CHN")
+    code_label_col = cols_upper.get("CODE_LABEL")
+    code_order_col = cols_upper.get("CODE_ORDER") or cols_upper.get("CODE_ORDER_R")
+    if code_name_col is None or code_label_col is None:
+        return []
+    name_vals = df[code_name_col].astype(str).str.strip()
+    aeacn_mask = name_vals.str.upper() == "AEACN"
+    if not aeacn_mask.any():
+        return []
+    sub = df.loc[aeacn_mask].copy()
+    label_vals = sub[code_label_col].astype(str).str.strip()
+    keep = ~label_vals.str.upper().isin(AEACN_EXCLUDED_LABELS)
+    sub = sub.loc[keep]
+    if sub.empty:
+        return []
+    if code_order_col is not None:
+        try:
+            sub = sub.sort_values(by=code_order_col)
+        except Exception:
+            pass
+    return sub[code_label_col].astype(str).str.strip().tolist()
+
+
+def _edcdef_ecrf_has_ae_aedis(edcdef_ecrf_path):
+    """
+    读取 utility\\metadata\\EDCDEF_ecrf.sas7bdat（经 metadata_catalog 共享读取），当 EDC_DATA='AE' 时是否存在 EDC_VARIABLE='AEDIS'。
+    若文件不存在或读取失败返回 False。
+    """
+    if not edcdef_ecrf_path or not os.path.isfile(edcdef_ecrf_path):
+        return False
+    try:
+        df = catalog().table(edcdef_ecrf_path)
+    except Exception:
+        return False
+    if df is None or df.empty:
+        return False
+    # 列名可能为大写或混合
+    cols = {c.upper(): c for c in df.columns}
+    edc_data_col = cols.get("EDC_DATA")
+    edc_var_col = cols.get("EDC_VARIABLE")
+    if edc_data_col is None or edc_var_col is None:
+        return False
+    ae_mask = df[edc_data_col].astype(str).str.strip().str.upper() == "AE"
+    if not ae_mask.any():
+        return False
+    ae_df = df.loc[ae_mask]
+    aedis_mask = ae_df[edc_var_col].astype(str).str.strip().str.upper() == "AEDIS"
+    return aedis_mask.any()
+
+
+def _toc_cell_width(val):
+    """按内容估算列宽（中文字符按约 2 单位）。"""
+    if val is None:
+        return 0
+    return sum(2 if "\u4e00" <= c <= "\u9fff" else 1 for c in str(val))
+
+
+def write_toc_xlsx(study_path, toc_sheet_rows, min_content_width=0):
+    """
+    以 openpyxl 只写模式流式写出 TOC.xlsx（TOC sheet，列为 TOC_SHEET_COLS）。
+    toc_sheet_rows：dict 列表（键为 TOC_SHEET_COLS）。先按行值计算各列宽度（内容宽度 + 2，限制在 8~55，
+    内容宽度不小于 min_content_width），再逐行写出，不在内存中建立单元格对象。
+    """
+    widths = [max(min_content_width, _toc_cell_width(col_name)) for col_name in TOC_SHEET_COLS]
+    for row_data in toc_sheet_rows:
+        for i, col_name in enumerate(TOC_SHEET_COLS):
+            w = _toc_cell_width(row_data.get(col_name, ""))
+            if w > widths[i]:
+                widths[i] = w
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("TOC")
+    # 只写模式下列宽须在写入第一行之前设置
+    for col_idx, w in enumerate(widths, start=1):
+        ws.column_dimensions[get_column_letter(col_idx)].width = min(55, max(8, w + 2))
+    ws.append(TOC_SHEET_COLS)
+    for row_data in toc_sheet_rows:
+        ws.append([row_data.get(col_name, "") for col_name in TOC_SHEET_COLS])
+    wb.save(study_path)
+    wb.close()
+
+
+def gen_toc_study(template_path, study_path, setup_path, design_types, endpoints, analyte_names=None, edcdef_ecrf_path=None, edcdef_code_path=None):
+    """
+    根据 TOC_template.xlsx 与前三个问题（设计类型、终点、分析物）、[AEACN]，筛选并展开后生成 TOC.xlsx。
+    TOC sheet 列：OUTTYPE, OUTREF, OUTTITLE, OUTPOP, OUTNOTE。
+    edcdef_ecrf_path: 若提供，则根据 EDCDEF_ecrf.sas7bdat 中 EDC_DATA='AE' 时是否存在 EDC_VARIABLE='AEDIS'，
+                      决定是否保留 Template# 为 14.3.1-5.1 / 14.3.1-5.2 的行；不存在则不保留。
+    edcdef_code_path: 若提供，则从中读取 CODE_NAME='AEACN' 的 CODE_LABEL 列表，用于展开 [AEACN] 占位符行（Template# 加后缀 .1/.2/...）。
+    """
+    use_cn = True
+    if setup_path and os.path.isfile(setup_path):
+        use_cn = is_chinese_lng(read_lng(setup_path))
+    toc_rows = load_toc_rows(template_path)
+    if not toc_rows:
+        return False, "TOC_template 的 PH1 sheet 未找到或为空"
+    if edcdef_ecrf_path and not _edcdef_ecrf_has_ae_aedis(edcdef_ecrf_path):
+        toc_rows = [r for r in toc_rows if r.template_num not in AEDIS_TEMPLATES]
+    aeacn_labels = _edcdef_code_aeacn_labels(edcdef_code_path) if edcdef_code_path else None
+    new_rows = filter_and_expand_toc_rows(toc_rows, design_types, endpoints, use_cn, analyte_names, aeacn_labels=aeacn_labels)
+    return write_toc_study(study_path, new_rows)
+
+
+def write_toc_study(study_path, new_rows, min_content_width=0):
+    """
+    将 filter_and_expand_toc_rows 的结果写为 TOC.xlsx（原文件先备份到同目录 99_archive），返回 (success, msg)。
+    min_content_width 见 write_toc_xlsx。
+    """
+    toc_sheet_rows = [
+        {"OUTTYPE": r["Output Type"], "OUTREF": r["Output Reference"],
+         "OUTTITLE": r["Title"], "OUTPOP": r["Population"], "OUTNOTE": r["Footnotes"]}
+        for r in new_rows
+    ]
+    d = os.path.dirname(study_path)
+    if d:
+        os.makedirs(d, exist_ok=True)
+    # 若原 TOC.xlsx 已存在，先备份到同目录下 99_archive，文件名加年月日时分秒
+    if os.path.isfile(study_path):
+        study_dir = os.path.dirname(os.path.abspath(study_path))
+        archive_dir = os.path.join(study_dir, "99_archive")
+        os.makedirs(archive_dir, exist_ok=True)
+        base_name = os.path.splitext(os.path.basename(study_path))[0]
+        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+        shutil.copy2(study_path, os.path.join(archive_dir, f"{base_name}_{ts}.xlsx"))
+    write_toc_xlsx(study_path, toc_sheet_rows, min_content_width=min_content_width)
+    return True, "已生成 TOC.xlsx（TOC sheet 共 %d 行）。" % len(toc_sheet_rows)